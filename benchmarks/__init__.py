@@ -0,0 +1,11 @@
+# Benchmarks for DOCTOPAL. Run from the repository root:
+#
+#   python -m benchmarks.datagen --data-dir /tmp/doctopal-bench --doctors 100000 --bookings 100000
+#   python -m benchmarks.micro   --data-dir /tmp/doctopal-bench --output micro.json
+#   python -m benchmarks.load    --data-dir /tmp/doctopal-bench --users 8 --duration 20 --output load.json
+#   python -m benchmarks.importtime --compare HEAD~1 --output importtime.json
+#   python -m benchmarks.ids_stress --processes 16 --duration 5
+#   python -m benchmarks.analytics --data-dir /tmp/doctopal-analytics --bookings 1000000
+#
+# Every tool works on its own data directory (see sandbox.py), never on the files in the tree.
+# Results are JSON with the commit they ran against, so runs can be diffed between commits.
@@ -0,0 +1,97 @@
+import argparse
+import random
+import time
+from typing import Dict, List, Optional
+
+from . import datagen, report, sandbox
+
+# Clinic booking analytics: a full rebuild over the sandbox's bookings (rows/s), an incremental
+# refresh after appending a few new bookings (which should cost the new rows, not the total),
+# and the latency of the summary read behind /api/analytics/clinics/<id>.
+# With --bookings N the sandbox is first filled with N bookings (and --doctors doctors).
+
+
+def _clinics(limit: int) -> List[str]:
+    from src.app.db_manager import booking_analytics
+
+    rows = booking_analytics._conn().execute(
+        "SELECT clinic_id FROM clinic_totals ORDER BY bookings DESC LIMIT ?", (limit,)).fetchall()
+    return [r[0] for r in rows]
+
+
+def run(new_bookings: int, queries: int, rng: random.Random, doctors: Optional[List] = None) -> Dict:
+    from datetime import datetime, timedelta
+
+    from src.app.db_manager import booking_analytics, booking_store, storage
+
+    result = {"rebuild": booking_analytics.rebuild()}
+
+    # append like the materializer does, then refresh the partitions it touched
+    if doctors is None:
+        doctors = [(r["doctor_id"], "", "", r["clinic_id"], "", "")
+                   for r in storage.get_backend().iter_doctors()][:10000]
+    now = datetime.utcnow()
+    rows = []
+    for i in range(new_bookings):
+        doctor_id, _, _, clinic_id, _, _ = rng.choice(doctors)
+        created = now - timedelta(seconds=rng.randrange(3600))
+        rows.append({"patient_id": f"PBENCH{i:07d}", "visit_day": created.strftime("%A"), "clinic_id": clinic_id,
+                     "doctor_id": doctor_id, "created_at": created.isoformat()})
+    keys = {}
+    for row in rows:
+        keys.setdefault(booking_store.partition_key(row), []).append(row)
+    for key, batch in keys.items():
+        booking_store.append_rows(key, batch, fsync=False)
+    t = time.perf_counter()
+    counted = booking_analytics.refresh(list(keys))
+    seconds = time.perf_counter() - t
+    result["incremental"] = {"appended": new_bookings, "counted": counted, "partitions": len(keys),
+                             "seconds": round(seconds, 4)}
+    # nothing new: only the watermark checks
+    t = time.perf_counter()
+    booking_analytics.refresh()
+    result["incremental"]["noop_refresh_s"] = round(time.perf_counter() - t, 4)
+
+    clinics = _clinics(100)
+    day_to = now.date()
+    day_from = day_to - timedelta(days=29)
+    latencies = []
+    for _ in range(queries if clinics else 0):
+        clinic_id = rng.choice(clinics)
+        t = time.perf_counter()
+        booking_analytics.clinic_summary(clinic_id, day_from, day_to)
+        latencies.append(time.perf_counter() - t)
+    result["clinic_summary"] = report.summarize(latencies)
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the clinic booking analytics.")
+    parser.add_argument("--data-dir", required=True)
+    parser.add_argument("--bookings", type=int, default=0,
+                        help="first generate this many bookings (e.g. 1000000); 0 uses what is there")
+    parser.add_argument("--doctors", type=int, default=10000, help="doctors to generate with --bookings")
+    parser.add_argument("--days", type=int, default=90, help="spread generated bookings over this many days")
+    parser.add_argument("--new-bookings", type=int, default=1000, help="appended before the incremental refresh")
+    parser.add_argument("--queries", type=int, default=2000, help="clinic summaries to time")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    data_dir = sandbox.use_data_dir(args.data_dir)
+    rng = random.Random(args.seed)
+    doctors = None
+    setup = {}
+    if args.bookings:
+        t = time.perf_counter()
+        doctors = datagen.generate_doctors(args.doctors, rng)
+        datagen.generate_bookings(args.bookings, doctors, rng, args.days)
+        setup = {"doctors": len(doctors), "bookings": args.bookings,
+                 "generate_s": round(time.perf_counter() - t, 3)}
+
+    result = run(args.new_bookings, args.queries, rng, doctors)
+    report.emit({"env": report.environment(), "data_dir": data_dir, "setup": setup, **result}, args.output)
+
+
+if __name__ == "__main__":
+    main()
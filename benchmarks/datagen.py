@@ -0,0 +1,183 @@
+import argparse
+import csv
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from . import report, sandbox
+
+# Synthetic data at realistic shapes: doctors (directory CSV + counters), registrations
+# (credentials CSV) and bookings (day/clinic partitions), written into a sandbox data dir.
+# Doctors go through the same cleaning, counter reservation and id generation as a bulk
+# import, minus QR rendering (rows are stored without an image unless --with-qr).
+# Run it with the app stopped: booking partitions are filled directly, as the materializer would.
+
+# Registrations all share this password, so a load run can log in as any of them
+PASSWORD = "benchpass123"
+CHUNK = 50_000
+
+FIRST_NAMES = ["Aarav", "Ananya", "Arjun", "Diya", "Ishaan", "Kavya", "Meera", "Nikhil", "Priya", "Rahul",
+               "Riya", "Rohan", "Saanvi", "Sneha", "Tanvi", "Vikram", "Aditi", "Kabir", "Neha", "Siddharth"]
+LAST_NAMES = ["Banerjee", "Bose", "Chatterjee", "Das", "Dutta", "Ghosh", "Gupta", "Iyer", "Kapoor", "Khan",
+              "Mehta", "Mukherjee", "Nair", "Patel", "Rao", "Reddy", "Roy", "Sen", "Sharma", "Tikader"]
+QUALIFICATIONS = ["MBBS", "MBBS, MD", "MBBS, MS", "MBBS, MD (Medicine)", "MBBS, DNB", "BDS", "MBBS, DCH",
+                  "MBBS, MD (Paediatrics)", "MBBS, MS (Ortho)", "MBBS, DGO"]
+CLINIC_WORDS = ["City", "Care", "Life", "Health", "Sunrise", "Green", "Apollo", "Lotus", "Metro", "Prime"]
+STREETS = ["Park Street", "MG Road", "Lake Road", "Station Road", "College Street", "Salt Lake", "Ballygunge"]
+VISIT_DAYS = ["Mon, Wed, Fri", "Tue, Thu", "Mon-Fri", "Sat, Sun", "Mon-Sat", "Wed", "Thu, Sat", "Monday, Tuesday"]
+
+
+def _seed_row(rng: random.Random, clinics: int) -> Dict:
+    clinic = rng.randrange(clinics)
+    return {
+        "doctor_first_name": rng.choice(FIRST_NAMES),
+        "doctor_last_name": rng.choice(LAST_NAMES),
+        "doctor_qualifications": rng.choice(QUALIFICATIONS),
+        "clinic_name": f"{CLINIC_WORDS[clinic % len(CLINIC_WORDS)]} Clinic {clinic}",
+        "clinic_fees": str(rng.randrange(100, 1500, 50)),
+        "clinic_address": f"{rng.randrange(1, 300)} {rng.choice(STREETS)}, Kolkata 700{rng.randrange(1, 160):03d}",
+        "clinic_contact": f"9{rng.randrange(10 ** 8, 10 ** 9)}",
+        "doctor_visit_days": rng.choice(VISIT_DAYS),
+    }
+
+
+def generate_doctors(n: int, rng: random.Random, with_qr: bool = False) -> List[Tuple[str, str, str, str, str, str]]:
+    """Append n doctors; returns (doctor_id, name, qualifications, clinic_id, clinic_name, clinic_address)."""
+    from src.app.db_manager import counter_store, doctor_db_manager, qr_renderer, storage
+
+    doctor_db_manager._ensure_csv()
+    backend = storage.get_backend()
+    clinics = max(1, n // 3)
+    made = []
+    for start in range(0, n, CHUNK):
+        rows = []
+        for _ in range(min(CHUNK, n - start)):
+            clean = doctor_db_manager._clean_doctor_fields(_seed_row(rng, clinics))
+            rows.append((clean,) + doctor_db_manager._counter_keys(clean))
+        clinic_next = counter_store.reserve_many(doctor_db_manager.CLINIC_COUNTER_PATH, Counter(r[1] for r in rows))
+        doctor_next = counter_store.reserve_many(doctor_db_manager.DOCTOR_COUNTER_PATH, Counter(r[2] for r in rows))
+        records = []
+        for clean, clinic_key, doctor_key in rows:
+            ids = doctor_db_manager._generated_ids(clinic_key, clinic_next[clinic_key], doctor_key, doctor_next[doctor_key])
+            clinic_next[clinic_key] += 1
+            doctor_next[doctor_key] += 1
+            qr_filename = doctor_db_manager._make_unique_filename()
+            qr_ref = ""
+            if with_qr:
+                png, qr_ref = qr_renderer.render_stored(doctor_db_manager._generate_qr_payload({**clean, **ids}))
+                doctor_db_manager._write_qr_png(png, qr_filename)
+            records.append(doctor_db_manager._build_record(clean, ids, qr_filename, qr_ref))
+            made.append((ids["doctor_id"], f"{clean['doctor_first_name']} {clean['doctor_last_name']}",
+                         clean["doctor_qualifications"], ids["clinic_id"], clean["clinic_name"],
+                         clean["clinic_address"]))
+        backend.append_doctors(records)
+    return made
+
+
+def generate_registrations(n: int, rng: random.Random) -> int:
+    """Append n credential rows (written straight to the CSV in one pass; emails/licenses are unique)."""
+    from src.app.db_manager import doctor_database_management
+    from src.app.services import password_hasher
+
+    doctor_database_management.ensure_csv()
+    password_hash = password_hasher.hash_password(PASSWORD)
+    tag = f"{int(time.time()):x}"
+    now = datetime.utcnow().isoformat()
+    with open(doctor_database_management.CSV_PATH, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=doctor_database_management.HEADERS)
+        for i in range(n):
+            writer.writerow({
+                "doctor_id": f"D{tag}{i:08d}",
+                "firstname": rng.choice(FIRST_NAMES),
+                "lastname": rng.choice(LAST_NAMES),
+                "email": f"doctor{i}.{tag}@bench.example",
+                "license": f"LIC-{tag}-{i}",
+                "password_hash": password_hash,
+                "created_at": now,
+                "verified": "false",
+            })
+    return n
+
+
+def generate_bookings(n: int, doctors: List[Tuple], rng: random.Random, days: int = 30) -> int:
+    """Spread n bookings over the last `days` days, filling each day/clinic partition in batches."""
+    from src.app.db_manager import booking_store
+
+    if not doctors:
+        return 0
+    now = datetime.utcnow()
+    pending: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+    buffered = 0
+
+    def flush():
+        for key, rows in pending.items():
+            booking_store.append_rows(key, rows, fsync=False)
+        pending.clear()
+
+    for i in range(n):
+        doctor_id, name, quals, clinic_id, clinic_name, clinic_address = rng.choice(doctors)
+        created = now - timedelta(seconds=rng.randrange(days * 86400))
+        row = {
+            "patient_id": f"P{created.strftime('%Y%m%d%H%M%S')}{i:07d}",
+            "patient_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "patient_mobile": f"9{rng.randrange(10 ** 8, 10 ** 9)}",
+            "visit_day": created.strftime("%A"),
+            "clinic_id": clinic_id,
+            "clinic_name": clinic_name,
+            "clinic_address": clinic_address,
+            "doctor_id": doctor_id,
+            "doctor_name": name,
+            "doctor_qualifications": quals,
+            "created_at": created.isoformat(),
+        }
+        pending[booking_store.partition_key(row)].append(row)
+        buffered += 1
+        if buffered >= CHUNK:
+            flush()
+            buffered = 0
+    flush()
+    return n
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic DOCTOPAL data in a sandbox data dir.")
+    parser.add_argument("--data-dir", required=True)
+    parser.add_argument("--doctors", type=int, default=1000)
+    parser.add_argument("--registrations", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=30, help="spread bookings over this many past days")
+    parser.add_argument("--with-qr", action="store_true", help="render a QR PNG per doctor (slow)")
+    parser.add_argument("--sqlite", action="store_true", help="also load everything into the sandbox SQLite store")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    data_dir = sandbox.use_data_dir(args.data_dir)
+    rng = random.Random(args.seed)
+    timings = {}
+
+    t = time.perf_counter()
+    doctors = generate_doctors(args.doctors, rng, args.with_qr)
+    timings["doctors_s"] = round(time.perf_counter() - t, 3)
+    t = time.perf_counter()
+    generate_registrations(args.registrations, rng)
+    timings["registrations_s"] = round(time.perf_counter() - t, 3)
+    t = time.perf_counter()
+    generate_bookings(args.bookings, doctors, rng, args.days)
+    timings["bookings_s"] = round(time.perf_counter() - t, 3)
+    counts = {"doctors": len(doctors), "registrations": args.registrations, "bookings": args.bookings}
+    if args.sqlite:
+        from src.app.db_manager import storage
+        from src.app.db_manager.storage import importer
+        t = time.perf_counter()
+        counts["sqlite"] = importer.import_csv_to_sqlite(storage.DEFAULT_SQLITE_PATH)
+        timings["sqlite_import_s"] = round(time.perf_counter() - t, 3)
+
+    report.emit({"env": report.environment(), "data_dir": data_dir, "counts": counts, "timings": timings},
+                args.output)
+
+
+if __name__ == "__main__":
+    main()
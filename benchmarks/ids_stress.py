@@ -0,0 +1,82 @@
+import argparse
+import multiprocessing
+import threading
+import time
+from typing import Dict, List, Optional
+
+from . import report
+
+# Collision stress test for services.ids: many processes (optionally several threads each)
+# generate IDs flat out for a fixed time; the parent checks that every ID is unique and that
+# each thread's IDs came out in increasing order. Processes are forked, like server workers.
+
+
+def _generate(duration: float, threads: int, results) -> None:
+    from src.app.services import ids
+
+    per_thread: List[List[str]] = [[] for _ in range(threads)]
+    start = threading.Barrier(threads)
+
+    def run(out: List[str]) -> None:
+        start.wait()
+        new_id, append = ids.new_id, out.append  # bound once: the loop is the measurement
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            for _ in range(256):
+                append(new_id())
+
+    workers = [threading.Thread(target=run, args=(out,)) for out in per_thread]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    results.put(per_thread)
+
+
+def run(processes: int, threads: int, duration: float) -> Dict:
+    from src.app.services import ids  # noqa: F401  imported before fork, so children rely on the fork hook
+
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_generate, args=(duration, threads, results)) for _ in range(processes)]
+    for p in procs:
+        p.start()
+    batches = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    seen = set()
+    total = out_of_order = 0
+    for per_thread in batches:
+        for values in per_thread:
+            total += len(values)
+            seen.update(values)
+            out_of_order += sum(1 for a, b in zip(values, values[1:]) if b <= a)
+    return {
+        "processes": processes,
+        "threads_per_process": threads,
+        "duration_s": duration,
+        "ids": total,
+        "collisions": total - len(seen),
+        "out_of_order_within_thread": out_of_order,
+        "ids_per_s": round(total / duration, 1),
+        "ids_per_s_per_process": round(total / duration / processes, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Check services.ids for collisions under load.")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=2, help="generator threads per process")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    result = run(args.processes, args.threads, args.duration)
+    report.emit({"env": report.environment(), **result}, args.output)
+    if result["collisions"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
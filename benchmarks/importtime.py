@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+from typing import Dict, List, Optional
+
+from . import report
+
+# Cold-start cost of a worker: `import src.app`, then create_app(), each in a fresh
+# interpreter, repeated. Also records which heavy libraries the import pulled in and the
+# slowest modules from `python -X importtime`. --compare REV runs the same probe against a
+# `git archive` of another commit, e.g. the one before lazy imports.
+
+HEAVY = ("numpy", "pandas", "qrcode", "PIL")
+
+_PROBE = r"""
+import contextlib, io, json, os, sys, time
+t0 = time.perf_counter()
+import src.app
+t1 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    app = src.app.create_app()
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "create_app_s": t2 - t1,
+                  "heavy_loaded": sorted(m for m in %r if m in sys.modules)}))
+"""
+
+
+def _env(data_dir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    # keep startup deterministic and off the real data
+    env.update(DOCTOPAL_DATA_DIR=data_dir, DOCTOPAL_KDF_CALIBRATE="0", DOCTOPAL_SEARCH_WARM="0",
+               DOCTOPAL_BACKGROUND_THREADS="0", PYTHONDONTWRITEBYTECODE="1")
+    env.pop("PYTHONPATH", None)
+    return env
+
+
+def _slowest_imports(root: str, env: Dict[str, str], top: int) -> List[Dict]:
+    """Packages by total self import time of their modules (the log is in microseconds)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import src.app"], cwd=root,
+                          env=env, capture_output=True, text=True, check=True)
+    totals: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            package = name.strip().split(".")[0]
+            totals[package] = totals.get(package, 0) + int(own)
+    ranked = sorted(totals.items(), key=lambda kv: -kv[1])[:top]
+    return [{"package": name, "self_ms": round(us / 1000.0, 1)} for name, us in ranked]
+
+
+def measure(root: str, repeat: int, top: int) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="doctopal-importtime-") as data_dir:
+        env = _env(data_dir)
+        runs = []
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, "-c", _PROBE % (HEAVY,)], cwd=root, env=env,
+                                  capture_output=True, text=True, check=True)
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        slowest = _slowest_imports(root, env, top)
+    return {
+        "import": report.summarize([r["import_s"] for r in runs]),
+        "create_app": report.summarize([r["create_app_s"] for r in runs]),
+        "heavy_loaded_on_import": runs[-1]["heavy_loaded"],
+        "slowest_imports": slowest,
+    }
+
+
+def _export(rev: str, dest: str) -> None:
+    archive = os.path.join(dest, "tree.tar")
+    subprocess.run(["git", "archive", "--format=tar", "-o", archive, rev], cwd=report.ROOT, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(dest)
+    os.remove(archive)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Cold import and create_app() time of the DOCTOPAL app.")
+    parser.add_argument("--repeat", type=int, default=10, help="fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--compare", metavar="REV", help="also measure this git revision")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    result = {"env": report.environment(), "repeat": args.repeat,
+              "results": {"working_tree": measure(report.ROOT, args.repeat, args.top)}}
+    if args.compare:
+        with tempfile.TemporaryDirectory(prefix="doctopal-rev-") as tree:
+            _export(args.compare, tree)
+            result["results"][args.compare] = measure(tree, args.repeat, args.top)
+    report.emit(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from http.cookiejar import CookieJar
+from socketserver import ThreadingMixIn
+from typing import Dict, List, Optional, Tuple
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from . import datagen, report, sandbox
+
+# Concurrent load driver. Each scenario runs as its own phase: N virtual users (threads), each
+# with its own cookie session, loop over the scenario until the duration is up. Requests go
+# through the Flask test client (default) or a threaded wsgiref server on a local port
+# (--server), which adds real HTTP parsing and sockets. Every request step and each whole
+# scenario iteration gets throughput and p50/p95/p99 latency in the JSON report.
+#
+# OTP rate limits are lifted for the run: every virtual user shares one client address, and
+# the point is to measure the booking path, not the limiter rejecting it.
+
+SCENARIOS = ("clinic_booking", "booking_flow", "register")
+QR_SAMPLE = 10_000
+
+
+class _ClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method: str, path: str, form: Optional[Dict] = None, json_body: Optional[Dict] = None):
+        resp = self.client.open(path, method=method, data=form, json=json_body)
+        return resp.status_code, resp.get_json(silent=True)
+
+
+class _HttpSession:
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def request(self, method: str, path: str, form: Optional[Dict] = None, json_body: Optional[Dict] = None):
+        data, headers = None, {}
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers["Content-Type"] = "application/json"
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                status, body = resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        try:
+            return status, json.loads(body)
+        except ValueError:
+            return status, None
+
+
+class _ThreadingServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _Recorder:
+    """Per-thread latency lists, merged once the phase is over (no lock on the hot path)."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def step(self, name: str, session, method: str, path: str, expect: Tuple[int, ...] = (200,), **kwargs):
+        t = time.perf_counter()
+        status, body = session.request(method, path, **kwargs)
+        self.latencies[name].append(time.perf_counter() - t)
+        if status not in expect:
+            self.errors[name] += 1
+            return None
+        return body if body is not None else {}
+
+
+def _clinic_booking(rec: _Recorder, session, ctx: Dict, rng: random.Random, n: int) -> bool:
+    qr = rng.choice(ctx["qrs"])
+    return rec.step("GET /clinic-booking", session, "GET", f"/clinic-booking?qr={urllib.parse.quote(qr)}") is not None
+
+
+def _booking_flow(rec: _Recorder, session, ctx: Dict, rng: random.Random, n: int) -> bool:
+    mobile = f"9{n % 10 ** 9:09d}"
+    sent = rec.step("POST /send-otp", session, "POST", "/send-otp", form={"mobile": mobile})
+    if not sent:
+        return False
+    if rec.step("POST /verify-otp", session, "POST", "/verify-otp", form={"otp": sent["otp"]}) is None:
+        return False
+    form = {"qr": rng.choice(ctx["qrs"]), "patient_name": f"Load Patient {n}", "doctor_visit_day": "Monday"}
+    return rec.step("POST /submit-booking", session, "POST", "/submit-booking", form=form) is not None
+
+
+def _register(rec: _Recorder, session, ctx: Dict, rng: random.Random, n: int) -> bool:
+    body = {"firstname": "Load", "lastname": "Doctor", "email": f"load{n}.{ctx['tag']}@bench.example",
+            "license": f"LOAD-{ctx['tag']}-{n}", "password": datagen.PASSWORD}
+    return rec.step("POST /doctor-register", session, "POST", "/doctor-register", expect=(201,),
+                    json_body=body) is not None
+
+
+_RUNNERS = {"clinic_booking": _clinic_booking, "booking_flow": _booking_flow, "register": _register}
+
+
+def run_phase(scenario: str, make_session, ctx: Dict, users: int, duration: float,
+              iterations: Optional[int], seed: int) -> Dict:
+    runner = _RUNNERS[scenario]
+    counter = itertools.count()
+    recorders = [_Recorder() for _ in range(users)]
+    deadline = time.perf_counter() + duration
+
+    def user(i: int):
+        rec, session, rng = recorders[i], make_session(), random.Random(seed * 1000 + i)
+        while time.perf_counter() < deadline:
+            n = next(counter)
+            if iterations is not None and n >= iterations:
+                break
+            t = time.perf_counter()
+            ok = runner(rec, session, ctx, rng, n)
+            rec.latencies[scenario].append(time.perf_counter() - t)
+            if not ok:
+                rec.errors[scenario] += 1
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(users)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    merged: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    for rec in recorders:
+        for name, values in rec.latencies.items():
+            merged[name].extend(values)
+        for name, count in rec.errors.items():
+            errors[name] += count
+    # the scenario line counts whole iterations; the others are its individual requests
+    return {name: report.summarize(values, wall, errors[name]) for name, values in merged.items()}
+
+
+def _sample_qrs(limit: int) -> List[str]:
+    from src.app.db_manager import storage
+    qrs = []
+    for row in storage.get_backend().iter_doctors():
+        if row.get("qr_filename"):
+            qrs.append(row["qr_filename"])
+            if len(qrs) >= limit:
+                break
+    return qrs
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Concurrent load test of the main DOCTOPAL routes.")
+    parser.add_argument("--data-dir", required=True, help="sandbox data dir (see benchmarks.datagen)")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="run only these (repeatable)")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--iterations", type=int, help="stop a scenario after this many iterations")
+    parser.add_argument("--server", action="store_true", help="go through a local threaded WSGI server")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    data_dir = sandbox.use_data_dir(args.data_dir, args.backend)
+    # registration needs a stable key to sign verification links
+    os.environ.setdefault("FLASK_SECRET_KEY", "doctopal-load-benchmark")
+    from src.app import create_app
+    from src.app.services import otp
+
+    # route debug prints would interleave with a JSON report on stdout
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        app = create_app()
+    otp._settings.update(ip_send=(10 ** 9, 1e-9), ip_verify=(10 ** 9, 1e-9))
+    ctx = {"qrs": _sample_qrs(QR_SAMPLE), "tag": f"{int(time.time()):x}"}
+    if not ctx["qrs"]:
+        parser.error(f"no doctors in {data_dir}; run benchmarks.datagen first")
+
+    server = None
+    if args.server:
+        server = make_server("127.0.0.1", 0, app, server_class=_ThreadingServer, handler_class=_QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        make_session = lambda: _HttpSession(base_url)
+    else:
+        make_session = lambda: _ClientSession(app)
+
+    results = {}
+    try:
+        for scenario in args.scenario or SCENARIOS:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results[scenario] = run_phase(scenario, make_session, ctx, args.users, args.duration,
+                                              args.iterations, args.seed)
+    finally:
+        if server is not None:
+            server.shutdown()
+    report.emit({
+        "env": report.environment(),
+        "data_dir": data_dir,
+        "backend": args.backend,
+        "transport": "wsgi-server" if args.server else "test-client",
+        "users": args.users,
+        "duration_s": args.duration,
+        "doctors_sampled": len(ctx["qrs"]),
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import contextlib
+import os
+import random
+import time
+from typing import Callable, Dict
+
+from . import datagen, report, sandbox
+
+# Single-threaded micro-benchmarks of the hot write/validate paths, timed per call.
+# append_doctor_record prints its input; that output is discarded but still paid for.
+
+WARMUP = 5
+
+
+def _time(fn: Callable[[int], None], n: int) -> Dict:
+    latencies = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(WARMUP):
+            fn(-1 - i)
+        start = time.perf_counter()
+        for i in range(n):
+            t = time.perf_counter()
+            fn(i)
+            latencies.append(time.perf_counter() - t)
+    return report.summarize(latencies, time.perf_counter() - start)
+
+
+def bench_append_doctor_record(n: int, rng: random.Random) -> Dict:
+    from src.app.db_manager import doctor_db_manager
+    return _time(lambda i: doctor_db_manager.append_doctor_record(datagen._seed_row(rng, 1000)), n)
+
+
+def bench_validate_registration(n: int, rng: random.Random) -> Dict:
+    from src.app.db_manager import doctor_database_management
+
+    # fresh email and license each call, so both uniqueness lookups miss (the common case)
+    return _time(lambda i: doctor_database_management.validate_registration({
+        "firstname": "Bench", "lastname": "User", "email": f"micro{i}.{rng.random()}@bench.example",
+        "license": f"MICRO-{rng.getrandbits(40):x}", "password": datagen.PASSWORD,
+    }), n)
+
+
+def bench_increment_counter(n: int, rng: random.Random) -> Dict:
+    from src.app.db_manager import doctor_db_manager
+    keys = [f"MICRO_{k}" for k in range(64)]
+    return _time(lambda i: doctor_db_manager._increment_counter_for(
+        rng.choice(keys), doctor_db_manager.DOCTOR_COUNTER_PATH), n)
+
+
+def bench_qr_render(n: int, rng: random.Random) -> Dict:
+    from src.app.db_manager import doctor_db_manager, qr_renderer
+    fields = {**datagen._seed_row(rng, 1000), "doctor_id": "DOCID_BENCH_1", "clinic_id": "CLINID_BENCH_1"}
+
+    def call(i):
+        # a distinct payload per call, as every seed has
+        qr_renderer.render_png(doctor_db_manager._generate_qr_payload({**fields, "DOCLID": f"DOCLID_{i}"}))
+    return _time(call, n)
+
+
+BENCHMARKS = {
+    "append_doctor_record": bench_append_doctor_record,
+    "validate_registration": bench_validate_registration,
+    "increment_counter": bench_increment_counter,
+    "qr_render": bench_qr_render,
+}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of DOCTOPAL write and validation paths.")
+    parser.add_argument("--data-dir", required=True, help="sandbox data dir (see benchmarks.datagen)")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="run only these (repeatable)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    data_dir = sandbox.use_data_dir(args.data_dir, args.backend)
+    rng = random.Random(args.seed)
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results[name] = BENCHMARKS[name](args.iterations, rng)
+    report.emit({"env": report.environment(), "data_dir": data_dir, "backend": args.backend,
+                 "iterations": args.iterations, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], wall_seconds: Optional[float] = None, errors: int = 0) -> Dict:
+    """Latencies in seconds -> counts, throughput and p50/p95/p99 in milliseconds."""
+    values = sorted(latencies)
+    n = len(values)
+    wall = wall_seconds if wall_seconds is not None else sum(values)
+    ms = lambda s: round(s * 1000.0, 3)
+    return {
+        "count": n,
+        "errors": errors,
+        "throughput_per_s": round(n / wall, 2) if wall > 0 else 0.0,
+        "mean_ms": ms(sum(values) / n) if n else 0.0,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if n else 0.0,
+    }
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+
+
+def emit(result: Dict, output: Optional[str]) -> None:
+    text = json.dumps(result, indent=2, sort_keys=False)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
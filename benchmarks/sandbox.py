@@ -0,0 +1,24 @@
+import os
+
+# Point every on-disk path of the app at a scratch directory, so generated data and benchmark
+# writes never touch the real CSVs. Must run before create_app() and before any data is read.
+
+
+def use_data_dir(data_dir: str, backend: str = "csv") -> str:
+    data_dir = os.path.abspath(data_dir)
+    os.makedirs(data_dir, exist_ok=True)
+    # create_app() reads these, and re-applies the same layout
+    os.environ["DOCTOPAL_DATA_DIR"] = data_dir
+    os.environ["DOCTOPAL_STORAGE"] = backend
+    os.environ.pop("DOCTOPAL_SQLITE_PATH", None)
+    os.environ.pop("DOCTOPAL_OTP_SQLITE_PATH", None)
+    os.environ.pop("DOCTOPAL_ANALYTICS_SQLITE_PATH", None)
+
+    from src.app.db_manager import data_paths, storage
+
+    # the tools also call storage functions directly, without an app
+    data_paths.configure(data_dir)
+    data_paths.ensure_dirs()
+    storage.DEFAULT_BACKEND = backend
+    storage.configure(backend)
+    return data_dir
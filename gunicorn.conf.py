@@ -0,0 +1,50 @@
+import gc
+import os
+
+# gunicorn -c gunicorn.conf.py
+#
+# The app is imported once in the master (preload_app) and warmed there: heavy imports, the
+# doctor/credential indexes, the search index and availability snapshot are built before
+# fork, so workers share those pages copy-on-write instead of each rebuilding them.
+# Background threads cannot cross fork(), so they start per worker in post_fork. Work that
+# must happen once per server start (rendering QR codes a crash left pending) runs in the
+# master before fork, not in every worker.
+
+os.environ.setdefault("DOCTOPAL_BACKGROUND_THREADS", "0")
+# a client's requests (and retries) land on any worker, so sessions, OTPs and stored
+# idempotent responses must be shared between them
+os.environ.setdefault("DOCTOPAL_SESSION_BACKEND", "sqlite")
+os.environ.setdefault("DOCTOPAL_OTP_BACKEND", "sqlite")
+os.environ.setdefault("DOCTOPAL_IDEMPOTENCY_BACKEND", "sqlite")
+
+wsgi_app = "manage:app"
+bind = os.environ.get("DOCTOPAL_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+preload_app = True
+
+# per-process stores would give each worker its own sessions, OTPs and stored responses
+if workers > 1:
+    for _var in ("DOCTOPAL_SESSION_BACKEND", "DOCTOPAL_OTP_BACKEND", "DOCTOPAL_IDEMPOTENCY_BACKEND"):
+        if os.environ[_var] == "memory":
+            raise RuntimeError(f"{_var}=memory cannot be shared by {workers} workers; use sqlite")
+
+
+def when_ready(server):
+    from src.app import recover, warmup
+    from manage import app
+
+    timings = warmup(app)
+    server.log.info("warmup: %s", ", ".join(f"{k}={v:.3f}s" for k, v in timings.items()))
+    recovered = recover(app)
+    if recovered:
+        server.log.info("recovery: %s", recovered)
+    # keep the warmed objects out of the collector, so gc passes in workers do not touch
+    # (and un-share) their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from src.app import start_background
+    from manage import app
+
+    start_background(app, recover=False)
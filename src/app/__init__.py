@@ -8,11 +8,21 @@ def create_app():
     return app'''
 
 import os
+import time
 from flask import Flask
 from .main import bp as main_bp
+from .commands import register_commands
+from .db_manager import availability, booking_analytics, booking_journal, data_paths, qr_jobs, search_index, storage
+from .services import ids, idempotency, metrics, notify, otp, page_cache, password_hasher, sessions
 
-def create_app():
+# Importing the app stays cheap: qrcode/PIL, NumPy and pandas load on first use and nothing
+# touches the filesystem until create_app(). warmup() front-loads those costs, e.g. once in
+# a pre-forking server's master (see gunicorn.conf.py).
+
+def create_app(config=None):
     app = Flask(__name__, instance_relative_config=True)
+    if config:
+        app.config.update(config)
 
     # Load secret key from environment for production; keep a development fallback.
     # In production set FLASK_SECRET_KEY to a strong random value (do NOT commit it).
@@ -26,11 +36,160 @@ def create_app():
             secret = "dev"
 
     app.config.from_mapping(SECRET_KEY=secret)
+    # a generated key differs per process and per restart: nothing signed with it (such as
+    # the 7-day email verification links) may outlive the request
+    app.config["SECRET_KEY_EPHEMERAL"] = not os.environ.get("FLASK_SECRET_KEY")
 
     # Optional recommended session cookie hardening (safe defaults; adjust for your environment)
     app.config.setdefault("SESSION_COOKIE_HTTPONLY", True)
     # Set SESSION_COOKIE_SECURE=True when running over HTTPS in production
     app.config.setdefault("SESSION_COOKIE_SECURE", False)
 
+    # Data directory for every CSV, journal, blob and QR file; unset keeps the in-tree layout
+    app.config.setdefault("DATA_DIR", os.environ.get("DOCTOPAL_DATA_DIR") or None)
+    data_paths.configure(app.config["DATA_DIR"])
+    data_paths.ensure_dirs()
+
+    # Session data: "memory" (per process; the default, fine for a single process only),
+    # "sqlite" (shared by all workers on this host, what gunicorn.conf.py uses) or "cookie"
+    # (Flask's signed cookie); the first two keep only a session ID in the cookie
+    app.config.setdefault("SESSION_BACKEND", sessions._settings["backend"])
+    app.config.setdefault("SESSION_TTL", sessions._settings["ttl"])
+    app.config.setdefault("SESSION_SQLITE_PATH", sessions._settings["sqlite_path"])
+    sessions.configure(app.config["SESSION_BACKEND"], app.config["SESSION_SQLITE_PATH"], app.config["SESSION_TTL"])
+    sessions.init_app(app)
+
+    # Distinguishes hosts in generated IDs when several share one data store (0-255)
+    app.config.setdefault("NODE_ID", int(os.environ.get("DOCTOPAL_NODE_ID", "0")))
+    ids.configure(app.config["NODE_ID"])
+
+    # Storage backend for doctors, credentials and bookings: "csv" (default) or "sqlite"
+    app.config.setdefault("STORAGE_BACKEND", storage.DEFAULT_BACKEND)
+    app.config.setdefault("SQLITE_PATH", storage.DEFAULT_SQLITE_PATH)
+    storage.configure(app.config["STORAGE_BACKEND"], app.config["SQLITE_PATH"])
+
+    # CSV bookings are group-committed to a journal; "fsync" or "write" (see booking_journal)
+    app.config.setdefault("BOOKING_DURABILITY", booking_journal._settings["durability"])
+    booking_journal.configure(durability=app.config["BOOKING_DURABILITY"],
+                              commit_window_ms=app.config.get("BOOKING_COMMIT_WINDOW_MS"))
+
+    # Render /doctor-seed QR codes in a background pool instead of inside the request
+    app.config.setdefault("QR_ASYNC", os.environ.get("DOCTOPAL_QR_ASYNC", "0") == "1")
+    if app.config["QR_ASYNC"]:
+        qr_jobs.configure(app.config.get("QR_WORKERS"), app.config.get("QR_QUEUE_SIZE"))
+
+    # Background threads do not survive fork(); a pre-forking server turns this off and calls
+    # start_background() in each worker instead
+    app.config.setdefault("BACKGROUND_THREADS", os.environ.get("DOCTOPAL_BACKGROUND_THREADS", "1") == "1")
+    if app.config["BACKGROUND_THREADS"]:
+        start_background(app)
+
+    # Password KDF: the cost is calibrated to ~PASSWORD_KDF_TARGET_MS (never below the security
+    # floor) by warmup(), or lazily by the first hash. Set PASSWORD_KDF_CALIBRATE=True to
+    # calibrate here instead, e.g. for a server started without warmup().
+    app.config.setdefault("PASSWORD_KDF_TARGET_MS", password_hasher._settings["target_ms"])
+    app.config.setdefault("PASSWORD_KDF_CALIBRATE", os.environ.get("DOCTOPAL_KDF_CALIBRATE", "0") == "1")
+    password_hasher.configure(target_ms=app.config["PASSWORD_KDF_TARGET_MS"],
+                              workers=app.config.get("PASSWORD_KDF_WORKERS"),
+                              max_queue=app.config.get("PASSWORD_KDF_MAX_QUEUE"))
+    if app.config["PASSWORD_KDF_CALIBRATE"]:
+        password_hasher.calibrate()
+
+    # Booking OTPs: "memory" (per process) or "sqlite" (shared by all workers on this host)
+    app.config.setdefault("OTP_BACKEND", otp._settings["backend"])
+    app.config.setdefault("OTP_SQLITE_PATH", otp._settings["sqlite_path"])
+    otp.configure(app.config["OTP_BACKEND"], app.config["OTP_SQLITE_PATH"],
+                  ttl=app.config.get("OTP_TTL"), max_attempts=app.config.get("OTP_MAX_ATTEMPTS"))
+    # Echo the code in the /send-otp response (the booking page checks it client-side); the
+    # SMS is queued either way
+    app.config.setdefault("OTP_IN_RESPONSE", os.environ.get("DOCTOPAL_OTP_IN_RESPONSE", "1") == "1")
+
+    # OTP SMS and registration email go through background workers; routes only enqueue.
+    # NOTIFY_OUTBOX is where the stand-in provider writes ("-": stdout, for tests; unset: the
+    # outbox file in the data directory)
+    app.config.setdefault("NOTIFY_OUTBOX", os.environ.get("DOCTOPAL_NOTIFY_OUTBOX"))
+    notify.configure(workers=app.config.get("NOTIFY_WORKERS"), batch_size=app.config.get("NOTIFY_BATCH_SIZE"),
+                     max_attempts=app.config.get("NOTIFY_MAX_ATTEMPTS"), outbox=app.config["NOTIFY_OUTBOX"])
+
+    # Clinic booking analytics: where the aggregates live, and how stale the dashboard may read
+    # them before it starts a full refresh in the background (seconds)
+    app.config.setdefault("ANALYTICS_SQLITE_PATH", booking_analytics._settings["sqlite_path"])
+    app.config.setdefault("ANALYTICS_REFRESH_INTERVAL", booking_analytics._settings["refresh_interval"])
+    booking_analytics.configure(app.config["ANALYTICS_SQLITE_PATH"], app.config["ANALYTICS_REFRESH_INTERVAL"])
+
+    # Doctor search index: load the snapshot (or build it) now rather than on the first query
+    app.config.setdefault("SEARCH_INDEX_WARM", os.environ.get("DOCTOPAL_SEARCH_WARM", "1") == "1")
+    if app.config["SEARCH_INDEX_WARM"]:
+        search_index.warm()
+
+    # Rendered /clinic-booking pages, LRU-bounded by total bytes (0 disables)
+    app.config.setdefault("PAGE_CACHE_BYTES", page_cache.DEFAULT_MAX_BYTES)
+    page_cache.configure(app.config["PAGE_CACHE_BYTES"])
+
+    # Stored responses for retried POSTs carrying an Idempotency-Key header: "memory" (per
+    # process) or "sqlite" (shared by all workers on this host)
+    app.config.setdefault("IDEMPOTENCY_BACKEND", idempotency._settings["backend"])
+    app.config.setdefault("IDEMPOTENCY_SQLITE_PATH", idempotency._settings["sqlite_path"])
+    app.config.setdefault("IDEMPOTENCY_TTL", idempotency._settings["ttl"])
+    app.config.setdefault("IDEMPOTENCY_MAX_ENTRIES", idempotency._settings["max_entries"])
+    idempotency.configure(app.config["IDEMPOTENCY_TTL"], app.config["IDEMPOTENCY_MAX_ENTRIES"],
+                          backend=app.config["IDEMPOTENCY_BACKEND"],
+                          sqlite_path=app.config["IDEMPOTENCY_SQLITE_PATH"])
+
+    # Request latency/status histograms and storage counters, served at /metrics
+    app.config.setdefault("METRICS_ENABLED", os.environ.get("DOCTOPAL_METRICS", "1") == "1")
+    if app.config["METRICS_ENABLED"]:
+        metrics.init_app(app)
+
     app.register_blueprint(main_bp)
+    register_commands(app)
     return app
+
+
+def start_background(app, recover: bool = True):
+    """
+    Start this process's journal flusher/materializer and QR job pool. `recover` also renders
+    QR rows a previous run left pending; a pre-forking server does that once, in recover().
+    """
+    if app.config["STORAGE_BACKEND"] == "csv":
+        booking_journal.start()
+    if app.config["QR_ASYNC"]:
+        qr_jobs.start(recover=recover)
+
+
+def recover(app):
+    """One-off recovery for a whole server, run before workers start: pending QR renders."""
+    if not app.config["QR_ASYNC"]:
+        return {}
+    with app.app_context():
+        return {"qr_renders": qr_jobs.recover_pending()}
+
+
+def _import_heavy():
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import qrcode.image.pil  # noqa: F401
+    from PIL import Image, PngImagePlugin  # noqa: F401
+
+
+def warmup(app):
+    """
+    Pay one-off costs up front: heavy imports, the directory and credential indexes, the
+    search index, the availability snapshot and KDF calibration. Returns seconds per step.
+    """
+    backend = storage.get_backend()
+    steps = {
+        "imports": _import_heavy,
+        "directory_index": lambda: backend.get_doctor_by_qr(""),
+        "credential_index": lambda: backend.find_credential_by_email(""),
+        "search_index": search_index.warm,
+        "availability": availability.warm,
+        "kdf_calibration": password_hasher.calibrate,
+    }
+    timings = {}
+    with app.app_context():
+        for name, fn in steps.items():
+            t = time.perf_counter()
+            fn()
+            timings[name] = round(time.perf_counter() - t, 4)
+    return timings
@@ -0,0 +1,156 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .db_manager import (
+    booking_analytics,
+    booking_journal,
+    bulk_import,
+    doctor_database_management,
+    doctor_db_manager,
+    qr_blob_store,
+    search_index,
+)
+from .db_manager.storage import importer
+from .services import notify, password_hasher
+
+
+@click.command("migrate-qr-blobs")
+def migrate_qr_blobs_command():
+    """Move inline base64 QR images out of the doctor CSV into the blob store."""
+    stats = qr_blob_store.migrate_csv(doctor_db_manager.CSV_PATH, doctor_db_manager.CSV_FIELDS)
+    if not stats["rows"]:
+        click.echo("Nothing to migrate.")
+        return
+    click.echo(
+        f"Migrated {stats['rows']} rows ({stats['blobs']} blobs): "
+        f"{stats['bytes_before']} -> {stats['bytes_after']} bytes"
+    )
+
+
+@click.command("import-sqlite")
+@click.option("--path", default=None, help="SQLite file to (re)populate; defaults to SQLITE_PATH.")
+@with_appcontext
+def import_sqlite_command(path):
+    """Copy the CSV doctor directory, credentials and booking files into SQLite."""
+    path = path or current_app.config["SQLITE_PATH"]
+    counts = importer.import_csv_to_sqlite(path)
+    click.echo(
+        f"Imported {counts['doctors']} doctors, {counts['credentials']} credentials, "
+        f"{counts['bookings']} bookings into {path} (skipped {counts['duplicates']} duplicates)"
+    )
+
+
+@click.command("import-doctors")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default=None,
+              help="Input format; guessed from the file extension by default.")
+@click.option("--workers", type=int, default=None, help="QR rendering processes (default: CPU count).")
+@with_appcontext
+def import_doctors_command(path, fmt, workers):
+    """Bulk-import doctors from a CSV or JSONL file of /doctor-seed fields."""
+    fmt = fmt or bulk_import.detect_format(path)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        report = bulk_import.import_doctors(f, fmt, workers=workers)
+    for e in report["errors"]:
+        click.echo(f"line {e['line']}: {e['error']}", err=True)
+    stages = ", ".join(f"{k} {v}s" for k, v in report["stages"].items())
+    click.echo(
+        f"Imported {report['imported']}/{report['rows']} rows in {report['seconds']}s "
+        f"({report['rows_per_sec']} rows/s; {stages}; {report['workers']} workers)"
+    )
+
+
+@click.command("materialize-bookings")
+def materialize_bookings_command():
+    """Copy committed bookings from the journal into the booking partitions now."""
+    click.echo(f"Materialized {booking_journal.materialize()} bookings")
+
+
+@click.command("migrate-bookings")
+def migrate_bookings_command():
+    """Move flat per-clinic-per-day booking CSVs into the partitioned booking store."""
+    stats = booking_journal.migrate_legacy()
+    click.echo(f"Moved {stats['rows']} bookings from {stats['files']} files into partitions")
+
+
+@click.command("backfill-visit-days")
+@with_appcontext
+def backfill_visit_days_command():
+    """Parse doctor_visit_days into visit_days_mask for rows written before the column existed."""
+    click.echo(f"Backfilled visit_days_mask on {doctor_db_manager.backfill_visit_days_masks()} doctors")
+
+
+@click.command("build-search-index")
+@with_appcontext
+def build_search_index_command():
+    """Rebuild the doctor search index from the directory and write its snapshot."""
+    search_index.rebuild()
+    click.echo(f"Indexed {search_index.save_snapshot()} directory rows into {search_index.SNAPSHOT_PATH}")
+
+
+@click.command("kdf-bench")
+@click.option("--seconds", type=float, default=1.0, show_default=True, help="Time spent on each cost setting.")
+def kdf_bench_command(seconds):
+    """Report password hashes/sec per core for each KDF cost setting."""
+    for r in password_hasher.benchmark(seconds):
+        click.echo(f"{r['algorithm']:<14} cost={r['cost']:<8} {r['hashes_per_sec_per_core']:>8} hashes/s/core "
+                   f"({r['ms_per_hash']} ms/hash)")
+    click.echo(f"calibrated: {password_hasher.calibrate()}")
+
+
+@click.command("gc-qr")
+@click.option("--min-age", type=float, default=3600, show_default=True,
+              help="Keep files younger than this many seconds (seeds in flight).")
+@click.option("--dry-run", is_flag=True, help="Only report what would be removed.")
+@with_appcontext
+def gc_qr_command(min_age, dry_run):
+    """Delete QR PNGs (static/qr and blobs) that no directory row references, and old qr_cache/ pointers."""
+    stats = doctor_db_manager.gc_qr_images(min_age=min_age, dry_run=dry_run)
+    verb = "would remove" if dry_run else "removed"
+    for where, s in stats.items():
+        click.echo(f"{where}: {verb} {s['removed']} files ({s['bytes']} bytes), kept {s['kept']}")
+
+
+@click.command("rebuild-analytics")
+@with_appcontext
+def rebuild_analytics_command():
+    """Recount the clinic booking analytics from every booking, at current fees."""
+    stats = booking_analytics.rebuild()
+    click.echo(f"Counted {stats['bookings']} bookings in {stats['seconds']}s ({stats['rows_per_sec']} rows/s)")
+
+
+@click.command("notify-replay")
+def notify_replay_command():
+    """Re-send dead-lettered notifications (waits up to a minute for delivery)."""
+    queued = notify.replay_dead_letters()
+    delivered = notify.drain(timeout=60)
+    click.echo(f"Re-queued {queued} notifications" + ("" if delivered else "; some are still pending"))
+
+
+@click.command("link-doctor")
+@click.argument("email")
+@click.argument("directory_doctor_id")
+@with_appcontext
+def link_doctor_command(email, directory_doctor_id):
+    """Let the login EMAIL read the bookings of DIRECTORY_DOCTOR_ID's clinic."""
+    try:
+        doctor = doctor_database_management.link_directory_doctor(email, directory_doctor_id)
+    except ValueError as ve:
+        raise click.ClickException(str(ve))
+    click.echo(f"Linked {email} to {directory_doctor_id} ({doctor.get('clinic_id')}); takes effect at next login")
+
+
+def register_commands(app):
+    app.cli.add_command(migrate_qr_blobs_command)
+    app.cli.add_command(import_sqlite_command)
+    app.cli.add_command(import_doctors_command)
+    app.cli.add_command(materialize_bookings_command)
+    app.cli.add_command(migrate_bookings_command)
+    app.cli.add_command(backfill_visit_days_command)
+    app.cli.add_command(build_search_index_command)
+    app.cli.add_command(kdf_bench_command)
+    app.cli.add_command(gc_qr_command)
+    app.cli.add_command(rebuild_analytics_command)
+    app.cli.add_command(notify_replay_command)
+    app.cli.add_command(link_doctor_command)
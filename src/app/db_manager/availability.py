@@ -0,0 +1,102 @@
+import threading
+from typing import Dict, List, Optional
+
+from . import storage, weekdays
+
+# Availability search ("who sees patients on Thursday, MD, fee <= 500").
+#
+# The directory is turned into a columnar snapshot once per storage version: a uint8 weekday
+# mask, a float fee (NaN when blank or not a number) and lowercased qualifications, next to a
+# frame holding the display columns. Each query is then a few NumPy/pandas boolean masks over
+# those arrays instead of a Python loop over rows. NumPy and pandas load on first use.
+
+RESULT_FIELDS = [
+    "doctor_id",
+    "doctor_first_name",
+    "doctor_last_name",
+    "doctor_qualifications",
+    "clinic_id",
+    "clinic_name",
+    "clinic_address",
+    "clinic_fees",
+    "qr_filename",
+]
+
+
+class _Snapshot:
+    def __init__(self, records: List[Dict]):
+        import numpy as np
+        import pandas as pd
+        self.frame = pd.DataFrame.from_records(records, columns=RESULT_FIELDS).fillna("")
+        stored = pd.to_numeric(pd.Series([r.get("visit_days_mask") for r in records], dtype=object),
+                               errors="coerce")
+        masks = stored.to_numpy(dtype=float, copy=True)
+        # rows not backfilled yet are parsed here, once per snapshot
+        for i in np.flatnonzero(np.isnan(masks)):
+            masks[i] = weekdays.parse_visit_days(records[i].get("doctor_visit_days", ""))
+        self.masks = masks.astype(np.uint8) & weekdays.ALL_DAYS
+        self.fees = pd.to_numeric(self.frame["clinic_fees"], errors="coerce").to_numpy(dtype=float)
+        self.quals = self.frame["doctor_qualifications"].astype(str).str.lower()
+
+
+_lock = threading.Lock()
+_snapshot: Optional[_Snapshot] = None
+_version = object()
+
+
+def _build() -> _Snapshot:
+    records, seen = [], set()
+    for r in storage.get_backend().iter_doctors():
+        # one row per doctor_id, the first, as in every other lookup
+        doctor_id = r.get("doctor_id", "")
+        if doctor_id in seen:
+            continue
+        seen.add(doctor_id)
+        records.append(r)
+    return _Snapshot(records)
+
+
+def _get() -> _Snapshot:
+    global _snapshot, _version
+    version = storage.get_backend().doctors_version()
+    if version is not None and version == _version:
+        return _snapshot
+    with _lock:
+        if version is None or version != _version:
+            _snapshot, _version = _build(), version
+        return _snapshot
+
+
+def warm() -> None:
+    """Build the snapshot now instead of on the first search."""
+    _get()
+
+
+def invalidate() -> None:
+    global _version
+    with _lock:
+        _version = object()
+
+
+def search(day: int, qualification: str = "", max_fee: Optional[float] = None,
+           limit: int = 50, offset: int = 0) -> Dict:
+    """
+    Doctors visiting on weekday `day` (0 = Monday), optionally with a qualification
+    (case-insensitive substring) and a fee cap; cheapest first, unknown fees last.
+    """
+    import numpy as np
+    snap = _get()
+    selected = (snap.masks & np.uint8(1 << day)) != 0
+    if qualification:
+        selected &= snap.quals.str.contains(qualification.strip().lower(), regex=False).to_numpy()
+    if max_fee is not None:
+        # NaN compares False, so doctors without a valid fee drop out of capped searches
+        selected &= snap.fees <= max_fee
+    idx = np.flatnonzero(selected)
+    fees = snap.fees[idx]
+    order = np.lexsort((idx, np.where(np.isnan(fees), np.inf, fees)))
+    page = idx[order][offset:offset + limit]
+    rows = snap.frame.iloc[page].to_dict("records")
+    for i, row in zip(page, rows):
+        row["visit_days"] = weekdays.mask_to_days(int(snap.masks[i]))
+    return {"day": weekdays.WEEKDAYS[day], "total": int(idx.size), "doctors": rows}
@@ -0,0 +1,399 @@
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import booking_store, storage, weekdays
+from ..services import metrics
+
+# Booking analytics for clinic owners: bookings per clinic per day, per weekday and per
+# doctor, with revenue estimated from each doctor's clinic_fees.
+#
+# The aggregates are materialized in a small SQLite file and maintained incrementally. Every
+# source has a watermark: for a CSV partition, how many committed bytes are already counted;
+# for the SQLite booking table, the last rowid. A refresh reads only what lies past the
+# watermarks, parses it with one pandas.read_csv per batch, aggregates it with vectorized
+# group-bys and adds the results to the aggregate tables with upserts. Aggregates and the
+# watermarks they cover commit in the same transaction, so every booking is counted exactly
+# once, also with several processes refreshing.
+#
+# The booking materializer refreshes today's partitions after each pass. The dashboard
+# endpoint only reads the aggregate tables (one clinic's rows, by primary key); at most every
+# refresh_interval it also starts a full refresh in the background, which catches other
+# partitions and the SQLite backend. One such refresh runs per interval across all the
+# processes sharing the analytics file, whichever claims it first. Revenue uses the doctor's fee at the time a booking is
+# counted; rebuild() recounts everything at current fees.
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(__file__), "booking_analytics.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (source TEXT PRIMARY KEY, position INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS clinic_totals (
+    clinic_id TEXT PRIMARY KEY, bookings INTEGER NOT NULL, revenue REAL NOT NULL, unpriced INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clinic_days (
+    clinic_id TEXT NOT NULL, day TEXT NOT NULL, bookings INTEGER NOT NULL, revenue REAL NOT NULL,
+    PRIMARY KEY (clinic_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS clinic_weekdays (
+    clinic_id TEXT NOT NULL, weekday INTEGER NOT NULL, bookings INTEGER NOT NULL,
+    PRIMARY KEY (clinic_id, weekday)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS clinic_doctors (
+    clinic_id TEXT NOT NULL, doctor_id TEXT NOT NULL, bookings INTEGER NOT NULL, revenue REAL NOT NULL,
+    PRIMARY KEY (clinic_id, doctor_id)
+) WITHOUT ROWID;
+"""
+TABLES = ("watermarks", "clinic_totals", "clinic_days", "clinic_weekdays", "clinic_doctors")
+
+UPSERT_TOTALS = """INSERT INTO clinic_totals VALUES (?, ?, ?, ?) ON CONFLICT (clinic_id) DO UPDATE SET
+    bookings = bookings + excluded.bookings, revenue = revenue + excluded.revenue,
+    unpriced = unpriced + excluded.unpriced"""
+UPSERT_DAYS = """INSERT INTO clinic_days VALUES (?, ?, ?, ?) ON CONFLICT (clinic_id, day) DO UPDATE SET
+    bookings = bookings + excluded.bookings, revenue = revenue + excluded.revenue"""
+UPSERT_WEEKDAYS = """INSERT INTO clinic_weekdays VALUES (?, ?, ?) ON CONFLICT (clinic_id, weekday) DO UPDATE SET
+    bookings = bookings + excluded.bookings"""
+UPSERT_DOCTORS = """INSERT INTO clinic_doctors VALUES (?, ?, ?, ?) ON CONFLICT (clinic_id, doctor_id) DO UPDATE SET
+    bookings = bookings + excluded.bookings, revenue = revenue + excluded.revenue"""
+
+# columns the aggregates need
+COLUMNS = ["clinic_id", "doctor_id", "visit_day", "created_at"]
+# new CSV data parsed per transaction
+BATCH_BYTES = 32 * 1024 * 1024
+# rows per transaction when reading the SQLite booking table
+BATCH_ROWS = 200_000
+SQLITE_SOURCE = "sqlite:bookings"
+# watermark row holding when (epoch seconds) a process last claimed the periodic full refresh
+FULL_REFRESH_SOURCE = "full_refresh"
+
+log = logging.getLogger(__name__)
+
+_settings = {
+    "sqlite_path": os.environ.get("DOCTOPAL_ANALYTICS_SQLITE_PATH", DEFAULT_SQLITE_PATH),
+    "refresh_interval": float(os.environ.get("DOCTOPAL_ANALYTICS_REFRESH_INTERVAL", "30")),
+}
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+_refresh_lock = threading.Lock()
+_last_full_refresh = 0.0
+# set (under _scheduled_lock) while a background full refresh is pending in this process
+_scheduled_lock = threading.Lock()
+_refresh_scheduled = False
+_fees_lock = threading.Lock()
+_fees = None
+_fees_version = object()
+
+
+def configure(sqlite_path: Optional[str] = None, refresh_interval: Optional[float] = None) -> None:
+    if sqlite_path:
+        _settings["sqlite_path"] = sqlite_path
+    if refresh_interval is not None:
+        _settings["refresh_interval"] = float(refresh_interval)
+
+
+def _conn() -> sqlite3.Connection:
+    path = _settings["sqlite_path"]
+    conn = getattr(_local, "conn", None)
+    # never reuse a connection inherited across fork(), nor one to a path configured away
+    if conn is not None and _local.key == (os.getpid(), path):
+        return conn
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    with _schema_lock:
+        if path not in _schema_ready:
+            conn.executescript(SCHEMA)
+            _schema_ready.add(path)
+    _local.conn, _local.key = conn, (os.getpid(), path)
+    return conn
+
+
+def _fee_frame():
+    """(doctor_id, clinic_id, fee) for the directory's first row per pair; fee is NaN when blank."""
+    global _fees, _fees_version
+    import pandas as pd
+    version = storage.get_backend().doctors_version()
+    if version is not None and version == _fees_version:
+        return _fees
+    with _fees_lock:
+        if version is None or version != _fees_version:
+            rows = [(r.get("doctor_id") or "", r.get("clinic_id") or "", r.get("clinic_fees") or "")
+                    for r in storage.get_backend().iter_doctors()]
+            frame = pd.DataFrame(rows, columns=["doctor_id", "clinic_id", "fee"])
+            frame["fee"] = pd.to_numeric(frame["fee"], errors="coerce")
+            _fees, _fees_version = frame.drop_duplicates(["doctor_id", "clinic_id"]), version
+        return _fees
+
+
+def _records(frame) -> List[tuple]:
+    # plain Python values: sqlite3 cannot bind NumPy scalars
+    frame = frame.reset_index()
+    return list(zip(*(frame[c].tolist() for c in frame.columns)))
+
+
+def _aggregate(conn: sqlite3.Connection, frame) -> int:
+    """Add a frame of new bookings (COLUMNS, as strings) to the aggregate tables."""
+    import pandas as pd
+    if frame.empty:
+        return 0
+    frame = frame[COLUMNS].copy()
+    frame["day"] = frame["created_at"].str[:10]
+    # visit_day is free text ("Monday", "thurs"); resolve each distinct spelling once and fall
+    # back to the booking date's weekday
+    spellings = {v: weekdays.day_index(v) for v in frame["visit_day"].unique()}
+    stated = pd.to_numeric(frame["visit_day"].map(spellings), errors="coerce")
+    booked = pd.to_datetime(frame["day"], format="%Y-%m-%d", errors="coerce").dt.weekday
+    frame["weekday"] = stated.fillna(booked).fillna(-1).astype(int)
+
+    frame = frame.merge(_fee_frame(), on=["doctor_id", "clinic_id"], how="left")
+    frame["unpriced"] = frame["fee"].isna().astype(int)
+    frame["revenue"] = frame["fee"].fillna(0.0)
+
+    totals = frame.groupby("clinic_id").agg(bookings=("day", "size"), revenue=("revenue", "sum"),
+                                            unpriced=("unpriced", "sum"))
+    days = frame.groupby(["clinic_id", "day"]).agg(bookings=("day", "size"), revenue=("revenue", "sum"))
+    by_weekday = frame.groupby(["clinic_id", "weekday"]).agg(bookings=("day", "size"))
+    doctors = frame.groupby(["clinic_id", "doctor_id"]).agg(bookings=("day", "size"), revenue=("revenue", "sum"))
+    conn.executemany(UPSERT_TOTALS, _records(totals))
+    conn.executemany(UPSERT_DAYS, _records(days))
+    conn.executemany(UPSERT_WEEKDAYS, _records(by_weekday))
+    conn.executemany(UPSERT_DOCTORS, _records(doctors))
+    return len(frame)
+
+
+def _mark(conn: sqlite3.Connection, source: str) -> int:
+    row = conn.execute("SELECT position FROM watermarks WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else 0
+
+
+def _csv_marks(conn: sqlite3.Connection, keys: List[Tuple[str, str]]) -> Dict[str, int]:
+    # a few partitions (the materializer's) by key; many (a full refresh) in one scan
+    if len(keys) > 500:
+        return dict(conn.execute("SELECT source, position FROM watermarks WHERE source LIKE 'csv:%'"))
+    sources = ["csv:" + booking_store.relative_path(k) for k in keys]
+    return dict(conn.execute(f"SELECT source, position FROM watermarks WHERE source IN ({','.join('?' * len(sources))})",
+                             sources))
+
+
+def _set_marks(conn: sqlite3.Connection, marks: Iterable[Tuple[str, int]]) -> None:
+    conn.executemany("INSERT OR REPLACE INTO watermarks (source, position) VALUES (?, ?)", list(marks))
+
+
+def _pending(marks: Dict[str, int], key: Tuple[str, str], header_lengths: Dict[tuple, int]):
+    """(source, header, start, end) of a partition's uncounted rows, or None."""
+    source = "csv:" + booking_store.relative_path(key)
+    mark = marks.get(source, 0)
+    try:
+        if os.path.getsize(os.path.join(booking_store.BOOKING_ROOT, booking_store.relative_path(key))) <= mark:
+            return None
+    except FileNotFoundError:
+        return None
+    manifest = booking_store.load_manifest(key)
+    if not manifest["header"]:
+        return None
+    header = tuple(manifest["header"])
+    if header not in header_lengths:
+        header_lengths[header] = booking_store.header_length(manifest["header"])
+    start = mark or header_lengths[header]
+    end = manifest["bytes"]
+    return (source, header, start, end) if end > start else None
+
+
+def _read_csv_batch(batch: List[tuple]):
+    import pandas as pd
+    chunks: Dict[tuple, List[bytes]] = {}
+    for key, (source, header, start, end) in batch:
+        chunks.setdefault(header, []).append(booking_store.read_bytes(key, start, end))
+    frames = []
+    for header, parts in chunks.items():
+        data = b"".join(parts)
+        frame = pd.read_csv(io.BytesIO(data), names=list(header), usecols=[c for c in COLUMNS if c in header],
+                            dtype=str, keep_default_na=False)
+        for c in COLUMNS:
+            if c not in frame:
+                frame[c] = ""
+        frames.append(frame)
+        metrics.scanned("analytics_refresh", len(frame), len(data))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _refresh_csv(conn: sqlite3.Connection, keys: List[Tuple[str, str]]) -> int:
+    counted, i = 0, 0
+    header_lengths: Dict[tuple, int] = {}
+    while i < len(keys):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # watermarks are read inside the transaction that advances them
+            marks = _csv_marks(conn, keys[i:])
+            batch, size = [], 0
+            while i < len(keys) and size < BATCH_BYTES:
+                pending = _pending(marks, keys[i], header_lengths)
+                if pending is not None:
+                    batch.append((keys[i], pending))
+                    size += pending[3] - pending[2]
+                i += 1
+            if batch:
+                counted += _aggregate(conn, _read_csv_batch(batch))
+                _set_marks(conn, ((p[0], p[3]) for _, p in batch))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return counted
+
+
+def _refresh_sqlite(conn: sqlite3.Connection) -> int:
+    import pandas as pd
+    backend = storage.get_backend()
+    counted = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            mark = _mark(conn, SQLITE_SOURCE)
+            rows = []
+            for cursor, row in backend.iter_bookings(date(1970, 1, 1), date(9999, 12, 30), after=str(mark)):
+                rows.append(row)
+                mark = int(cursor)
+                if len(rows) >= BATCH_ROWS:
+                    break
+            if rows:
+                frame = pd.DataFrame.from_records(rows, columns=COLUMNS).fillna("")
+                counted += _aggregate(conn, frame)
+                metrics.scanned("analytics_refresh", len(rows))
+                _set_marks(conn, [(SQLITE_SOURCE, mark)])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if len(rows) < BATCH_ROWS:
+            return counted
+
+
+@metrics.timed("analytics_refresh")
+def refresh(keys: Optional[Iterable[Tuple[str, str]]] = None) -> int:
+    """
+    Count bookings past the watermarks; returns how many were added. `keys` limits a CSV
+    refresh to those partitions; by default every partition (or the SQLite table) is checked.
+    """
+    global _last_full_refresh
+    with _refresh_lock:
+        conn = _conn()
+        if storage.get_backend().name == "sqlite":
+            counted = _refresh_sqlite(conn)
+        else:
+            counted = _refresh_csv(conn, list(keys if keys is not None else booking_store.partition_keys()))
+        if keys is None:
+            _last_full_refresh = time.time()
+        return counted
+
+
+def refresh_recent() -> int:
+    """Refresh yesterday's and today's partitions, where new bookings land (materializer hook)."""
+    if storage.get_backend().name != "csv":
+        return 0
+    today = datetime.utcnow().date()
+    return refresh(booking_store.partition_keys(today - timedelta(days=1), today))
+
+
+def _claim_full_refresh(now: float) -> bool:
+    """
+    True if this process should run the periodic full refresh: the one claimed last, by any
+    process sharing the analytics file, is older than refresh_interval.
+    """
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT position FROM watermarks WHERE source = ?", (FULL_REFRESH_SOURCE,)).fetchone()
+        claimed = row is None or now - row[0] >= _settings["refresh_interval"]
+        if claimed:
+            conn.execute("INSERT OR REPLACE INTO watermarks (source, position) VALUES (?, ?)",
+                         (FULL_REFRESH_SOURCE, int(now)))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return claimed
+
+
+def refresh_if_stale() -> None:
+    """Start a full refresh in the background if the last one is older than refresh_interval."""
+    global _refresh_scheduled
+    if time.time() - _last_full_refresh < _settings["refresh_interval"]:
+        return
+    with _scheduled_lock:
+        if _refresh_scheduled:
+            return
+        _refresh_scheduled = True
+
+    def run():
+        global _last_full_refresh, _refresh_scheduled
+        try:
+            now = time.time()
+            if _claim_full_refresh(now):
+                refresh()
+            else:
+                # another worker has it; look again after the interval
+                _last_full_refresh = now
+        except Exception:
+            log.exception("Background analytics refresh failed; the next stale read retries")
+        finally:
+            with _scheduled_lock:
+                _refresh_scheduled = False
+
+    threading.Thread(target=run, name="analytics-refresh", daemon=True).start()
+
+
+def rebuild() -> Dict:
+    """Drop every aggregate and watermark and recount all bookings at current fees."""
+    global _fees_version
+    t = time.perf_counter()
+    with _refresh_lock:
+        conn = _conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in TABLES:
+                conn.execute(f"DELETE FROM {table}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        _fees_version = object()
+    counted = refresh()
+    seconds = time.perf_counter() - t
+    return {"bookings": counted, "seconds": round(seconds, 3),
+            "rows_per_sec": round(counted / seconds, 1) if seconds > 0 else 0.0}
+
+
+def clinic_summary(clinic_id: str, day_from: date, day_to: date) -> Optional[Dict]:
+    """All-time totals, weekday and doctor breakdowns, and the per-day series for a day range."""
+    conn = _conn()
+    totals = conn.execute("SELECT bookings, revenue, unpriced FROM clinic_totals WHERE clinic_id = ?",
+                          (clinic_id,)).fetchone()
+    if totals is None:
+        return None
+    days = conn.execute(
+        "SELECT day, bookings, revenue FROM clinic_days WHERE clinic_id = ? AND day BETWEEN ? AND ? ORDER BY day",
+        (clinic_id, day_from.isoformat(), day_to.isoformat())).fetchall()
+    by_weekday = dict(conn.execute(
+        "SELECT weekday, bookings FROM clinic_weekdays WHERE clinic_id = ?", (clinic_id,)).fetchall())
+    doctors = conn.execute(
+        "SELECT doctor_id, bookings, revenue FROM clinic_doctors WHERE clinic_id = ? ORDER BY bookings DESC, doctor_id",
+        (clinic_id,)).fetchall()
+    return {
+        "clinic_id": clinic_id,
+        "bookings": totals[0],
+        "revenue_estimate": round(totals[1], 2),
+        # bookings whose doctor has no valid fee; not in the revenue estimate
+        "unpriced_bookings": totals[2],
+        "weekdays": {name: by_weekday.get(i, 0) for i, name in enumerate(weekdays.WEEKDAYS)},
+        "doctors": [{"doctor_id": d, "bookings": n, "revenue_estimate": round(r, 2)} for d, n, r in doctors],
+        "days": [{"day": d, "bookings": n, "revenue_estimate": round(r, 2)} for d, n, r in days],
+    }
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from . import booking_store, client_db_manager, file_lock
+
+# Group-commit journal for CSV bookings.
+#
+# /submit-booking no longer appends to a booking file itself. Each booking becomes
+# one checksummed line in an append-only journal; a flusher thread per process collects
+# every booking that arrives within COMMIT_WINDOW_MS and writes the whole batch with one
+# write() (+ one fsync) under the journal lock, then wakes the waiting requests. A
+# materializer thread fans committed lines out into the day/clinic partitions of
+# booking_store, one append per partition per pass, and records how far it got in the
+# offset file. Only one process materializes at a time (it holds the offset file lock), so
+# partitions have a single writer. A pass that fails or crashes after appending to some
+# partitions leaves a marker next to the offset file; the next pass, in whichever process,
+# replays the same lines with de-duplication by patient_id.
+#
+# Line format: "<crc32 hex> <json>\n". A line whose checksum fails (a torn write from a
+# crash) is skipped, and a writer that finds an unterminated tail starts on a fresh line,
+# so a half-written booking can never be glued onto the next one.
+#
+# Durability (DOCTOPAL_BOOKING_DURABILITY), i.e. what "booking saved" means to the client:
+# - "fsync" (default): the journal batch is on disk; survives power loss
+# - "write": the batch is in the OS page cache; survives a worker crash, not a power loss
+
+log = logging.getLogger(__name__)
+
+JOURNAL_PATH = os.path.join(os.path.dirname(__file__), "booking_journal.log")
+OFFSET_PATH = JOURNAL_PATH + ".offset"
+# present while a pass is appending to partitions; a pass that finds it left behind (a crash
+# or an exception partway through, in any process) de-duplicates against the partitions
+PENDING_SUFFIX = ".pending"
+
+DURABILITY_MODES = ("fsync", "write")
+
+_settings = {
+    "durability": os.environ.get("DOCTOPAL_BOOKING_DURABILITY", "fsync"),
+    "commit_window_ms": float(os.environ.get("DOCTOPAL_BOOKING_COMMIT_WINDOW_MS", "2")),
+    # how often the materializer looks for lines other processes committed
+    "materialize_interval": float(os.environ.get("DOCTOPAL_BOOKING_MATERIALIZE_INTERVAL", "0.5")),
+    # once fully materialized, a journal larger than this is truncated
+    "compact_bytes": int(os.environ.get("DOCTOPAL_BOOKING_JOURNAL_COMPACT_BYTES", str(4 * 1024 * 1024))),
+}
+
+_lock = threading.Lock()
+_cond = threading.Condition(_lock)
+_pending: List["_Entry"] = []
+_wake_materializer = threading.Event()
+_started_pid = None
+# the first pass after start-up may replay rows a materializer of an older version wrote
+_recovering = True
+
+
+class _Entry:
+    __slots__ = ("line", "done", "error")
+
+    def __init__(self, line: bytes):
+        self.line = line
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+def configure(durability: Optional[str] = None, commit_window_ms: Optional[float] = None,
+              materialize_interval: Optional[float] = None) -> None:
+    if durability is not None and durability not in DURABILITY_MODES:
+        raise ValueError(f"durability must be one of {', '.join(DURABILITY_MODES)}")
+    updates = {"durability": durability, "commit_window_ms": commit_window_ms,
+               "materialize_interval": materialize_interval}
+    _settings.update({k: v for k, v in updates.items() if v is not None})
+
+
+def _encode(row: Dict) -> bytes:
+    body = json.dumps(row, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(body), body)
+
+
+def _decode(line: bytes) -> Optional[Dict]:
+    crc, sep, body = line.partition(b" ")
+    if not sep:
+        return None
+    try:
+        if int(crc, 16) != zlib.crc32(body):
+            return None
+        row = json.loads(body.decode("utf-8"))
+    except ValueError:
+        return None
+    return row if isinstance(row, dict) else None
+
+
+def _ensure_threads() -> None:
+    """Start the flusher and materializer once per process (threads do not survive fork)."""
+    global _started_pid, _pending
+    if _started_pid == os.getpid():
+        return
+    with _lock:
+        if _started_pid == os.getpid():
+            return
+        _pending = []
+        threading.Thread(target=_flusher, name="booking-journal-flush", daemon=True).start()
+        threading.Thread(target=_materializer, name="booking-journal-materialize", daemon=True).start()
+        _started_pid = os.getpid()
+
+
+def start() -> None:
+    """Start the background threads; the materializer drains whatever a previous run left."""
+    _ensure_threads()
+    _wake_materializer.set()
+
+
+def append(row: Dict) -> str:
+    """
+    Commit one booking to the journal and return the day file it will be materialized into.
+    Blocks until the batch holding it is durable per the configured durability mode.
+    """
+    row = {k: row.get(k, "") for k in client_db_manager.BOOKING_FIELDS}
+    entry = _Entry(_encode(row))
+    _ensure_threads()
+    with _cond:
+        _pending.append(entry)
+        _cond.notify()
+    entry.done.wait()
+    if entry.error is not None:
+        raise entry.error
+    return booking_store.relative_path(booking_store.partition_key(row))
+
+
+def _write_batch(batch: List[_Entry]) -> None:
+    data = b"".join(e.line for e in batch)
+    with file_lock.locked(JOURNAL_PATH):
+        fd = os.open(JOURNAL_PATH, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                # torn tail from a crashed writer: never append onto it
+                data = b"\n" + data
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            if _settings["durability"] == "fsync":
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _flusher() -> None:
+    global _pending
+    while True:
+        with _cond:
+            while not _pending:
+                _cond.wait()
+        # let concurrent requests join this batch
+        time.sleep(_settings["commit_window_ms"] / 1000.0)
+        with _cond:
+            batch, _pending = _pending, []
+        try:
+            _write_batch(batch)
+        except BaseException as e:
+            for entry in batch:
+                entry.error = e
+        for entry in batch:
+            entry.done.set()
+        _wake_materializer.set()
+
+
+def _read_offset() -> int:
+    try:
+        with open(OFFSET_PATH, encoding="ascii") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _write_offset(offset: int, path: Optional[str] = None) -> None:
+    path = path or OFFSET_PATH
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="ascii") as f:
+        f.write(str(offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def materialize() -> int:
+    """Copy committed journal lines into the booking partitions; returns how many were written."""
+    global _recovering
+    pending_path = OFFSET_PATH + PENDING_SUFFIX
+    with file_lock.locked(OFFSET_PATH):
+        offset = _read_offset()
+        # some rows of an unfinished pass may already be in their partitions
+        recovering = _recovering or os.path.exists(pending_path)
+        try:
+            with open(JOURNAL_PATH, "rb") as f:
+                if os.fstat(f.fileno()).st_size < offset:
+                    offset = 0  # journal was truncated under us
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        # only complete lines; a batch still being written is picked up next pass
+        end = data.rfind(b"\n") + 1
+        by_key: Dict[Tuple[str, str], List[Dict]] = {}
+        for line in data[:end].splitlines():
+            row = _decode(line) if line else None
+            if row is not None:
+                by_key.setdefault(booking_store.partition_key(row), []).append(row)
+        if by_key and not recovering:
+            _write_offset(offset + end, pending_path)
+        for key, rows in by_key.items():
+            booking_store.append_rows(key, rows, fsync=_settings["durability"] == "fsync",
+                                      recovering=recovering)
+        offset += end
+        _write_offset(offset)
+        if by_key or recovering:
+            try:
+                os.remove(pending_path)
+            except FileNotFoundError:
+                pass
+        _recovering = False
+        if offset >= _settings["compact_bytes"]:
+            _compact(offset)
+        return sum(len(rows) for rows in by_key.values())
+
+
+def migrate_legacy() -> Dict[str, int]:
+    """Move pre-partition flat day files into partitions, excluding the materializer meanwhile."""
+    with file_lock.locked(OFFSET_PATH):
+        return booking_store.migrate_legacy()
+
+
+def _compact(offset: int) -> None:
+    # caller holds the offset lock; the journal lock keeps writers out while we truncate
+    with file_lock.locked(JOURNAL_PATH):
+        if os.path.getsize(JOURNAL_PATH) != offset:
+            return  # new lines arrived; try again after the next pass
+        os.truncate(JOURNAL_PATH, 0)
+        _write_offset(0)
+
+
+def _materializer() -> None:
+    while True:
+        _wake_materializer.wait(_settings["materialize_interval"])
+        _wake_materializer.clear()
+        try:
+            written = materialize()
+        except Exception:
+            # retried on the next pass; the journal still holds every committed booking
+            log.exception("Booking materializer pass failed")
+            time.sleep(_settings["materialize_interval"])
+            continue
+        if written:
+            from . import booking_analytics
+            try:
+                booking_analytics.refresh_recent()
+            except Exception:
+                # the watermarks stay put; the next refresh counts these rows
+                log.exception("Analytics refresh after materializing failed")
@@ -0,0 +1,277 @@
+import base64
+import csv
+import glob
+import io
+import json
+import os
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from . import client_db_manager
+from ..services import metrics
+
+# Partitioned booking files for the CSV backend.
+#
+#   bookings/<YYYYMMDD>/<clinic_id>/bookings.csv
+#   bookings/<YYYYMMDD>/<clinic_id>/manifest.json
+#
+# The day is the booking's created_at date (UTC). Partitions are append-only and written by
+# the booking journal's materializer only, which rewrites the manifest after each append:
+#   rows     - committed rows
+#   bytes    - committed file length; readers never look past it, so a half-finished append
+#              is invisible to them
+#   offsets  - byte offset of every OFFSET_EVERY-th row, so a cursor seeks instead of rescanning
+#   doctors  - rows per doctor_id, so doctor queries skip partitions without opening them
+#
+# Results are ordered by (day, clinic_id, row number) and paged with an opaque keyset cursor
+# holding the last row's position; appends never move existing rows, so cursors stay valid.
+
+BOOKING_ROOT = os.path.join(client_db_manager.BOOKING_DIR, "bookings")
+DATA_FILE = "bookings.csv"
+MANIFEST_FILE = "manifest.json"
+OFFSET_EVERY = 64
+
+
+def _day(row: Dict) -> str:
+    return (row.get("created_at") or "")[:10].replace("-", "") or "undated"
+
+
+def partition_key(row: Dict) -> Tuple[str, str]:
+    return _day(row), client_db_manager._safe(row.get("clinic_id", "")) or "clinic"
+
+
+def relative_path(key: Tuple[str, str]) -> str:
+    return f"{key[0]}/{key[1]}/{DATA_FILE}"
+
+
+def _dir(key: Tuple[str, str]) -> str:
+    return os.path.join(BOOKING_ROOT, key[0], key[1])
+
+
+def _empty_manifest() -> Dict:
+    return {"rows": 0, "bytes": 0, "offsets": [], "doctors": {}, "header": []}
+
+
+def load_manifest(key: Tuple[str, str]) -> Dict:
+    try:
+        with open(os.path.join(_dir(key), MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return _empty_manifest()
+
+
+def _save_manifest(key: Tuple[str, str], manifest: Dict) -> None:
+    path = os.path.join(_dir(key), MANIFEST_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _encode(fieldnames: List[str], row: Optional[Dict] = None) -> bytes:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fieldnames, extrasaction="ignore")
+    if row is None:
+        writer.writeheader()
+    else:
+        writer.writerow(row)
+    return buf.getvalue().encode("utf-8")
+
+
+def _scan(key: Tuple[str, str]) -> Dict:
+    """Rebuild a manifest from the data file, cutting off a torn final row."""
+    path = os.path.join(_dir(key), DATA_FILE)
+    manifest = _empty_manifest()
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return manifest
+    end = data.rfind(b"\n") + 1
+    if end != len(data):
+        os.truncate(path, end)
+    reader = csv.DictReader(io.StringIO(data[:end].decode("utf-8"), newline=""))
+    header = reader.fieldnames or []
+    if not header:
+        return manifest
+    manifest["header"] = header
+    pos = len(_encode(header))
+    for r in reader:
+        _index_row(manifest, r, pos)
+        pos += len(_encode(header, r))
+    manifest["bytes"] = pos
+    return manifest
+
+
+def _index_row(manifest: Dict, row: Dict, pos: int) -> None:
+    if manifest["rows"] % OFFSET_EVERY == 0:
+        manifest["offsets"].append(pos)
+    doctor_id = row.get("doctor_id") or ""
+    manifest["doctors"][doctor_id] = manifest["doctors"].get(doctor_id, 0) + 1
+    manifest["rows"] += 1
+
+
+def append_rows(key: Tuple[str, str], rows: List[Dict], fsync: bool = True, recovering: bool = False) -> None:
+    """
+    Append rows to one partition with a single write and update its manifest.
+    Single writer only (the materializer, under its lock). With `recovering`, the manifest
+    is checked against the file and rows whose patient_id is already stored are dropped,
+    so replaying journal lines after a crash does not duplicate bookings.
+    """
+    os.makedirs(_dir(key), exist_ok=True)
+    path = os.path.join(_dir(key), DATA_FILE)
+    manifest = load_manifest(key)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if recovering or size != manifest["bytes"]:
+        manifest = _scan(key)
+        size = manifest["bytes"]
+    if recovering and manifest["rows"]:
+        seen = {r.get("patient_id") for r in _read_rows(key, manifest, 0)}
+        rows = [r for r in rows if r.get("patient_id") not in seen]
+        if not rows:
+            _save_manifest(key, manifest)
+            return
+
+    chunks = []
+    pos = size
+    if not manifest["header"]:
+        # a partition keeps the header it was created with; later columns show up from the next day
+        manifest["header"] = list(client_db_manager.BOOKING_FIELDS)
+        chunks.append(_encode(manifest["header"]))
+        pos += len(chunks[0])
+    for r in rows:
+        line = _encode(manifest["header"], r)
+        _index_row(manifest, r, pos)
+        chunks.append(line)
+        pos += len(line)
+    with open(path, "ab") as f:
+        f.write(b"".join(chunks))
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    manifest["bytes"] = pos
+    _save_manifest(key, manifest)
+
+
+def _read_rows(key: Tuple[str, str], manifest: Dict, start: int) -> Iterator[Dict]:
+    """Yield committed rows from row number `start` on, each tagged with its row number."""
+    if start >= manifest["rows"]:
+        return
+    block = start // OFFSET_EVERY
+    seek = manifest["offsets"][block]
+    with open(os.path.join(_dir(key), DATA_FILE), "rb") as f:
+        f.seek(seek)
+        data = f.read(manifest["bytes"] - seek)
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8"), newline=""), fieldnames=manifest["header"])
+    rows = 0
+    try:
+        for n, r in enumerate(reader, block * OFFSET_EVERY):
+            rows += 1
+            if n >= start:
+                r["_row"] = n
+                yield r
+    finally:
+        # also when the consumer stops early (a full page)
+        metrics.scanned("booking_scan", rows, len(data))
+
+
+def _days(day_from: date, day_to: date) -> List[str]:
+    # walk the partitions that exist rather than every calendar day in the range
+    try:
+        present = os.listdir(BOOKING_ROOT)
+    except FileNotFoundError:
+        return []
+    lo, hi = day_from.strftime("%Y%m%d"), day_to.strftime("%Y%m%d")
+    return sorted(name for name in present if len(name) == 8 and name.isdigit() and lo <= name <= hi)
+
+
+def _partitions(day_from: date, day_to: date, clinic_id: Optional[str]) -> Iterator[Tuple[str, str]]:
+    for day in _days(day_from, day_to):
+        if clinic_id:
+            key = (day, client_db_manager._safe(clinic_id))
+            if os.path.isdir(_dir(key)):
+                yield key
+            continue
+        for clinic in sorted(os.listdir(os.path.join(BOOKING_ROOT, day))):
+            yield day, clinic
+
+
+def encode_cursor(position: Tuple[str, str, int]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, int]:
+    try:
+        day, clinic, row = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(day), str(clinic), int(row)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def iter_bookings(day_from: date, day_to: date, clinic_id: Optional[str] = None,
+                  doctor_id: Optional[str] = None, after: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+    """Stream (cursor, row) in (day, clinic, row) order, one partition in memory at a time."""
+    start = decode_cursor(after) if after else None
+    for key in _partitions(day_from, day_to, clinic_id):
+        if start and key < start[:2]:
+            continue
+        first = start[2] + 1 if start and key == start[:2] else 0
+        manifest = load_manifest(key)
+        if doctor_id and not manifest["doctors"].get(doctor_id):
+            continue
+        for r in _read_rows(key, manifest, first):
+            n = r.pop("_row")
+            if doctor_id and r.get("doctor_id") != doctor_id:
+                continue
+            yield encode_cursor(key + (n,)), r
+
+
+def partition_keys(day_from: Optional[date] = None, day_to: Optional[date] = None) -> Iterator[Tuple[str, str]]:
+    """Every partition, or those of a day range, in (day, clinic) order."""
+    if day_from is not None:
+        yield from _partitions(day_from, day_to or day_from, None)
+        return
+    try:
+        days = sorted(os.listdir(BOOKING_ROOT))
+    except FileNotFoundError:
+        return
+    for day in days:
+        for clinic in sorted(os.listdir(os.path.join(BOOKING_ROOT, day))):
+            yield day, clinic
+
+
+def header_length(header: List[str]) -> int:
+    return len(_encode(header))
+
+
+def read_bytes(key: Tuple[str, str], start: int, end: int) -> bytes:
+    """Raw bytes [start, end) of a partition's data file; `end` should be a manifest's committed length."""
+    with open(os.path.join(_dir(key), DATA_FILE), "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def data_files() -> List[str]:
+    return sorted(glob.glob(os.path.join(BOOKING_ROOT, "*", "*", DATA_FILE)))
+
+
+def legacy_files() -> List[str]:
+    """Flat {clinic_id}__{clinic}__{doctor}__{day}.csv files written before partitioning."""
+    return sorted(glob.glob(os.path.join(client_db_manager.BOOKING_DIR, "*__*__*__*.csv")))
+
+
+def migrate_legacy() -> Dict[str, int]:
+    """Move flat day files into partitions; caller holds the materializer lock."""
+    stats = {"files": 0, "rows": 0}
+    for path in legacy_files():
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        by_key: Dict[Tuple[str, str], List[Dict]] = {}
+        for r in rows:
+            by_key.setdefault(partition_key(r), []).append(r)
+        for key, part in by_key.items():
+            append_rows(key, part, recovering=True)
+        os.remove(path)
+        stats["files"] += 1
+        stats["rows"] += len(rows)
+    return stats
@@ -0,0 +1,137 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from . import counter_store, doctor_db_manager, qr_renderer, search_index, storage
+
+# Bulk onboarding: stream a CSV/JSONL of seed rows (same field names as the /doctor-seed form),
+# validate everything up front, reserve all counter values in one locked step per counter file,
+# render QR codes in a process pool and append every directory row with one batched write.
+
+# Below this many rows a process pool costs more to start than it saves
+POOL_MIN_ROWS = 32
+
+
+def detect_format(filename: str) -> str:
+    return "jsonl" if (filename or "").lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def iter_rows(stream, fmt: str = "csv") -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """Yield (line_no, row, error) from a text stream without loading it whole."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for r in reader:
+            yield reader.line_num, r, None
+    elif fmt == "jsonl":
+        for n, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError as e:
+                yield n, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(obj, dict):
+                yield n, None, "expected a JSON object"
+                continue
+            yield n, {k: "" if v is None else str(v) for k, v in obj.items()}, None
+    else:
+        raise ValueError(f"Unsupported import format: {fmt!r}")
+
+
+def _render(payload: str):
+    # top-level so ProcessPoolExecutor can pickle it; errors come back per row.
+    # Workers also write the blob, so the parent never re-hashes the PNG.
+    try:
+        return qr_renderer.render_stored(payload) + (None,)
+    except Exception as e:
+        return None, None, str(e)
+
+
+def import_doctors(stream, fmt: str = "csv", workers: Optional[int] = None) -> Dict:
+    """
+    Import every valid row from `stream`. Invalid rows are skipped and reported; they never
+    consume counter values. Returns a report with per-row errors and throughput stats.
+    """
+    t0 = time.perf_counter()
+    errors: List[Dict] = []
+    rows = []  # (line_no, clean, clinic_key, doctor_key)
+    total = 0
+    for line_no, raw, err in iter_rows(stream, fmt):
+        total += 1
+        if err is None:
+            try:
+                clean = doctor_db_manager._clean_doctor_fields(raw)
+            except ValueError as e:
+                err = str(e)
+        if err is not None:
+            errors.append({"line": line_no, "error": err})
+            continue
+        rows.append((line_no, clean) + doctor_db_manager._counter_keys(clean))
+    t_validate = time.perf_counter()
+
+    # one reservation per counter file covers the whole batch
+    clinic_next = counter_store.reserve_many(
+        doctor_db_manager.CLINIC_COUNTER_PATH, Counter(r[2] for r in rows))
+    doctor_next = counter_store.reserve_many(
+        doctor_db_manager.DOCTOR_COUNTER_PATH, Counter(r[3] for r in rows))
+
+    pending = []  # (line_no, clean, ids, payload)
+    for line_no, clean, clinic_key, doctor_key in rows:
+        clinic_counter, doctor_counter = clinic_next[clinic_key], doctor_next[doctor_key]
+        clinic_next[clinic_key] += 1
+        doctor_next[doctor_key] += 1
+        ids = doctor_db_manager._generated_ids(clinic_key, clinic_counter, doctor_key, doctor_counter)
+        if doctor_db_manager._doctor_exists(ids["doctor_id"]):
+            errors.append({"line": line_no, "error": f"{ids['doctor_id']} already exists"})
+            continue
+        payload = doctor_db_manager._generate_qr_payload({**clean, **ids})
+        pending.append((line_no, clean, ids, payload))
+    t_reserve = time.perf_counter()
+
+    payloads = [p[3] for p in pending]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(payloads) >= POOL_MIN_ROWS:
+        from concurrent.futures import ProcessPoolExecutor
+        chunksize = max(1, len(payloads) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            rendered = list(ex.map(_render, payloads, chunksize=chunksize))
+    else:
+        rendered = [_render(p) for p in payloads]
+    t_render = time.perf_counter()
+
+    records = []
+    for (line_no, clean, ids, _), (png_bytes, qr_ref, err) in zip(pending, rendered):
+        if err is not None:
+            errors.append({"line": line_no, "error": f"QR rendering failed: {err}"})
+            continue
+        qr_filename = doctor_db_manager._make_unique_filename()
+        doctor_db_manager._write_qr_png(png_bytes, qr_filename)
+        records.append(doctor_db_manager._build_record(clean, ids, qr_filename, qr_ref))
+    if records:
+        storage.get_backend().append_doctors(records)
+        search_index.sync()
+    t_write = time.perf_counter()
+
+    elapsed = t_write - t0
+    errors.sort(key=lambda e: e["line"])
+    return {
+        "rows": total,
+        "imported": len(records),
+        "failed": len(errors),
+        "errors": errors,
+        "doctor_ids": [r["doctor_id"] for r in records],
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(len(records) / elapsed, 1) if elapsed > 0 else None,
+        "stages": {
+            "validate": round(t_validate - t0, 3),
+            "reserve": round(t_reserve - t_validate, 3),
+            "render": round(t_render - t_reserve, 3),
+            "write": round(t_write - t_render, 3),
+        },
+        "workers": workers,
+    }
@@ -1 +1,28 @@
+import os
+from typing import Dict
 
+from . import storage
+
+# Booking partitions (see booking_store) live under bookings/ next to the other db_manager files
+BOOKING_DIR = os.path.dirname(__file__)
+
+BOOKING_FIELDS = [
+    "patient_id",
+    "patient_name",
+    "patient_mobile",
+    "visit_day",
+    "clinic_id",
+    "clinic_name",
+    "clinic_address",
+    "doctor_id",
+    "doctor_name",
+    "doctor_qualifications",
+    "created_at",
+]
+
+def _safe(s: str) -> str:
+    return "".join(c for c in (s or "") if c.isalnum() or c in " _-").strip().replace(" ", "_")
+
+def append_booking(row: Dict) -> str:
+    """Persist a booking row through the configured storage backend; returns its location."""
+    return storage.get_backend().append_booking({k: row.get(k, "") for k in BOOKING_FIELDS})
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import threading
+from typing import Dict
+
+from . import file_lock
+
+# Process-safe counters behind CLINID_/DOCID_ numbering.
+#
+# Files keep the original "KEY,value" CSV rows but are treated as an append-only log:
+# every increment appends one line and the last line for a key wins. Under the file lock
+# a writer only reads the bytes other processes appended since its cached offset, so a
+# hot counter costs one small append instead of a full read + rewrite. When the log grows
+# past COMPACT_FACTOR lines per key it is rewritten (one line per key) via atomic rename.
+
+COMPACT_MIN_LINES = 256
+COMPACT_FACTOR = 4
+# fsync each increment so a crash can never roll a counter back and reissue an id
+FSYNC = os.environ.get("DOCTOPAL_COUNTER_FSYNC", "1") != "0"
+
+_cache_lock = threading.Lock()
+_cache: Dict[str, "_CounterLog"] = {}
+
+
+class _CounterLog:
+    def __init__(self):
+        self.ino = None
+        self.offset = 0
+        self.lines = 0
+        self.values: Dict[str, int] = {}
+
+    def _parse(self, data: bytes) -> None:
+        for line in data.decode("utf-8").splitlines():
+            key, sep, value = line.rpartition(",")
+            if not sep or not key:
+                continue
+            try:
+                self.values[key] = int(value)
+            except ValueError:
+                continue
+            self.lines += 1
+
+    def sync(self, path: str) -> None:
+        """Bring the cache up to date with the file; caller holds the file lock."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.__init__()
+            return
+        if st.st_ino != self.ino or st.st_size < self.offset:
+            # replaced (compacted) or truncated elsewhere: full reload
+            self.__init__()
+            self.ino = st.st_ino
+        if st.st_size == self.offset:
+            return
+        with open(path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        # only complete lines count; a torn tail from a crash is cut off before the next append
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            with open(path, "r+b") as f:
+                f.truncate(self.offset + end)
+            data = data[:end]
+        self._parse(data)
+        self.offset += len(data)
+
+    def append(self, path: str, updates: Dict[str, int]) -> None:
+        """Append the new values for all `updates` in a single write (+ fsync)."""
+        data = "".join(f"{k},{v}\n" for k, v in updates.items()).encode("utf-8")
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            if FSYNC:
+                os.fsync(fd)
+            st = os.fstat(fd)
+        finally:
+            os.close(fd)
+        self.ino = st.st_ino
+        self.offset = st.st_size
+        self.lines += len(updates)
+        self.values.update(updates)
+
+    def compact(self, path: str) -> None:
+        data = "".join(f"{k},{v}\n" for k, v in self.values.items()).encode("utf-8")
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        st = os.stat(path)
+        self.ino = st.st_ino
+        self.offset = st.st_size
+        self.lines = len(self.values)
+
+
+def _log_for(path: str) -> _CounterLog:
+    with _cache_lock:
+        log = _cache.get(path)
+        if log is None:
+            log = _cache[path] = _CounterLog()
+        return log
+
+
+def reserve(path: str, key: str, count: int = 1) -> int:
+    """
+    Atomically reserve `count` consecutive values for `key` and return the first one.
+    The block first..first+count-1 belongs to the caller alone, across all workers.
+    """
+    return reserve_many(path, {key: count})[key]
+
+
+def reserve_many(path: str, counts: Dict[str, int]) -> Dict[str, int]:
+    """reserve() for several keys under one lock and one write; returns {key: first value}."""
+    if any(c < 1 for c in counts.values()):
+        raise ValueError("count must be >= 1")
+    if not counts:
+        return {}
+    log = _log_for(path)
+    with file_lock.locked(path):
+        log.sync(path)
+        firsts = {k: log.values.get(k, 0) + 1 for k in counts}
+        log.append(path, {k: firsts[k] + counts[k] - 1 for k in counts})
+        if log.lines > max(COMPACT_MIN_LINES, COMPACT_FACTOR * len(log.values)):
+            log.compact(path)
+    return firsts
+
+
+def increment(path: str, key: str) -> int:
+    return reserve(path, key, 1)
+
+
+def current(path: str, key: str) -> int:
+    """Last value handed out for `key` (0 if none)."""
+    log = _log_for(path)
+    with file_lock.locked(path):
+        log.sync(path)
+        return log.values.get(key, 0)
@@ -0,0 +1,32 @@
+from typing import Dict, Optional
+
+from . import doctor_database_management
+from .csv_index import CsvIndex
+
+# In-memory index over the credentials CSV (doctor_database_management.CSV_PATH), keyed by
+# normalized email and license (see csv_index).
+
+
+def normalize(value: str) -> str:
+    return (value or "").strip().lower()
+
+
+_index = CsvIndex(
+    lambda: doctor_database_management.CSV_PATH,
+    "credential_index_build",
+    unique={
+        "email": lambda r: normalize(r.get("email")),
+        "license": lambda r: normalize(r.get("license")),
+    },
+)
+
+append = _index.append
+invalidate = _index.invalidate
+
+
+def get_by_email(email: str) -> Optional[Dict]:
+    return _index.get("email", normalize(email))
+
+
+def get_by_license(license_no: str) -> Optional[Dict]:
+    return _index.get("license", normalize(license_no))
@@ -0,0 +1,123 @@
+import csv
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from ..services import metrics
+
+# In-memory index over a CSV file, shared by doctor_directory and credential_index.
+#
+# Each index is described by key functions: `unique` ones map a key to the first row that
+# has it (matching the old "scan and break" lookups), `grouped` ones map a key to every row
+# that has it. The index is tied to the file's (inode, size, mtime) signature: any change by
+# another process (append, rewrite, atomic replace) is detected on the next lookup and the
+# index is rebuilt aside and swapped in. Our own appends go through append(), which folds
+# the new rows in without a reload when nobody else wrote in between.
+
+KeyFn = Callable[[Dict], str]
+
+_UNLOADED = object()
+
+
+def file_sig(st) -> tuple:
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class _Snapshot:
+    def __init__(self, index: "CsvIndex"):
+        self.records: List[Dict] = []
+        self.unique: Dict[str, Dict[str, Dict]] = {name: {} for name in index.unique}
+        self.grouped: Dict[str, Dict[str, List[Dict]]] = {name: {} for name in index.grouped}
+
+
+class CsvIndex:
+    def __init__(self, path: Callable[[], str], op: str, unique: Dict[str, KeyFn],
+                 grouped: Optional[Dict[str, KeyFn]] = None, skip_fields: Iterable[str] = ()):
+        # `path` is called on every use: data_paths may point the module path elsewhere
+        self.path = path
+        self.op = op
+        self.unique = unique
+        self.grouped = grouped or {}
+        self.skip_fields = frozenset(skip_fields)
+        self._lock = threading.Lock()
+        self._sig = _UNLOADED
+        self._snapshot: Optional[_Snapshot] = None
+
+    def _add(self, snap: _Snapshot, row: Dict) -> None:
+        rec = {k: v for k, v in row.items() if k not in self.skip_fields} if self.skip_fields else row
+        snap.records.append(rec)
+        for name, key_fn in self.unique.items():
+            key = key_fn(rec)
+            if key:
+                snap.unique[name].setdefault(key, rec)
+        for name, key_fn in self.grouped.items():
+            key = key_fn(rec)
+            if key:
+                snap.grouped[name].setdefault(key, []).append(rec)
+
+    def current_sig(self):
+        try:
+            return file_sig(os.stat(self.path()))
+        except FileNotFoundError:
+            return None
+
+    def _build(self):
+        snap = _Snapshot(self)
+        try:
+            f = open(self.path(), newline="", encoding="utf-8")
+        except FileNotFoundError:
+            return None, snap
+        with metrics.timer(metrics.STORAGE_DURATION, op=self.op), f:
+            # stat the handle we actually read so a concurrent replace can't mislabel the index
+            st = os.fstat(f.fileno())
+            for r in csv.DictReader(f):
+                self._add(snap, r)
+        metrics.scanned(self.op, len(snap.records), st.st_size)
+        return file_sig(st), snap
+
+    def _get(self) -> _Snapshot:
+        """Return the current snapshot, rebuilding it if the file changed since it was loaded."""
+        if self.current_sig() == self._sig:
+            return self._snapshot
+        with self._lock:
+            if self.current_sig() != self._sig:
+                sig, snap = self._build()
+                self._snapshot, self._sig = snap, sig
+            return self._snapshot
+
+    def note_appended(self, records: List[Dict], sig_before, sig_after) -> None:
+        """
+        Fold rows the caller just appended into the index if it was current before the write
+        and nothing else touched the file in between; otherwise drop it for a rebuild.
+        """
+        with self._lock:
+            if self._sig is not _UNLOADED and self._sig == sig_before and sig_after is not None:
+                for record in records:
+                    self._add(self._snapshot, record)
+                self._sig = sig_after
+            else:
+                self._sig = _UNLOADED
+
+    def append(self, data: bytes, records: List[Dict]) -> None:
+        """Append encoded `records` to the file and fold them in; caller holds the file lock."""
+        with open(self.path(), "ab") as f:
+            before = file_sig(os.fstat(f.fileno()))
+            f.write(data)
+            f.flush()
+            after = file_sig(os.fstat(f.fileno()))
+        # only fold the rows in if the file grew by exactly our bytes (no concurrent writer)
+        self.note_appended(records, before, after if after[1] == before[1] + len(data) else None)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._sig = _UNLOADED
+
+    def get(self, name: str, key: str) -> Optional[Dict]:
+        rec = self._get().unique[name].get(key or "")
+        return dict(rec) if rec else None
+
+    def get_all(self, name: str, key: str) -> List[Dict]:
+        return [dict(r) for r in self._get().grouped[name].get(key or "", [])]
+
+    def records_from(self, position: int) -> List[Dict]:
+        return [dict(r) for r in self._get().records[position:]]
@@ -0,0 +1,68 @@
+import os
+from typing import Optional
+
+from . import (
+    booking_analytics,
+    booking_journal,
+    booking_store,
+    client_db_manager,
+    doctor_database_management,
+    doctor_db_manager,
+    qr_blob_store,
+    search_index,
+    storage,
+)
+from ..services import idempotency, notify, otp, sessions
+
+# Where the app keeps its files. Without a data directory everything stays where it always
+# was (CSVs, counters, journal and blobs under db_manager/, the credentials CSV in the app
+# folder, QR PNGs under static/qr). With one (DATA_DIR config or DOCTOPAL_DATA_DIR), all of
+# it lives under that directory with the same file names, and the source tree stays read-only.
+# Nothing here runs at import; create_app() calls configure() and then ensure_dirs().
+
+
+def configure(data_dir: Optional[str]) -> None:
+    """Point every module path at `data_dir`; must run before any data is read or written."""
+    if not data_dir:
+        return
+    data_dir = os.path.abspath(data_dir)
+    join = lambda *parts: os.path.join(data_dir, *parts)
+
+    doctor_db_manager.CSV_PATH = join("doctor_db_dataframe.csv")
+    doctor_db_manager.QR_DIR = join("qr")
+    doctor_db_manager.LEGACY_QR_CACHE_DIR = join("qr_cache")
+    doctor_db_manager.COUNTER_DIR = join("counters")
+    doctor_db_manager.DOCTOR_COUNTER_PATH = join("counters", "doctor_counter.csv")
+    doctor_db_manager.CLINIC_COUNTER_PATH = join("counters", "clinic_counter.csv")
+    doctor_database_management.BASE_DIR = data_dir
+    doctor_database_management.CSV_PATH = join("doctor_credentials_dataframe_database.csv")
+    qr_blob_store.BLOB_DIR = join("blobs")
+    booking_journal.JOURNAL_PATH = join("booking_journal.log")
+    booking_journal.OFFSET_PATH = booking_journal.JOURNAL_PATH + ".offset"
+    client_db_manager.BOOKING_DIR = data_dir
+    booking_store.BOOKING_ROOT = join("bookings")
+    search_index.SNAPSHOT_PATH = join("search_index.snapshot")
+
+    # SQLite files follow unless their own env var pins them elsewhere
+    if not os.environ.get("DOCTOPAL_SQLITE_PATH"):
+        storage.DEFAULT_SQLITE_PATH = join("doctopal.sqlite3")
+        storage.configure(sqlite_path=storage.DEFAULT_SQLITE_PATH)
+    if not os.environ.get("DOCTOPAL_OTP_SQLITE_PATH"):
+        otp.configure(sqlite_path=join("otp.sqlite3"))
+    if not os.environ.get("DOCTOPAL_SESSION_SQLITE_PATH"):
+        sessions.configure(sqlite_path=join("sessions.sqlite3"))
+    if not os.environ.get("DOCTOPAL_IDEMPOTENCY_SQLITE_PATH"):
+        idempotency.configure(sqlite_path=join("idempotency.sqlite3"))
+    if not os.environ.get("DOCTOPAL_ANALYTICS_SQLITE_PATH"):
+        booking_analytics.configure(sqlite_path=join("booking_analytics.sqlite3"))
+    if not os.environ.get("DOCTOPAL_NOTIFY_DEAD_LETTER"):
+        notify.configure(dead_letter_path=join("notifications.deadletter.jsonl"))
+    if not os.environ.get("DOCTOPAL_NOTIFY_OUTBOX"):
+        notify.configure(outbox=join("notifications.outbox.jsonl"))
+
+
+def ensure_dirs() -> None:
+    """Create the directories writers expect to exist (formerly done at import time)."""
+    for path in (doctor_db_manager.QR_DIR, doctor_db_manager.COUNTER_DIR,
+                 os.path.dirname(doctor_database_management.CSV_PATH)):
+        os.makedirs(path, exist_ok=True)
@@ -4,6 +4,11 @@ import re
 from datetime import datetime
 from typing import Dict, Optional
 
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from . import storage
+from ..services import ids, metrics, password_hasher
+
 # Base app directory (one level up from db_manager)
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 # CSV stored inside db_manager folder
@@ -12,6 +17,8 @@ CSV_PATH = os.path.join(BASE_DIR, "doctor_credentials_dataframe_database.csv")
 EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 LICENSE_RE = re.compile(r"^[A-Z0-9\-]{5,20}$", re.I)
 PASS_RE = re.compile(r"^(?=.*[A-Za-z])(?=.*\d).{8,}$")
+# lifetime of the link in the verification email
+VERIFY_TOKEN_MAX_AGE = 7 * 24 * 3600
 
 # CSV headers for registration records
 HEADERS = [
@@ -23,6 +30,7 @@ HEADERS = [
     "password_hash",    # store hashed password (for demo we store placeholder)
     "created_at",
     "verified",         # false until email verification
+    "directory_doctor_id",  # directory row this login acts for; set by `flask link-doctor`
 ]
 
 def ensure_csv():
@@ -31,7 +39,21 @@ def ensure_csv():
         with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
             writer = csv.DictWriter(f, fieldnames=HEADERS)
             writer.writeheader()
+        return
+    # files written before a column was added get the new header (rows read back as empty)
+    with open(CSV_PATH, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), [])
+    if header != HEADERS:
+        with open(CSV_PATH, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        tmp = CSV_PATH + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=HEADERS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp, CSV_PATH)
 
+@metrics.timed("validate_registration")
 def validate_registration(data: Dict) -> Optional[str]:
     firstname = (data.get("firstname") or "").strip()
     lastname = (data.get("lastname") or "").strip()
@@ -50,25 +72,19 @@ def validate_registration(data: Dict) -> Optional[str]:
     if not PASS_RE.match(password):
         return "Password must be at least 8 chars and include letters and numbers"
     # check uniqueness
-    ensure_csv()
-    with open(CSV_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            if r.get("email","").lower() == email.lower():
-                return "Email already registered"
-            if r.get("license","").lower() == license_no.lower():
-                return "License number already registered"
+    backend = storage.get_backend()
+    if backend.find_credential_by_email(email):
+        return "Email already registered"
+    if backend.find_credential_by_license(license_no):
+        return "License number already registered"
     return None
 
 def _generate_doctor_id() -> str:
-    ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    rand = f"{os.urandom(2).hex()}"
-    return f"D{ts}{rand}"
+    return "D" + ids.new_id()
 
 def _hash_password(password: str) -> str:
-    # Placeholder: replace with bcrypt or passlib in production
-    import hashlib
-    return hashlib.sha256(password.encode("utf-8")).hexdigest()
+    # scrypt/PBKDF2 on the bounded KDF pool; raises password_hasher.HasherBusy when saturated
+    return password_hasher.hash_password(password)
 
 def append_registration_record(data: Dict) -> Dict:
     """
@@ -81,7 +97,6 @@ def append_registration_record(data: Dict) -> Dict:
     if err:
         raise ValueError(err)
 
-    ensure_csv()
     doctor_id = _generate_doctor_id()
     password_hash = _hash_password(data["password"])
 
@@ -94,30 +109,65 @@ def append_registration_record(data: Dict) -> Dict:
         "password_hash": password_hash,
         "created_at": datetime.utcnow().isoformat(),
         "verified": "false",
+        "directory_doctor_id": "",
     }
 
-    with open(CSV_PATH, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=HEADERS)
-        writer.writerow(record)
+    storage.get_backend().append_credential(record)
 
     return record
 
 def find_by_email(email: str) -> Optional[Dict]:
-    ensure_csv()
-    email = (email or "").strip().lower()
-    with open(CSV_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            if r.get("email","").lower() == email:
-                return r
-    return None
+    return storage.get_backend().find_credential_by_email(email)
 
 def find_by_license(license_no: str) -> Optional[Dict]:
-    ensure_csv()
-    license_no = (license_no or "").strip().lower()
-    with open(CSV_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            if r.get("license","").lower() == license_no:
-                return r
-    return None
+    return storage.get_backend().find_credential_by_license(license_no)
+
+def authenticate(email: str, password: str) -> Optional[Dict]:
+    """
+    Return the credential record if the password matches, else None.
+    Legacy SHA-256 (and under-cost) hashes are upgraded in place on a successful login.
+    """
+    rec = find_by_email(email)
+    if not rec or not rec.get("password_hash"):
+        # hash anyway, so the response time does not tell whether the email is registered
+        password_hasher.dummy_verify(password or "")
+        return None
+    if not password_hasher.verify_password(password or "", rec["password_hash"]):
+        return None
+    if password_hasher.needs_rehash(rec.get("password_hash", "")):
+        new_hash = password_hasher.hash_password(password)
+        storage.get_backend().update_credential(rec["doctor_id"], {"password_hash": new_hash})
+        rec["password_hash"] = new_hash
+    return rec
+
+def is_verified(rec: Dict) -> bool:
+    return (rec.get("verified") or "").lower() == "true"
+
+def link_directory_doctor(email: str, directory_doctor_id: str) -> Dict:
+    """
+    Tie a login to the directory row (and so the clinic) whose bookings it may read.
+    Raises ValueError if either side does not exist; returns the directory row.
+    """
+    backend = storage.get_backend()
+    rec = backend.find_credential_by_email(email)
+    if not rec:
+        raise ValueError("No account with that email")
+    doctor = backend.get_doctor_by_id(directory_doctor_id)
+    if not doctor:
+        raise ValueError("No directory doctor with that id")
+    backend.update_credential(rec["doctor_id"], {"directory_doctor_id": directory_doctor_id})
+    return doctor
+
+def make_verification_token(doctor_id: str, secret_key: str) -> str:
+    return URLSafeTimedSerializer(secret_key, salt="verify-email").dumps(doctor_id)
+
+def verify_email(token: str, secret_key: str) -> Optional[str]:
+    """Mark the account in a valid verification token as verified; returns its doctor_id, or None."""
+    try:
+        doctor_id = URLSafeTimedSerializer(secret_key, salt="verify-email").loads(
+            token, max_age=VERIFY_TOKEN_MAX_AGE)
+    except BadSignature:
+        return None
+    if not storage.get_backend().update_credential(doctor_id, {"verified": "true"}):
+        return None
+    return doctor_id
@@ -1,29 +1,35 @@
 import os
 import csv
-import qrcode
 import json
-import uuid
-import base64
+import time
 from datetime import datetime
 from urllib.parse import quote_plus
-from io import BytesIO
+
+from . import counter_store, qr_blob_store, qr_renderer, search_index, storage, weekdays
+from ..services import ids, metrics
 
 # Base app directory (one level up from db_manager)
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
 # Save QR images under app's static folder so Flask can serve them
+# (directories are created by create_app via data_paths.ensure_dirs, not at import)
 QR_DIR = os.path.join(BASE_DIR, "static", "qr")
-os.makedirs(QR_DIR, exist_ok=True)
 
 # CSV stored inside db_manager folder
 CSV_PATH = os.path.join(os.path.dirname(__file__), "doctor_db_dataframe.csv")
 
+# Pointer files (payload hash -> blob ref) left by the QR payload cache, which is gone;
+# nothing reads them any more and gc_qr_images clears them out
+LEGACY_QR_CACHE_DIR = os.path.join(os.path.dirname(__file__), "qr_cache")
+
 # Added fields:
 # - doctor_first_name, doctor_last_name
 # - doctor_id (generated): DOCID_<DoctorLastName>_<UniqueNumberPerDoctor>
 # - clinic_id (generated): CLINID_<ClinicName>_<UniqueNumberPerClinic>
 # - DOCLID (generated): DOCLID_<ClinicName>_<UniqueNumberPerClinic>_<DoctorLastName>_<UniqueNumberPerDoctor>
-# - qr_image_base64 (stores PNG binary as base64)
+# - qr_image_ref (sha256:<hex> reference into qr_blob_store; replaces the old inline qr_image_base64)
+# - qr_state (ready / pending while a background job renders the QR / failed)
+# - visit_days_mask (doctor_visit_days parsed into a weekday bit mask, see weekdays.py)
 CSV_FIELDS = [
     "doctor_id",
     "doctor_first_name",
@@ -35,46 +41,36 @@ CSV_FIELDS = [
     "clinic_address",
     "clinic_contact",
     "doctor_visit_days",
+    "visit_days_mask",
     "DOCLID",
     "qr_filename",
-    "qr_image_base64",
+    "qr_image_ref",
+    "qr_state",
     "created_at",
 ]
 
+# qr_state values; rows written before async rendering existed have an empty state (= ready)
+QR_STATE_READY = "ready"
+QR_STATE_PENDING = "pending"
+QR_STATE_FAILED = "failed"
+
 # Helper files to persist simple counters per clinic/doctor
 COUNTER_DIR = os.path.join(os.path.dirname(__file__), "counters")
-os.makedirs(COUNTER_DIR, exist_ok=True)
 DOCTOR_COUNTER_PATH = os.path.join(COUNTER_DIR, "doctor_counter.csv")
 CLINIC_COUNTER_PATH = os.path.join(COUNTER_DIR, "clinic_counter.csv")
 
 def _ensure_csv():
+    # Older files carry the PNG inline or lack newer columns; rewrite them before appending new-style rows
+    if qr_blob_store.needs_migration(CSV_PATH, CSV_FIELDS):
+        qr_blob_store.migrate_csv(CSV_PATH, CSV_FIELDS)
     if not os.path.exists(CSV_PATH):
         with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
             writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
             writer.writeheader()
 
-def _load_counter(path):
-    d = {}
-    if os.path.exists(path):
-        with open(path, newline="", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if len(row) >= 2:
-                    d[row[0]] = int(row[1])
-    return d
-
-def _save_counter(path, d):
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        for k, v in d.items():
-            writer.writerow([k, v])
-
+@metrics.timed("increment_counter")
 def _increment_counter_for(key: str, path: str):
-    d = _load_counter(path)
-    v = d.get(key, 0) + 1
-    d[key] = v
-    _save_counter(path, d)
-    return v
+    return counter_store.increment(path, key)
 
 def _generate_qr_payload(fields: dict) -> str:
     payload = {
@@ -91,45 +87,27 @@ def _generate_qr_payload(fields: dict) -> str:
     }
     return json.dumps(payload, ensure_ascii=False)
 
-def _save_qr_image_to_disk(img, filename: str) -> None:
-    path = os.path.join(QR_DIR, filename)
-    img.save(path, format="PNG")
+def _write_qr_png(png_bytes: bytes, filename: str) -> None:
+    with open(os.path.join(QR_DIR, filename), "wb") as f:
+        f.write(png_bytes)
 
 def _make_unique_filename() -> str:
-    ts = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-    return f"doctor_qr_{ts}_{uuid.uuid4().hex[:8]}.png"
+    return f"doctor_qr_{ids.new_id()}.png"
 
+@metrics.timed("doctor_exists")
 def _doctor_exists(doctor_id: str) -> str:
-    if not os.path.exists(CSV_PATH):
-        return ""
-    with open(CSV_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            if (r.get("doctor_id") or "") == doctor_id:
-                return r.get("qr_filename", "") or ""
-    return ""
+    r = storage.get_backend().get_doctor_by_id(doctor_id)
+    return (r.get("qr_filename", "") or "") if r else ""
 
 def _create_qr_image_bytes(data: str) -> bytes:
-    img = qrcode.make(data)
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    return buf.getvalue()
+    return qr_renderer.render_png(data)
 
 def _safe_id_component(s: str) -> str:
     # keep alnum and underscores only, collapse spaces to underscore
     return "".join(c for c in (s or "") if c.isalnum() or c in " _-").strip().replace(" ", "_")
 
-def append_doctor_record(fields: dict) -> str:
-    """
-    Existing behavior preserved. Changes:
-    - Split doctor_name into first/last from fields['doctor_name'] input.
-    - Generate doctor_id and clinic_id automatically and DOCLID.
-    - Store new fields in CSV. Other functionality unchanged.
-    """
-    _ensure_csv()
-    print("From form to backend:#################################################")
-    for key, value in fields.items():
-        print(f"{key}: {value}")
+def _clean_doctor_fields(fields: dict) -> dict:
+    """Validate seed input (form or bulk import row) and return the normalized fields."""
     # Parse and validate provided name (we still accept a single 'doctor_name' input from the form)
     doctor_first = (fields.get("doctor_first_name") or "").strip()
     if not doctor_first:
@@ -137,28 +115,6 @@ def append_doctor_record(fields: dict) -> str:
     doctor_last = (fields.get("doctor_last_name") or "").strip()
     if not doctor_last:
         raise ValueError("doctor_last_name is required")
-    
-
-    # Generate clinic_name canonical and clinic counter
-    clinic_name_raw = (fields.get("clinic_name") or "").strip() or "Clinic"
-    clinic_key = _safe_id_component(clinic_name_raw).upper()
-    clinic_counter = _increment_counter_for(clinic_key, CLINIC_COUNTER_PATH)
-    # Clinic ID format: CLINID_<ClinicName>_<UniqueNumberPerClinic>
-    clinic_id_generated = f"CLINID_{clinic_key}_{clinic_counter}"
-
-    # Generate doctor id using last name and doctor counter (unique per doctor last name)
-    doctor_key = _safe_id_component(doctor_last).upper()
-    doctor_counter = _increment_counter_for(doctor_key, DOCTOR_COUNTER_PATH)
-    # Doctor ID format: DOCID_<DoctorLastName>_<UniqueNumberPerDoctor>
-    doctor_id_generated = f"DOCID_{doctor_key}_{doctor_counter}"
-
-    # DOCLID format: DOCLID_<ClinicName>_<UniqueNumberPerClinic>_<DoctorLastName>_<UniqueNumberPerDoctor>
-    doclid = f"DOCLID_{clinic_key}_{clinic_counter}_{doctor_key}_{doctor_counter}"
-
-    # Check if record with same doctor_id exists; preserve previous behavior (if exists return existing qr)
-    existing_qr = _doctor_exists(doctor_id_generated)
-    if existing_qr:
-        return existing_qr
 
     # validate clinic_fees if provided
     fees = (fields.get("clinic_fees") or "").strip()
@@ -170,53 +126,176 @@ def append_doctor_record(fields: dict) -> str:
         except ValueError:
             raise ValueError("clinic_fees must be a valid non-negative number")
 
-    # Create QR filename
-    qr_filename = _make_unique_filename()
-
-    # Build JSON payload using the helper so QR contains the dictionary info
-    qr_payload = _generate_qr_payload({
-        "doctor_id": doctor_id_generated,
+    return {
         "doctor_first_name": doctor_first,
         "doctor_last_name": doctor_last,
         "doctor_qualifications": fields.get("doctor_qualifications", ""),
-        "clinic_id": clinic_id_generated,
-        "clinic_name": clinic_name_raw,
+        "clinic_name": (fields.get("clinic_name") or "").strip() or "Clinic",
         "clinic_fees": fields.get("clinic_fees", ""),
         "clinic_address": fields.get("clinic_address", ""),
         "clinic_contact": fields.get("clinic_contact", ""),
         "doctor_visit_days": fields.get("doctor_visit_days", ""),
-    })
-
-    # Create QR image bytes from payload and save disk copy
-    png_bytes = _create_qr_image_bytes(qr_payload)
-    from PIL import Image
-    img_buf = BytesIO(png_bytes)
-    img = Image.open(img_buf)
-    _save_qr_image_to_disk(img, qr_filename)
+        # parsed once here so readers never re-split the free text
+        "visit_days_mask": str(weekdays.parse_visit_days(fields.get("doctor_visit_days", ""))),
+    }
 
+def _counter_keys(clean: dict) -> tuple:
+    """(clinic_key, doctor_key) used for the clinic and doctor counters."""
+    clinic_key = _safe_id_component(clean["clinic_name"]).upper()
+    doctor_key = _safe_id_component(clean["doctor_last_name"]).upper()
+    return clinic_key, doctor_key
 
-    # Encode PNG bytes as base64 for CSV storage
-    qr_b64 = base64.b64encode(png_bytes).decode("ascii")
+def _generated_ids(clinic_key: str, clinic_counter: int, doctor_key: str, doctor_counter: int) -> dict:
+    return {
+        # Clinic ID format: CLINID_<ClinicName>_<UniqueNumberPerClinic>
+        "clinic_id": f"CLINID_{clinic_key}_{clinic_counter}",
+        # Doctor ID format: DOCID_<DoctorLastName>_<UniqueNumberPerDoctor>
+        "doctor_id": f"DOCID_{doctor_key}_{doctor_counter}",
+        # DOCLID format: DOCLID_<ClinicName>_<UniqueNumberPerClinic>_<DoctorLastName>_<UniqueNumberPerDoctor>
+        "DOCLID": f"DOCLID_{clinic_key}_{clinic_counter}_{doctor_key}_{doctor_counter}",
+    }
 
-    # Prepare CSV record and append (includes generated ids and DOCLID)
-    record = {
-        "doctor_id": doctor_id_generated,
-        "doctor_first_name": doctor_first,
-        "doctor_last_name": doctor_last,
-        "doctor_qualifications": fields.get("doctor_qualifications", ""),
-        "clinic_id": clinic_id_generated,
-        "clinic_name": clinic_name_raw,
-        "clinic_fees": fields.get("clinic_fees", ""),
-        "clinic_address": fields.get("clinic_address", ""),
-        "clinic_contact": fields.get("clinic_contact", ""),
-        "doctor_visit_days": fields.get("doctor_visit_days", ""),
-        "DOCLID": doclid,
+def _build_record(clean: dict, ids: dict, qr_filename: str, qr_ref: str, qr_state: str = QR_STATE_READY) -> dict:
+    """CSV record with generated ids and DOCLID."""
+    return {
+        "doctor_id": ids["doctor_id"],
+        "doctor_first_name": clean["doctor_first_name"],
+        "doctor_last_name": clean["doctor_last_name"],
+        "doctor_qualifications": clean["doctor_qualifications"],
+        "clinic_id": ids["clinic_id"],
+        "clinic_name": clean["clinic_name"],
+        "clinic_fees": clean["clinic_fees"],
+        "clinic_address": clean["clinic_address"],
+        "clinic_contact": clean["clinic_contact"],
+        "doctor_visit_days": clean["doctor_visit_days"],
+        "visit_days_mask": clean["visit_days_mask"],
+        "DOCLID": ids["DOCLID"],
         "qr_filename": qr_filename,
-        "qr_image_base64": qr_b64,
+        "qr_image_ref": qr_ref,
+        "qr_state": qr_state,
         "created_at": datetime.utcnow().isoformat(),
     }
-    with open(CSV_PATH, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
-        writer.writerow(record)
+
+def append_doctor_record(fields: dict, async_qr: bool = False) -> str:
+    """
+    Existing behavior preserved. Changes:
+    - Split doctor_name into first/last from fields['doctor_name'] input.
+    - Generate doctor_id and clinic_id automatically and DOCLID.
+    - Store new fields in CSV. Other functionality unchanged.
+    - async_qr=True stores the row as qr_state=pending and leaves rendering to qr_jobs
+      (falls back to rendering inline when the job queue is full).
+    """
+    print("From form to backend:#################################################")
+    for key, value in fields.items():
+        print(f"{key}: {value}")
+    clean = _clean_doctor_fields(fields)
+
+    # Generate clinic and doctor counters (unique per clinic name / doctor last name)
+    clinic_key, doctor_key = _counter_keys(clean)
+    clinic_counter = _increment_counter_for(clinic_key, CLINIC_COUNTER_PATH)
+    doctor_counter = _increment_counter_for(doctor_key, DOCTOR_COUNTER_PATH)
+    ids = _generated_ids(clinic_key, clinic_counter, doctor_key, doctor_counter)
+
+    # Check if record with same doctor_id exists; preserve previous behavior (if exists return existing qr)
+    existing_qr = _doctor_exists(ids["doctor_id"])
+    if existing_qr:
+        return existing_qr
+
+    # Create QR filename
+    qr_filename = _make_unique_filename()
+
+    # Build JSON payload using the helper so QR contains the dictionary info
+    qr_payload = _generate_qr_payload({**clean, **ids})
+
+    if async_qr:
+        from . import qr_jobs
+        if qr_jobs.try_reserve():
+            try:
+                record = _build_record(clean, ids, qr_filename, "", QR_STATE_PENDING)
+                storage.get_backend().append_doctor(record)
+            except BaseException:
+                qr_jobs.release()
+                raise
+            qr_jobs.submit(ids["doctor_id"], qr_filename, qr_payload)
+            search_index.sync()
+            return qr_filename
+
+    # Encode the QR once; the same PNG bytes go to static/qr and to the content-addressed
+    # blob store referenced by the CSV row
+    png_bytes, qr_ref = qr_renderer.render_stored(qr_payload)
+    _write_qr_png(png_bytes, qr_filename)
+
+    # Prepare CSV record and append (includes generated ids and DOCLID)
+    record = _build_record(clean, ids, qr_filename, qr_ref)
+    storage.get_backend().append_doctor(record)
+    search_index.sync()
     print(qr_filename)
-    return qr_filename
\ No newline at end of file
+    return qr_filename
+
+def backfill_visit_days_masks() -> int:
+    """Fill visit_days_mask for rows written before the column existed; returns rows updated."""
+    updates, seen = {}, set()
+    for r in storage.get_backend().iter_doctors():
+        doctor_id = r.get("doctor_id", "")
+        # updates apply to the first row of a doctor_id, like every other lookup
+        if not doctor_id or doctor_id in seen:
+            continue
+        seen.add(doctor_id)
+        if not (r.get("visit_days_mask") or "").strip():
+            updates[doctor_id] = {"visit_days_mask": str(weekdays.parse_visit_days(r.get("doctor_visit_days", "")))}
+    if not updates:
+        return 0
+    return storage.get_backend().update_doctors(updates)
+
+def gc_qr_images(min_age: float = 3600, dry_run: bool = False) -> dict:
+    """
+    Remove QR PNGs no directory row references: files in QR_DIR and blobs in the blob store.
+    Anything younger than `min_age` seconds is kept, since a seed writes its PNG before its row.
+    """
+    filenames, refs = set(), set()
+    for r in storage.get_backend().iter_doctors():
+        filenames.add(r.get("qr_filename") or "")
+        refs.add(r.get("qr_image_ref") or "")
+    stats = {"kept": 0, "removed": 0, "bytes": 0}
+    cutoff = time.time() - min_age
+    for name in os.listdir(QR_DIR) if os.path.isdir(QR_DIR) else []:
+        path = os.path.join(QR_DIR, name)
+        if not name.endswith(".png") or name in filenames:
+            stats["kept"] += 1
+            continue
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if st.st_mtime > cutoff:
+            stats["kept"] += 1
+            continue
+        if not dry_run:
+            os.remove(path)
+        stats["removed"] += 1
+        stats["bytes"] += st.st_size
+    return {"static": stats, "blobs": qr_blob_store.collect_garbage(refs, min_age, dry_run),
+            "qr_cache": _gc_legacy_qr_cache(dry_run)}
+
+def _gc_legacy_qr_cache(dry_run: bool) -> dict:
+    """Remove every qr_cache/ pointer file (and emptied subdirectory); none are read any more."""
+    stats = {"kept": 0, "removed": 0, "bytes": 0}
+    if not os.path.isdir(LEGACY_QR_CACHE_DIR):
+        return stats
+    for root, dirs, files in os.walk(LEGACY_QR_CACHE_DIR, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                size = os.path.getsize(path)
+                if not dry_run:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+            stats["removed"] += 1
+            stats["bytes"] += size
+        if not dry_run:
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass
+    return stats
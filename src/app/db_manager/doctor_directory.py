@@ -0,0 +1,52 @@
+from typing import Dict, List, Optional
+
+from . import doctor_db_manager
+from .csv_index import CsvIndex
+
+# In-memory index over doctor_db_manager.CSV_PATH (see csv_index).
+# Lookups by qr_filename / doctor_id / DOCLID are O(1) dict hits; clinic_id maps to a list
+# because several doctors may share a clinic.
+
+# Columns never needed by lookups; dropped from indexed rows to keep the index small
+_SKIPPED_FIELDS = ("qr_image_base64",)
+
+_index = CsvIndex(
+    lambda: doctor_db_manager.CSV_PATH,
+    "doctor_index_build",
+    unique={
+        "qr_filename": lambda r: r.get("qr_filename"),
+        "doctor_id": lambda r: r.get("doctor_id"),
+        "DOCLID": lambda r: r.get("DOCLID"),
+    },
+    grouped={"clinic_id": lambda r: r.get("clinic_id")},
+    skip_fields=_SKIPPED_FIELDS,
+)
+
+current_sig = _index.current_sig
+append = _index.append
+invalidate = _index.invalidate
+
+
+def get_by_qr_filename(qr_filename: str) -> Optional[Dict]:
+    return _index.get("qr_filename", qr_filename)
+
+
+def get_by_doctor_id(doctor_id: str) -> Optional[Dict]:
+    return _index.get("doctor_id", doctor_id)
+
+
+def get_by_doclid(doclid: str) -> Optional[Dict]:
+    return _index.get("DOCLID", doclid)
+
+
+def get_by_clinic_id(clinic_id: str) -> List[Dict]:
+    return _index.get_all("clinic_id", clinic_id)
+
+
+def all_records() -> List[Dict]:
+    return _index.records_from(0)
+
+
+def records_from(position: int) -> List[Dict]:
+    """Rows from file position `position` on; lets incremental consumers catch up cheaply."""
+    return _index.records_from(position)
@@ -0,0 +1,149 @@
+import base64
+import csv
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Iterable, Optional
+
+# Content-addressed store for QR PNGs. A blob lives at blobs/<hh>/<sha256>.png and is
+# referenced from CSV rows as "sha256:<hex>", so the directory CSV never carries image bytes.
+BLOB_DIR = os.path.join(os.path.dirname(__file__), "blobs")
+
+REF_PREFIX = "sha256:"
+
+# Column that older CSVs used for the inline base64 image
+LEGACY_IMAGE_FIELD = "qr_image_base64"
+IMAGE_REF_FIELD = "qr_image_ref"
+
+
+def _digest_from_ref(ref: str) -> str:
+    if not ref or not ref.startswith(REF_PREFIX):
+        raise ValueError(f"not a blob reference: {ref!r}")
+    digest = ref[len(REF_PREFIX):]
+    if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+        raise ValueError(f"not a blob reference: {ref!r}")
+    return digest
+
+
+def digest_of(ref: str) -> str:
+    """The hex digest of a reference (what the /qr/<digest>.png URLs carry)."""
+    return _digest_from_ref(ref)
+
+
+def path_for(ref: str) -> str:
+    digest = _digest_from_ref(ref)
+    return os.path.join(BLOB_DIR, digest[:2], f"{digest}.png")
+
+
+def put(data: bytes) -> str:
+    """Store bytes (idempotent) and return their reference."""
+    ref = REF_PREFIX + hashlib.sha256(data).hexdigest()
+    path = path_for(ref)
+    try:
+        # reusing a blob makes it young again, so collect_garbage's min_age covers the
+        # window before the caller's row points at it
+        os.utime(path)
+        return ref
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write aside then rename so readers never see a partial blob
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return ref
+
+
+def get(ref: str) -> Optional[bytes]:
+    try:
+        with open(path_for(ref), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def needs_migration(csv_path: str, fieldnames) -> bool:
+    """True if the CSV header is not the current layout (e.g. still has the inline base64 image column)."""
+    if not os.path.exists(csv_path):
+        return False
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), [])
+    return bool(header) and header != list(fieldnames)
+
+
+def migrate_csv(csv_path: str, fieldnames) -> Dict[str, int]:
+    """
+    One-shot rewrite of an older directory CSV to the current column layout: every inline
+    base64 PNG is moved into the blob store and replaced by its reference, and columns added
+    since are left empty. The new file is written aside and swapped in atomically.
+    Returns row count and file sizes before/after.
+    """
+    stats = {"rows": 0, "blobs": 0, "bytes_before": 0, "bytes_after": 0}
+    if not needs_migration(csv_path, fieldnames):
+        return stats
+    stats["bytes_before"] = os.path.getsize(csv_path)
+    out_dir = os.path.dirname(os.path.abspath(csv_path))
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    try:
+        with open(csv_path, newline="", encoding="utf-8") as src, \
+                os.fdopen(fd, "w", newline="", encoding="utf-8") as dst:
+            writer = csv.DictWriter(dst, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            for r in csv.DictReader(src):
+                b64 = r.pop(LEGACY_IMAGE_FIELD, "") or ""
+                if b64 and not r.get(IMAGE_REF_FIELD):
+                    r[IMAGE_REF_FIELD] = put(base64.b64decode(b64))
+                    stats["blobs"] += 1
+                writer.writerow(r)
+                stats["rows"] += 1
+        shutil.copymode(csv_path, tmp)
+        os.replace(tmp, csv_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    stats["bytes_after"] = os.path.getsize(csv_path)
+    return stats
+
+
+def collect_garbage(referenced: Iterable[str], min_age: float = 3600, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Delete blobs whose reference is not in `referenced`. Blobs younger than `min_age` seconds
+    are kept: a seed stores its blob before the directory row that points at it.
+    """
+    keep = {_digest_from_ref(ref) for ref in referenced if ref and ref.startswith(REF_PREFIX)}
+    stats = {"kept": 0, "removed": 0, "bytes": 0}
+    cutoff = time.time() - min_age
+    if not os.path.isdir(BLOB_DIR):
+        return stats
+    for sub in os.listdir(BLOB_DIR):
+        subdir = os.path.join(BLOB_DIR, sub)
+        if not os.path.isdir(subdir):
+            continue
+        for name in os.listdir(subdir):
+            digest, ext = os.path.splitext(name)
+            path = os.path.join(subdir, name)
+            if ext != ".png" or digest in keep:
+                stats["kept"] += 1
+                continue
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if st.st_mtime > cutoff:
+                stats["kept"] += 1
+                continue
+            if not dry_run:
+                os.remove(path)
+            stats["removed"] += 1
+            stats["bytes"] += st.st_size
+    return stats
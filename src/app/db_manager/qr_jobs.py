@@ -0,0 +1,188 @@
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+from . import doctor_db_manager, file_lock, qr_renderer, storage
+
+# Background QR rendering for /doctor-seed.
+#
+# In async mode the doctor row is stored straight away with qr_state=pending and a job is
+# queued; a small pool of worker threads renders the PNG, writes it to static/qr and flips
+# the row to ready (or failed after max_attempts). Admission is bounded: when queue_size jobs
+# are already outstanding, try_reserve() fails and the caller renders inline instead, which
+# pushes back on the client rather than growing the backlog.
+#
+# Finished renders do not each rewrite the directory: a worker adds its row's new state to a
+# shared batch and one update_doctors() call applies everything that finished within
+# flush_wait or while the previous rewrite ran (group commit), so a burst of N renders costs
+# far fewer than N rewrites.
+#
+# Pending rows left behind by a restart are rendered by recover_pending(), once per server
+# start: gunicorn runs it in the master before forking (see gunicorn.conf.py); a
+# single-process server runs it in the background from start(). It holds an inter-process
+# lock and re-reads each row, so overlapping recoveries never render a row twice.
+
+_settings = {
+    "workers": int(os.environ.get("DOCTOPAL_QR_WORKERS", "2")),
+    "queue_size": int(os.environ.get("DOCTOPAL_QR_QUEUE_SIZE", "64")),
+    "max_attempts": int(os.environ.get("DOCTOPAL_QR_MAX_ATTEMPTS", "3")),
+    "retry_delay": float(os.environ.get("DOCTOPAL_QR_RETRY_DELAY", "0.5")),
+    # how long a finished job waits for others to share its directory write
+    "flush_wait": float(os.environ.get("DOCTOPAL_QR_FLUSH_WAIT", "0.05")),
+}
+
+_lock = threading.Lock()
+_queue: "queue.Queue" = queue.Queue()
+_slots: Optional[threading.BoundedSemaphore] = None
+_started_pid = None
+# doctor_id -> column changes of finished jobs, not yet written
+_done: Dict[str, Dict] = {}
+_done_lock = threading.Lock()
+_flush_lock = threading.Lock()
+# rows per update_doctors() call during recovery
+RECOVERY_BATCH = 100
+
+
+def configure(workers: Optional[int] = None, queue_size: Optional[int] = None,
+              max_attempts: Optional[int] = None, retry_delay: Optional[float] = None) -> None:
+    """Set pool sizes and retry policy; takes effect when the workers start in this process."""
+    updates = {"workers": workers, "queue_size": queue_size,
+               "max_attempts": max_attempts, "retry_delay": retry_delay}
+    _settings.update({k: v for k, v in updates.items() if v is not None})
+
+
+def _ensure_workers() -> None:
+    """Start the worker threads once per process (threads do not survive fork)."""
+    global _started_pid, _queue, _slots
+    if _started_pid == os.getpid():
+        return
+    with _lock:
+        if _started_pid == os.getpid():
+            return
+        _queue = queue.Queue()
+        _slots = threading.BoundedSemaphore(_settings["queue_size"])
+        for i in range(_settings["workers"]):
+            threading.Thread(target=_worker, name=f"qr-job-{i}", daemon=True).start()
+        _started_pid = os.getpid()
+
+
+def try_reserve() -> bool:
+    """Claim a queue slot; False means the queue is full and the caller should render inline."""
+    _ensure_workers()
+    return _slots.acquire(blocking=False)
+
+
+def release() -> None:
+    _slots.release()
+
+
+def submit(doctor_id: str, qr_filename: str, payload: str) -> None:
+    """Queue a render for a row already stored as pending; caller must hold a slot from try_reserve()."""
+    _queue.put({"doctor_id": doctor_id, "qr_filename": qr_filename, "payload": payload, "attempt": 1})
+
+
+def _render(doctor_id: str, qr_filename: str, payload: str) -> Dict:
+    """Render and write one QR; returns the row changes that mark it ready."""
+    png_bytes, qr_ref = qr_renderer.render_stored(payload)
+    doctor_db_manager._write_qr_png(png_bytes, qr_filename)
+    return {"qr_image_ref": qr_ref, "qr_state": doctor_db_manager.QR_STATE_READY}
+
+
+def _flush() -> None:
+    """Write every finished job's state in one update_doctors() call."""
+    with _flush_lock:
+        time.sleep(_settings["flush_wait"])
+        with _done_lock:
+            batch = dict(_done)
+            _done.clear()
+        if not batch:
+            return  # a concurrent flush already wrote ours
+        try:
+            storage.get_backend().update_doctors(batch)
+        except BaseException:
+            with _done_lock:
+                for doctor_id, changes in batch.items():
+                    _done.setdefault(doctor_id, changes)
+            raise
+
+
+def _run(job: Dict) -> None:
+    changes = _render(job["doctor_id"], job["qr_filename"], job["payload"])
+    with _done_lock:
+        _done[job["doctor_id"]] = changes
+    _flush()
+
+
+def _worker() -> None:
+    while True:
+        job = _queue.get()
+        try:
+            while True:
+                try:
+                    _run(job)
+                    break
+                except Exception:
+                    if job["attempt"] >= _settings["max_attempts"]:
+                        try:
+                            storage.get_backend().update_doctor(
+                                job["doctor_id"], {"qr_state": doctor_db_manager.QR_STATE_FAILED})
+                        except Exception:
+                            pass
+                        break
+                    # exponential backoff between attempts
+                    time.sleep(_settings["retry_delay"] * (2 ** (job["attempt"] - 1)))
+                    job["attempt"] += 1
+        finally:
+            release()
+            _queue.task_done()
+
+
+def _recovery_lock_path() -> str:
+    return os.path.join(doctor_db_manager.QR_DIR, "recovery")
+
+
+def recover_pending() -> int:
+    """Render rows left pending by a previous run, in this thread; returns how many were rendered."""
+    rendered = 0
+    backend = storage.get_backend()
+    with file_lock.locked(_recovery_lock_path()):
+        pending = [r["doctor_id"] for r in backend.iter_doctors()
+                   if r.get("qr_state") == doctor_db_manager.QR_STATE_PENDING]
+        updates = {}
+        for doctor_id in pending:
+            # another recovery may have finished this row while we waited for the lock
+            r = backend.get_doctor_by_id(doctor_id)
+            if not r or r.get("qr_state") != doctor_db_manager.QR_STATE_PENDING:
+                continue
+            try:
+                updates[doctor_id] = _render(doctor_id, r["qr_filename"], doctor_db_manager._generate_qr_payload(r))
+            except Exception:
+                updates[doctor_id] = {"qr_state": doctor_db_manager.QR_STATE_FAILED}
+            rendered += 1
+            if len(updates) >= RECOVERY_BATCH:
+                backend.update_doctors(updates)
+                updates = {}
+        if updates:
+            backend.update_doctors(updates)
+    return rendered
+
+
+def start(recover: bool = True) -> None:
+    """Start the pool; with `recover`, also render leftover pending rows in the background."""
+    _ensure_workers()
+    if recover:
+        threading.Thread(target=recover_pending, name="qr-job-recovery", daemon=True).start()
+
+
+def status(qr_filename: str) -> Optional[Dict]:
+    r = storage.get_backend().get_doctor_by_qr(qr_filename)
+    if not r:
+        return None
+    return {
+        "doctor_id": r.get("doctor_id", ""),
+        "qr_filename": r.get("qr_filename", ""),
+        # rows written before async rendering have no state and are complete
+        "qr_state": r.get("qr_state") or doctor_db_manager.QR_STATE_READY,
+    }
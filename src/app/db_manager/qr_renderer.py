@@ -0,0 +1,68 @@
+import os
+from io import BytesIO
+from typing import Optional, Tuple
+
+from . import qr_blob_store
+from ..services import metrics
+
+# QR rendering with a single PNG encode per image. Payloads carry the doctor, clinic and
+# DOCLID ids the counters have just handed out, so no two seeds share one and there is
+# nothing to cache by payload; identical PNG bytes still share a blob.
+
+# qrcode (and PIL behind it) is imported on the first render, not with the app
+_ERROR_LEVELS = ("L", "M", "Q", "H")
+
+# Tunables (env or configure()):
+# - box_size: pixels per module; smaller images are cheaper to draw and compress
+# - error_correction: L/M/Q/H; lower levels need fewer modules (smaller, faster)
+# - compress_level: zlib level for the PNG (0-9); lower is faster, larger
+# - mask_pattern: 0-7 fixes the mask instead of scoring all eight, which is most of the
+#   encode time; None keeps qrcode's automatic choice
+_settings = {
+    "box_size": int(os.environ.get("DOCTOPAL_QR_BOX_SIZE", "10")),
+    "border": int(os.environ.get("DOCTOPAL_QR_BORDER", "4")),
+    "error_correction": os.environ.get("DOCTOPAL_QR_ERROR_CORRECTION", "M").upper(),
+    "compress_level": int(os.environ.get("DOCTOPAL_QR_COMPRESS_LEVEL", "6")),
+    "mask_pattern": int(os.environ["DOCTOPAL_QR_MASK_PATTERN"]) if os.environ.get("DOCTOPAL_QR_MASK_PATTERN") else None,
+}
+
+def configure(box_size: Optional[int] = None, border: Optional[int] = None,
+              error_correction: Optional[str] = None, compress_level: Optional[int] = None,
+              mask_pattern: Optional[int] = None) -> None:
+    if error_correction is not None and error_correction.upper() not in _ERROR_LEVELS:
+        raise ValueError("error_correction must be one of L, M, Q, H")
+    if compress_level is not None and not 0 <= compress_level <= 9:
+        raise ValueError("compress_level must be between 0 and 9")
+    if mask_pattern is not None and not 0 <= mask_pattern <= 7:
+        raise ValueError("mask_pattern must be between 0 and 7")
+    updates = {
+        "box_size": box_size,
+        "border": border,
+        "error_correction": error_correction.upper() if error_correction else None,
+        "compress_level": compress_level,
+        "mask_pattern": mask_pattern,
+    }
+    _settings.update({k: v for k, v in updates.items() if v is not None})
+
+
+@metrics.timed("qr_render")
+def render_png(payload: str) -> bytes:
+    """Encode `payload` as a QR code and return PNG bytes (one encode, no decode)."""
+    import qrcode.constants
+    qr = qrcode.QRCode(
+        error_correction=getattr(qrcode.constants, "ERROR_CORRECT_" + _settings["error_correction"]),
+        box_size=_settings["box_size"],
+        border=_settings["border"],
+        mask_pattern=_settings["mask_pattern"],
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    buf = BytesIO()
+    qr.make_image().save(buf, format="PNG", compress_level=_settings["compress_level"])
+    return buf.getvalue()
+
+
+def render_stored(payload: str) -> Tuple[bytes, str]:
+    """Render `payload` and store the PNG in the blob store; returns (png_bytes, blob_ref)."""
+    png_bytes = render_png(payload)
+    return png_bytes, qr_blob_store.put(png_bytes)
@@ -0,0 +1,259 @@
+import os
+import pickle
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from . import storage
+
+# Typeahead search over the doctor directory (names, qualifications, clinic name, address).
+#
+# Documents are the directory rows (first row per doctor_id). Text is split into lowercase
+# alphanumeric words, and each distinct word keeps a posting list of (doc, field weight).
+# A query term matches a word exactly, as a prefix (sorted vocabulary + bisect) or, for
+# terms of 3+ characters, anywhere inside it (trigram index over the vocabulary, so
+# "kader" finds "tikader" and "124" finds "700124"). Every term must match; a doc scores
+# the sum over terms of (match kind x field weight) and results are ranked by score.
+# Scoring runs on dense NumPy arrays (one slot per doc) over zero-copy views of the posting
+# arrays, so a broad prefix such as "ka" costs a few vector ops rather than a Python loop.
+#
+# The index follows the directory by insertion position: rows are append-only, so syncing
+# only reads rows past the last one indexed. append_doctor_record and bulk imports call
+# sync() after writing; queries also sync when the storage version token changed, which
+# picks up rows other workers appended. A pickled snapshot lets a worker start warm and
+# only catch up on rows added since it was written.
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), "search_index.snapshot")
+SNAPSHOT_FORMAT = 1
+
+FIELD_WEIGHTS = {
+    "doctor_first_name": 4,
+    "doctor_last_name": 4,
+    "doctor_qualifications": 3,
+    "clinic_name": 2,
+    "clinic_address": 1,
+}
+MATCH_EXACT, MATCH_PREFIX, MATCH_INFIX = 3, 2, 1
+MAX_TERMS = 6
+MAX_SCORE = MATCH_EXACT * max(FIELD_WEIGHTS.values()) * MAX_TERMS
+
+RESULT_FIELDS = (
+    "doctor_id",
+    "doctor_first_name",
+    "doctor_last_name",
+    "doctor_qualifications",
+    "clinic_id",
+    "clinic_name",
+    "clinic_address",
+    "clinic_fees",
+    "qr_filename",
+)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall((text or "").lower())
+
+
+def _trigrams(word: str):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class _Index:
+    def __init__(self):
+        self.docs: List[Tuple] = []  # RESULT_FIELDS values per doc
+        self.words: List[str] = []  # word id -> word
+        self.vocab: Dict[str, int] = {}  # word -> word id
+        self.sorted_words: List[str] = []
+        self.post_docs: List[array] = []  # word id -> doc ids (ascending, uint32)
+        self.post_weights: List[array] = []  # word id -> best field weight in that doc
+        self.trigrams: Dict[str, array] = {}  # trigram -> word ids
+        self.position = 0  # directory rows consumed
+        self.last_doctor_id = ""
+        self.seen_ids = set()
+        self.version = None
+
+    def _word_id(self, word: str) -> int:
+        wid = self.vocab.get(word)
+        if wid is None:
+            wid = self.vocab[word] = len(self.words)
+            self.words.append(word)
+            self.post_docs.append(array("I"))
+            self.post_weights.append(array("B"))
+            insort(self.sorted_words, word)
+            for tri in _trigrams(word):
+                self.trigrams.setdefault(tri, array("I")).append(wid)
+        return wid
+
+    def add(self, row: Dict) -> None:
+        self.position += 1
+        doctor_id = row.get("doctor_id") or ""
+        self.last_doctor_id = doctor_id
+        if not doctor_id or doctor_id in self.seen_ids:
+            return
+        self.seen_ids.add(doctor_id)
+        doc = len(self.docs)
+        # the doc goes in before its postings, so a posting never points past the list
+        self.docs.append(tuple(row.get(f, "") or "" for f in RESULT_FIELDS))
+        weights: Dict[str, int] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for word in tokenize(row.get(field, "")):
+                if weight > weights.get(word, 0):
+                    weights[word] = weight
+        for word, weight in weights.items():
+            wid = self._word_id(word)
+            self.post_docs[wid].append(doc)
+            self.post_weights[wid].append(weight)
+
+    def _matches(self, term: str) -> List[Tuple[int, int]]:
+        """(word id, match kind) for every vocabulary word the term matches."""
+        found: Dict[int, int] = {}
+        i = bisect_left(self.sorted_words, term)
+        while i < len(self.sorted_words) and self.sorted_words[i].startswith(term):
+            word = self.sorted_words[i]
+            found[self.vocab[word]] = MATCH_EXACT if word == term else MATCH_PREFIX
+            i += 1
+        if len(term) >= 3:
+            lists = [self.trigrams.get(t) for t in _trigrams(term)]
+            if all(lists):
+                for wid in min(lists, key=len):
+                    if wid not in found and term in self.words[wid]:
+                        found[wid] = MATCH_INFIX
+        return list(found.items())
+
+    def search(self, query: str, limit: int, offset: int) -> Tuple[int, List[Tuple[int, int]]]:
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_TERMS]
+        if not terms or not self.docs:
+            return 0, []
+        import numpy as np
+        n = len(self.docs)
+        total = np.zeros(n, dtype=np.uint16)
+        alive = None
+        for term in terms:
+            # dense per-term score: best (match kind x field weight) over the words it matched;
+            # posting arrays are viewed in place, not copied
+            term_score = np.zeros(n, dtype=np.uint8)
+            for wid, kind in self._matches(term):
+                if not self.post_docs[wid]:
+                    continue
+                docs = np.frombuffer(self.post_docs[wid], dtype=np.uint32)
+                scores = np.frombuffer(self.post_weights[wid], dtype=np.uint8) * np.uint8(kind)
+                term_score[docs] = np.maximum(term_score[docs], scores)
+            hit = term_score > 0
+            alive = hit if alive is None else alive & hit
+            if not alive.any():
+                return 0, []
+            total += term_score
+        idx = np.flatnonzero(alive)
+        # rank by score, then directory order: one integer key, smallest first
+        keys = (np.int64(MAX_SCORE) - total[idx]) * np.int64(n) + idx
+        want = min(offset + limit, idx.size)
+        part = np.argpartition(keys, want - 1)[:want] if want < idx.size else np.arange(idx.size)
+        best = part[np.argsort(keys[part], kind="stable")][offset:]
+        return int(idx.size), [(int(idx[i]), int(total[idx[i]])) for i in best]
+
+
+_lock = threading.Lock()
+_index: Optional[_Index] = None
+
+
+def _catch_up(idx: _Index) -> None:
+    backend = storage.get_backend()
+    version = backend.doctors_version()
+    for row in backend.iter_doctors(idx.position):
+        idx.add(row)
+    idx.version = version
+
+
+def _consistent(idx: _Index) -> bool:
+    """True if the directory still starts with the rows this index consumed."""
+    if idx.position == 0:
+        return True
+    row = next(storage.get_backend().iter_doctors(idx.position - 1), None)
+    return row is not None and (row.get("doctor_id") or "") == idx.last_doctor_id
+
+
+def _current() -> _Index:
+    """The index, caught up with the directory; caller holds _lock."""
+    global _index
+    version = storage.get_backend().doctors_version()
+    if _index is not None and version is not None and version == _index.version:
+        return _index
+    if _index is None or not _consistent(_index):
+        # first use, or the directory was replaced by different rows
+        _index = _Index()
+    _catch_up(_index)
+    return _index
+
+
+def sync() -> None:
+    """Index rows appended since the last sync (no-op until the index is first used)."""
+    with _lock:
+        if _index is not None:
+            _current()
+
+
+def rebuild() -> None:
+    global _index
+    with _lock:
+        _index = None
+        _current()
+
+
+def load_snapshot(path: Optional[str] = None) -> bool:
+    """Warm-start from a snapshot; False when it is missing, stale or from another format."""
+    global _index
+    try:
+        with open(path or SNAPSHOT_PATH, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        return False
+    if not isinstance(data, dict) or data.get("format") != SNAPSHOT_FORMAT \
+            or data.get("fields") != FIELD_WEIGHTS:
+        return False
+    idx = _Index()
+    idx.__dict__.update(data["state"])
+    with _lock:
+        if not _consistent(idx):
+            return False
+        _catch_up(idx)
+        _index = idx
+    return True
+
+
+def save_snapshot(path: Optional[str] = None) -> int:
+    """Write the current index atomically; returns the number of directory rows it covers."""
+    with _lock:
+        idx = _current()
+        # plain state rather than the class, so the file does not depend on the import path
+        data = pickle.dumps({"format": SNAPSHOT_FORMAT, "fields": FIELD_WEIGHTS, "state": vars(idx)},
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        position = idx.position
+    path = path or SNAPSHOT_PATH
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return position
+
+
+def warm() -> None:
+    """Startup hook: load the snapshot, or build from the directory and write one."""
+    if not load_snapshot():
+        rebuild()
+        save_snapshot()
+
+
+def search(query: str, limit: int = 10, offset: int = 0) -> Dict:
+    with _lock:
+        idx = _current()
+        total, top = idx.search(query, limit, offset)
+        results = []
+        for doc, score in top:
+            row = dict(zip(RESULT_FIELDS, idx.docs[doc]))
+            row["score"] = score
+            results.append(row)
+    return {"query": query, "total": total, "results": results}
@@ -0,0 +1,46 @@
+import os
+import threading
+
+from .base import StorageBackend
+
+# Backend selection: "csv" (default, the original file layout) or "sqlite".
+# create_app() calls configure() from app config; plain imports (scripts, CLI) fall back to env.
+DEFAULT_BACKEND = os.environ.get("DOCTOPAL_STORAGE", "csv")
+DEFAULT_SQLITE_PATH = os.environ.get(
+    "DOCTOPAL_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "doctopal.sqlite3"),
+)
+
+_lock = threading.Lock()
+_backend = None
+_settings = {"backend": DEFAULT_BACKEND, "sqlite_path": DEFAULT_SQLITE_PATH}
+
+
+def _build(name: str, sqlite_path: str) -> StorageBackend:
+    if name == "csv":
+        from .csv_backend import CsvBackend
+        return CsvBackend()
+    if name == "sqlite":
+        from .sqlite_backend import SqliteBackend
+        return SqliteBackend(sqlite_path)
+    raise ValueError(f"Unknown storage backend: {name!r}")
+
+
+def configure(backend: str = None, sqlite_path: str = None) -> None:
+    """Select the backend; takes effect on the next get_backend() call."""
+    global _backend
+    with _lock:
+        if backend:
+            _settings["backend"] = backend
+        if sqlite_path:
+            _settings["sqlite_path"] = sqlite_path
+        _backend = None
+
+
+def get_backend() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = _build(_settings["backend"], _settings["sqlite_path"])
+    return _backend
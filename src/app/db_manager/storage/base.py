@@ -0,0 +1,92 @@
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class StorageBackend:
+    """
+    Repository interface used by doctor_db_manager (directory), doctor_database_management
+    (credentials) and client_db_manager (bookings). Records are plain dicts keyed by the
+    CSV column names of each subsystem, whatever the backend stores underneath.
+    """
+
+    name = "base"
+
+    # --- doctor directory ---
+    def append_doctor(self, record: Dict) -> None:
+        raise NotImplementedError
+
+    def append_doctors(self, records: List[Dict]) -> None:
+        """Batch append; backends override this to write the whole batch at once."""
+        for record in records:
+            self.append_doctor(record)
+
+    def update_doctor(self, doctor_id: str, changes: Dict) -> bool:
+        """Overwrite columns of an existing doctor row; returns False if the row is missing."""
+        raise NotImplementedError
+
+    def update_doctors(self, updates: Dict[str, Dict]) -> int:
+        """Batch update keyed by doctor_id; returns how many rows changed."""
+        return sum(1 for doctor_id, changes in updates.items() if self.update_doctor(doctor_id, changes))
+
+    def doctors_version(self):
+        """
+        Cheap token that changes whenever the directory may have changed, so derived
+        snapshots can be reused; None means no such token and callers rebuild each time.
+        """
+        return None
+
+    def get_doctor_by_qr(self, qr_filename: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_doctor_by_id(self, doctor_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_doctor_by_doclid(self, doclid: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_doctors_by_clinic(self, clinic_id: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def iter_doctors(self, start: int = 0) -> Iterator[Dict]:
+        """All rows in insertion order, skipping the first `start` (rows are never reordered)."""
+        raise NotImplementedError
+
+    # --- credentials ---
+    def append_credential(self, record: Dict) -> None:
+        """Append a registration; raises ValueError if email or license is already taken."""
+        raise NotImplementedError
+
+    def update_credential(self, doctor_id: str, changes: Dict) -> bool:
+        """Overwrite columns of a registration row; returns False if it is missing."""
+        raise NotImplementedError
+
+    def find_credential_by_email(self, email: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def find_credential_by_license(self, license_no: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    # --- bookings ---
+    def append_booking(self, row: Dict) -> str:
+        """Persist one booking row and return where it landed (file name or table ref)."""
+        raise NotImplementedError
+
+    def iter_bookings(self, day_from: date, day_to: date, clinic_id: Optional[str] = None,
+                      doctor_id: Optional[str] = None, after: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        Stream (cursor, row) for bookings created between day_from and day_to (inclusive),
+        in a stable order; `after` resumes behind a cursor. Raises ValueError on a bad cursor.
+        """
+        raise NotImplementedError
+
+    def query_bookings(self, day_from: date, day_to: date, clinic_id: Optional[str] = None,
+                       doctor_id: Optional[str] = None, after: Optional[str] = None,
+                       limit: int = 50) -> Tuple[List[Dict], Optional[str]]:
+        """One page of bookings and the cursor of the next page (None on the last page)."""
+        page, last = [], None
+        for cursor, row in self.iter_bookings(day_from, day_to, clinic_id, doctor_id, after):
+            if len(page) == limit:
+                return page, last
+            page.append(row)
+            last = cursor
+        return page, None
@@ -0,0 +1,130 @@
+import csv
+import os
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .base import StorageBackend
+from .. import (
+    booking_journal,
+    booking_store,
+    credential_index,
+    doctor_database_management,
+    doctor_db_manager,
+    doctor_directory,
+    file_lock,
+)
+
+
+def _rewrite_rows(path: str, fieldnames, updates: Dict[str, Dict]) -> int:
+    """
+    Apply updates[doctor_id] to the first row of each doctor_id. CSV has no in-place update,
+    so the file is rewritten aside and swapped in; indexes reload on the new inode. Caller
+    holds the lock. Returns how many rows changed.
+    """
+    pending = dict(updates)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with open(path, newline="", encoding="utf-8") as src, \
+                os.fdopen(fd, "w", newline="", encoding="utf-8") as dst:
+            writer = csv.DictWriter(dst, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            for r in csv.DictReader(src):
+                changes = pending.pop(r.get("doctor_id"), None)
+                if changes is not None:
+                    r.update(changes)
+                writer.writerow(r)
+        changed = len(updates) - len(pending)
+        if changed:
+            shutil.copymode(path, tmp)
+            os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return changed
+
+
+class CsvBackend(StorageBackend):
+    """The original on-disk layout: doctor_db_dataframe.csv, the credentials CSV and per-day booking files."""
+
+    name = "csv"
+
+    # --- doctor directory ---
+    def append_doctor(self, record: Dict) -> None:
+        self.append_doctors([record])
+
+    def append_doctors(self, records: List[Dict]) -> None:
+        # one write() for the whole batch keeps bulk imports to a single append
+        buf = StringIO()
+        csv.DictWriter(buf, fieldnames=doctor_db_manager.CSV_FIELDS).writerows(records)
+        data = buf.getvalue().encode("utf-8")
+        # appends and in-place rewrites (update_doctor) share one lock so neither loses rows
+        with file_lock.locked(doctor_db_manager.CSV_PATH):
+            doctor_db_manager._ensure_csv()
+            doctor_directory.append(data, records)
+
+    def update_doctor(self, doctor_id: str, changes: Dict) -> bool:
+        return self.update_doctors({doctor_id: changes}) > 0
+
+    def update_doctors(self, updates: Dict[str, Dict]) -> int:
+        # one rewrite for the whole batch
+        with file_lock.locked(doctor_db_manager.CSV_PATH):
+            doctor_db_manager._ensure_csv()
+            return _rewrite_rows(doctor_db_manager.CSV_PATH, doctor_db_manager.CSV_FIELDS, updates)
+
+    def doctors_version(self):
+        return doctor_directory.current_sig()
+
+    def get_doctor_by_qr(self, qr_filename: str) -> Optional[Dict]:
+        return doctor_directory.get_by_qr_filename(qr_filename)
+
+    def get_doctor_by_id(self, doctor_id: str) -> Optional[Dict]:
+        return doctor_directory.get_by_doctor_id(doctor_id)
+
+    def get_doctor_by_doclid(self, doclid: str) -> Optional[Dict]:
+        return doctor_directory.get_by_doclid(doclid)
+
+    def get_doctors_by_clinic(self, clinic_id: str) -> List[Dict]:
+        return doctor_directory.get_by_clinic_id(clinic_id)
+
+    def iter_doctors(self, start: int = 0) -> Iterator[Dict]:
+        return iter(doctor_directory.records_from(start))
+
+    # --- credentials ---
+    def append_credential(self, record: Dict) -> None:
+        # check and append under one inter-process lock so two registrations with the same
+        # email/license can't both pass; the index refreshes itself if another worker appended
+        path = doctor_database_management.CSV_PATH
+        buf = StringIO()
+        csv.DictWriter(buf, fieldnames=doctor_database_management.HEADERS).writerow(record)
+        data = buf.getvalue().encode("utf-8")
+        with file_lock.locked(path):
+            doctor_database_management.ensure_csv()
+            if credential_index.get_by_email(record["email"]):
+                raise ValueError("Email already registered")
+            if credential_index.get_by_license(record["license"]):
+                raise ValueError("License number already registered")
+            credential_index.append(data, [record])
+
+    def update_credential(self, doctor_id: str, changes: Dict) -> bool:
+        with file_lock.locked(doctor_database_management.CSV_PATH):
+            doctor_database_management.ensure_csv()
+            return _rewrite_rows(doctor_database_management.CSV_PATH, doctor_database_management.HEADERS,
+                                 {doctor_id: changes}) > 0
+
+    def find_credential_by_email(self, email: str) -> Optional[Dict]:
+        return credential_index.get_by_email(email)
+
+    def find_credential_by_license(self, license_no: str) -> Optional[Dict]:
+        return credential_index.get_by_license(license_no)
+
+    # --- bookings ---
+    def append_booking(self, row: Dict) -> str:
+        # group-committed to the journal; the day file is filled in by its materializer
+        return booking_journal.append(row)
+
+    def iter_bookings(self, day_from: date, day_to: date, clinic_id: Optional[str] = None,
+                      doctor_id: Optional[str] = None, after: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        return booking_store.iter_bookings(day_from, day_to, clinic_id, doctor_id, after)
@@ -0,0 +1,61 @@
+import csv
+import os
+from typing import Dict
+
+from .. import booking_store, client_db_manager, doctor_database_management, doctor_db_manager
+from . import sqlite_backend
+
+
+def _read_rows(path: str):
+    if not os.path.exists(path):
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def booking_files():
+    """Booking partition files of the CSV backend, plus any not-yet-migrated flat day files."""
+    return booking_store.data_files() + booking_store.legacy_files()
+
+
+def import_csv_to_sqlite(sqlite_path: str) -> Dict[str, int]:
+    """
+    Load the CSV layout into a SQLite store, replacing whatever the tables held.
+    Runs as a single transaction so a failed import leaves the database untouched.
+    """
+    # the doctor CSV may still carry inline images; bring it to the current layout first
+    doctor_db_manager._ensure_csv()
+    backend = sqlite_backend.SqliteBackend(sqlite_path)
+    conn = backend._conn()
+    # rows actually inserted; duplicates skipped by INSERT OR IGNORE are counted separately
+    counts = {"doctors": 0, "credentials": 0, "bookings": 0, "duplicates": 0}
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM doctors")
+        conn.execute("DELETE FROM credentials")
+        conn.execute("DELETE FROM bookings")
+
+        # duplicates keep the first row, like the CSV lookups did
+        doctor_sql = sqlite_backend._insert_sql("doctors", doctor_db_manager.CSV_FIELDS, "INSERT OR IGNORE")
+        for r in _read_rows(doctor_db_manager.CSV_PATH):
+            inserted = conn.execute(doctor_sql, [r.get(c, "") for c in doctor_db_manager.CSV_FIELDS]).rowcount
+            counts["doctors"] += inserted
+            counts["duplicates"] += 1 - inserted
+        conn.execute(sqlite_backend.BUMP_DOCTORS_VERSION)
+
+        cred_sql = sqlite_backend._insert_sql("credentials", doctor_database_management.HEADERS, "INSERT OR IGNORE")
+        for r in _read_rows(doctor_database_management.CSV_PATH):
+            r["email"] = (r.get("email") or "").strip().lower()
+            inserted = conn.execute(cred_sql, [r.get(c, "") for c in doctor_database_management.HEADERS]).rowcount
+            counts["credentials"] += inserted
+            counts["duplicates"] += 1 - inserted
+
+        for path in booking_files():
+            for r in _read_rows(path):
+                conn.execute(sqlite_backend.INSERT_BOOKING, [r.get(c, "") for c in client_db_manager.BOOKING_FIELDS])
+                counts["bookings"] += 1
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return counts
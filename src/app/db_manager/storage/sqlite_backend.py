@@ -0,0 +1,260 @@
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .base import StorageBackend
+from .. import client_db_manager, doctor_database_management, doctor_db_manager
+
+
+def _columns(fields) -> str:
+    return ", ".join(f'"{c}" TEXT' for c in fields)
+
+
+def _insert_sql(table: str, fields, verb: str = "INSERT") -> str:
+    cols = ", ".join(f'"{c}"' for c in fields)
+    marks = ", ".join("?" for _ in fields)
+    return f"{verb} INTO {table} ({cols}) VALUES ({marks})"
+
+
+TABLES = f"""
+CREATE TABLE IF NOT EXISTS doctors (id INTEGER PRIMARY KEY, {_columns(doctor_db_manager.CSV_FIELDS)});
+CREATE TABLE IF NOT EXISTS credentials (id INTEGER PRIMARY KEY, {_columns(doctor_database_management.HEADERS)});
+CREATE TABLE IF NOT EXISTS bookings (id INTEGER PRIMARY KEY, {_columns(client_db_manager.BOOKING_FIELDS)});
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS ix_doctors_qr_filename ON doctors(qr_filename);
+CREATE INDEX IF NOT EXISTS ix_doctors_doctor_id ON doctors(doctor_id);
+CREATE INDEX IF NOT EXISTS ix_doctors_clinic_id ON doctors(clinic_id);
+CREATE INDEX IF NOT EXISTS ix_doctors_doclid ON doctors(DOCLID);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_credentials_email ON credentials(email);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_credentials_license ON credentials(license COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS ix_bookings_clinic_day ON bookings(clinic_id, visit_day);
+CREATE INDEX IF NOT EXISTS ix_bookings_created ON bookings(created_at);
+CREATE INDEX IF NOT EXISTS ix_bookings_clinic_created ON bookings(clinic_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_bookings_doctor_created ON bookings(doctor_id, created_at);
+"""
+
+# Statement texts are constants so sqlite3's per-connection statement cache reuses the
+# prepared statements across calls.
+INSERT_DOCTOR = _insert_sql("doctors", doctor_db_manager.CSV_FIELDS)
+INSERT_CREDENTIAL = _insert_sql("credentials", doctor_database_management.HEADERS)
+INSERT_BOOKING = _insert_sql("bookings", client_db_manager.BOOKING_FIELDS)
+SELECT_DOCTOR_BY_QR = "SELECT * FROM doctors WHERE qr_filename = ? ORDER BY id LIMIT 1"
+SELECT_DOCTOR_BY_ID = "SELECT * FROM doctors WHERE doctor_id = ? ORDER BY id LIMIT 1"
+SELECT_DOCTOR_BY_DOCLID = "SELECT * FROM doctors WHERE DOCLID = ? ORDER BY id LIMIT 1"
+SELECT_DOCTORS_BY_CLINIC = "SELECT * FROM doctors WHERE clinic_id = ? ORDER BY id"
+SELECT_DOCTORS = "SELECT * FROM doctors ORDER BY id LIMIT -1 OFFSET ?"
+SELECT_CREDENTIAL_BY_EMAIL = "SELECT * FROM credentials WHERE email = ? LIMIT 1"
+SELECT_CREDENTIAL_BY_LICENSE = "SELECT * FROM credentials WHERE license = ? COLLATE NOCASE LIMIT 1"
+# bumped in the same transaction as every write to doctors, so bookings and credentials
+# commits leave the directory version alone
+BUMP_DOCTORS_VERSION = (
+    "INSERT INTO counters (name, value) VALUES ('doctors_version', 1) "
+    "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+)
+SELECT_DOCTORS_VERSION = "SELECT value FROM counters WHERE name = 'doctors_version'"
+
+
+def _add_missing_columns(conn: sqlite3.Connection) -> None:
+    """Columns added to the CSV layouts after a database was created are added as empty TEXT."""
+    for table, fields in (("doctors", doctor_db_manager.CSV_FIELDS),
+                          ("credentials", doctor_database_management.HEADERS),
+                          ("bookings", client_db_manager.BOOKING_FIELDS)):
+        existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+        for c in fields:
+            if c not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN "{c}" TEXT DEFAULT \'\'')
+
+
+def _row(r: Optional[sqlite3.Row]) -> Optional[Dict]:
+    if r is None:
+        return None
+    d = dict(r)
+    d.pop("id", None)
+    return d
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Single-file SQLite store in WAL mode, so several gunicorn workers can read concurrently
+    while one writes. Each thread (and each forked process) gets its own connection.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # never reuse a connection inherited across fork()
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=128)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(TABLES)
+                _add_missing_columns(conn)
+                conn.executescript(INDEXES)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _insert(self, sql: str, fields, record: Dict) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = conn.execute(sql, [record.get(c, "") for c in fields])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cur.lastrowid
+
+    # --- doctor directory ---
+    def append_doctor(self, record: Dict) -> None:
+        self.append_doctors([record])
+
+    def append_doctors(self, records: List[Dict]) -> None:
+        fields = doctor_db_manager.CSV_FIELDS
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(INSERT_DOCTOR, ([r.get(c, "") for c in fields] for r in records))
+            conn.execute(BUMP_DOCTORS_VERSION)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _update(self, table: str, fields, doctor_id: str, changes: Dict) -> bool:
+        cols = [c for c in fields if c in changes]
+        if not cols:
+            return self._conn().execute(
+                f"SELECT 1 FROM {table} WHERE doctor_id = ? LIMIT 1", (doctor_id,)).fetchone() is not None
+        assignments = ", ".join(f'"{c}" = ?' for c in cols)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = conn.execute(
+                f"UPDATE {table} SET {assignments} WHERE id = "
+                f"(SELECT id FROM {table} WHERE doctor_id = ? ORDER BY id LIMIT 1)",
+                [changes[c] for c in cols] + [doctor_id],
+            )
+            if table == "doctors" and cur.rowcount:
+                conn.execute(BUMP_DOCTORS_VERSION)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cur.rowcount > 0
+
+    def update_doctor(self, doctor_id: str, changes: Dict) -> bool:
+        return self._update("doctors", doctor_db_manager.CSV_FIELDS, doctor_id, changes)
+
+    def update_doctors(self, updates: Dict[str, Dict]) -> int:
+        fields = doctor_db_manager.CSV_FIELDS
+        changed = 0
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for doctor_id, changes in updates.items():
+                cols = [c for c in fields if c in changes]
+                if not cols:
+                    continue
+                assignments = ", ".join(f'"{c}" = ?' for c in cols)
+                cur = conn.execute(
+                    f"UPDATE doctors SET {assignments} WHERE id = "
+                    "(SELECT id FROM doctors WHERE doctor_id = ? ORDER BY id LIMIT 1)",
+                    [changes[c] for c in cols] + [doctor_id],
+                )
+                changed += cur.rowcount
+            if changed:
+                conn.execute(BUMP_DOCTORS_VERSION)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return changed
+
+    def doctors_version(self):
+        row = self._conn().execute(SELECT_DOCTORS_VERSION).fetchone()
+        # the inode tells a replaced database file apart from one whose counter restarted
+        try:
+            ino = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            ino = None
+        return ino, row[0] if row else 0
+
+    def get_doctor_by_qr(self, qr_filename: str) -> Optional[Dict]:
+        return _row(self._conn().execute(SELECT_DOCTOR_BY_QR, (qr_filename,)).fetchone())
+
+    def get_doctor_by_id(self, doctor_id: str) -> Optional[Dict]:
+        return _row(self._conn().execute(SELECT_DOCTOR_BY_ID, (doctor_id,)).fetchone())
+
+    def get_doctor_by_doclid(self, doclid: str) -> Optional[Dict]:
+        return _row(self._conn().execute(SELECT_DOCTOR_BY_DOCLID, (doclid,)).fetchone())
+
+    def get_doctors_by_clinic(self, clinic_id: str) -> List[Dict]:
+        return [_row(r) for r in self._conn().execute(SELECT_DOCTORS_BY_CLINIC, (clinic_id,))]
+
+    def iter_doctors(self, start: int = 0) -> Iterator[Dict]:
+        for r in self._conn().execute(SELECT_DOCTORS, (start,)):
+            yield _row(r)
+
+    # --- credentials ---
+    def append_credential(self, record: Dict) -> None:
+        # the unique indexes make the check-and-insert atomic across workers
+        try:
+            self._insert(INSERT_CREDENTIAL, doctor_database_management.HEADERS, record)
+        except sqlite3.IntegrityError as e:
+            if "license" in str(e):
+                raise ValueError("License number already registered")
+            raise ValueError("Email already registered")
+
+    def update_credential(self, doctor_id: str, changes: Dict) -> bool:
+        return self._update("credentials", doctor_database_management.HEADERS, doctor_id, changes)
+
+    def find_credential_by_email(self, email: str) -> Optional[Dict]:
+        email = (email or "").strip().lower()
+        return _row(self._conn().execute(SELECT_CREDENTIAL_BY_EMAIL, (email,)).fetchone())
+
+    def find_credential_by_license(self, license_no: str) -> Optional[Dict]:
+        license_no = (license_no or "").strip()
+        return _row(self._conn().execute(SELECT_CREDENTIAL_BY_LICENSE, (license_no,)).fetchone())
+
+    # --- bookings ---
+    def append_booking(self, row: Dict) -> str:
+        rowid = self._insert(INSERT_BOOKING, client_db_manager.BOOKING_FIELDS, row)
+        return f"bookings#{rowid}"
+
+    def iter_bookings(self, day_from: date, day_to: date, clinic_id: Optional[str] = None,
+                      doctor_id: Optional[str] = None, after: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        # the cursor is the last rowid; ids only grow, so keyset paging is stable under inserts
+        try:
+            last_id = int(after) if after else 0
+        except ValueError:
+            raise ValueError("Invalid cursor")
+        sql = "SELECT * FROM bookings WHERE created_at >= ? AND created_at < ? AND id > ?"
+        args = [day_from.isoformat(), (day_to + timedelta(days=1)).isoformat(), last_id]
+        if clinic_id:
+            sql += " AND clinic_id = ?"
+            args.append(clinic_id)
+        if doctor_id:
+            sql += " AND doctor_id = ?"
+            args.append(doctor_id)
+        for r in self._conn().execute(sql + " ORDER BY id", args):
+            yield str(r["id"]), _row(r)
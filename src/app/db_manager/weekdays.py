@@ -0,0 +1,66 @@
+import re
+from typing import List, Optional
+
+# Canonical weekday schedule for doctor_visit_days.
+#
+# Seed forms hold free text ("mon. tue, wed, thur", "Mon, wed, thurs", "monday", "Mon-Fri").
+# It is parsed once at write time into a 7-bit mask, Monday = bit 0 ... Sunday = bit 6,
+# stored in the visit_days_mask column; readers use the mask instead of re-splitting text.
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+ALL_DAYS = (1 << len(WEEKDAYS)) - 1
+
+# spellings that are not a prefix of the full day name
+_ALIASES = {"weds": 2, "thr": 3, "thrs": 3}
+_SEPARATORS = re.compile(r"[\s,.;/|&+]+|\band\b")
+_RANGE_DASH = re.compile(r"\s*-\s*")
+_RANGE = re.compile(r"^([a-z]+)-([a-z]+)$")
+
+
+def day_index(token: str) -> Optional[int]:
+    """0-6 for a day name or a prefix of one ("tu", "thurs"), else None; single letters are ambiguous."""
+    token = (token or "").strip().lower()
+    if token in _ALIASES:
+        return _ALIASES[token]
+    if len(token) < 2:
+        return None
+    for i, name in enumerate(WEEKDAYS):
+        if name.lower().startswith(token):
+            return i
+    return None
+
+
+def parse_visit_days(text: str) -> int:
+    """Mask of the days named in `text`; unknown tokens are ignored."""
+    mask = 0
+    text = _RANGE_DASH.sub("-", (text or "").lower())
+    for token in _SEPARATORS.split(text):
+        if not token:
+            continue
+        m = _RANGE.match(token)
+        if m:
+            start, end = day_index(m.group(1)), day_index(m.group(2))
+            if start is not None and end is not None:
+                i = start
+                while True:
+                    mask |= 1 << i
+                    if i == end:
+                        break
+                    i = (i + 1) % len(WEEKDAYS)
+            continue
+        i = day_index(token)
+        if i is not None:
+            mask |= 1 << i
+    return mask
+
+
+def mask_to_days(mask: int) -> List[str]:
+    return [name for i, name in enumerate(WEEKDAYS) if mask & (1 << i)]
+
+
+def record_mask(record: dict) -> int:
+    """The stored mask, or the parsed text for rows written before the column existed."""
+    stored = (record.get("visit_days_mask") or "").strip()
+    if stored.isdigit():
+        return int(stored) & ALL_DAYS
+    return parse_visit_days(record.get("doctor_visit_days", ""))
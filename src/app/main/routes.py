@@ -1,18 +1,67 @@
 import csv
+import hashlib
+import io
+import itertools
+import json
 import os
-import random
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 from flask import (
+    Response,
+    abort,
     render_template,
+    send_file,
+    send_from_directory,
     request,
     current_app,
     jsonify,
     session,
+    stream_with_context,
     url_for,
 )
 from . import bp
-from ..db_manager import doctor_db_manager, doctor_database_management
+from ..db_manager import (
+    availability,
+    booking_analytics,
+    bulk_import,
+    client_db_manager,
+    doctor_db_manager,
+    doctor_database_management,
+    qr_blob_store,
+    qr_jobs,
+    search_index,
+    storage,
+    weekdays,
+)
+from ..services import ids, idempotency, notify, otp, page_cache, sessions
+from ..services.password_hasher import HasherBusy
+
+BOOKINGS_PAGE_SIZE = 50
+BOOKINGS_MAX_PAGE_SIZE = 500
+# longest from..to span the bookings API and export accept
+BOOKINGS_MAX_DAYS = 366
+AVAILABILITY_PAGE_SIZE = 50
+AVAILABILITY_MAX_PAGE_SIZE = 200
+SEARCH_PAGE_SIZE = 10
+SEARCH_MAX_PAGE_SIZE = 50
+SEARCH_MIN_QUERY = 2
+# default day range of the clinic analytics series
+ANALYTICS_DAYS = 30
+# QR URLs carry the PNG's hash, so a given URL's bytes never change
+QR_MAX_AGE = 365 * 24 * 3600
+# /doctor-seed form fields, also what the seed dashboard shows
+SEED_FIELDS = (
+    "doctor_id",
+    "doctor_first_name",
+    "doctor_last_name",
+    "doctor_qualifications",
+    "clinic_id",
+    "clinic_name",
+    "clinic_fees",
+    "clinic_address",
+    "clinic_contact",
+    "doctor_visit_days",
+)
 
 
 @bp.route("/", methods=["GET"])
@@ -24,18 +73,56 @@ def doctor_registration_form():
     return render_template("doctor_registration.html")
 
 @bp.route("/doctor-register", methods=["POST"])
+@idempotency.idempotent
 def register_route():
     data = request.get_json() or {}
+    if current_app.config.get("SECRET_KEY_EPHEMERAL") and not current_app.testing:
+        # the link would stop verifying after a restart or on another worker
+        current_app.logger.error("Registration refused: set FLASK_SECRET_KEY to send verification emails")
+        return jsonify(success=False, error="verification_unavailable"), 503
     try:
         rec = doctor_database_management.append_registration_record(data)
-        # TODO: send verification email asynchronously
+        token = doctor_database_management.make_verification_token(rec["doctor_id"], current_app.secret_key)
+        link = url_for("main.verify_email", token=token, _external=True)
+        notify.send_email(rec["email"], "Verify your DOCTOPAL account",
+                          f"Hello Dr. {rec['lastname']}, confirm your email address: {link}")
         return jsonify(success=True, doctor_id=rec["doctor_id"]), 201
+    except HasherBusy:
+        return jsonify(success=False, error="busy"), 503
     except ValueError as ve:
         return jsonify(success=False, error=str(ve)), 400
     except Exception as e:
         current_app.logger.exception("Failed to save registration")
         return jsonify(success=False, error="internal_error"), 500
 
+@bp.route("/verify-email", methods=["GET"])
+def verify_email():
+    doctor_id = doctor_database_management.verify_email(request.args.get("token", ""), current_app.secret_key)
+    if doctor_id is None:
+        return jsonify(success=False, error="invalid_or_expired_token"), 400
+    return jsonify(success=True, doctor_id=doctor_id), 200
+
+@bp.route("/doctor-login", methods=["POST"])
+def doctor_login_submit():
+    data = request.get_json() or {}
+    try:
+        rec = doctor_database_management.authenticate(data.get("email", ""), data.get("password", ""))
+    except HasherBusy:
+        # the KDF pool is saturated; shed load instead of queueing behind it
+        return jsonify(success=False, error="busy"), 503, {"Retry-After": "1"}
+    if not rec:
+        return jsonify(success=False, error="invalid_credentials"), 401
+    if not doctor_database_management.is_verified(rec):
+        return jsonify(success=False, error="email_not_verified"), 403
+    sessions.regenerate(session)
+    session["doctor_id"] = rec["doctor_id"]
+    session.pop("clinic_id", None)
+    # the clinic whose bookings this login may read; none until an operator links it
+    linked = storage.get_backend().get_doctor_by_id(rec.get("directory_doctor_id") or "")
+    if linked and linked.get("clinic_id"):
+        session["clinic_id"] = linked["clinic_id"]
+    return jsonify(success=True, doctor_id=rec["doctor_id"]), 200
+
 @bp.route("/doctor-forgot-password", methods=["GET"])
 def doctor_forgot_password_page():
     return render_template("doctor_forgot_password.html")
@@ -46,84 +133,180 @@ def doctor_seed_form():
 
 
 @bp.route("/doctor-seed", methods=["POST"])
+@idempotency.idempotent
 def doctor_seed_submit():
-    fields = {
-        "doctor_id": request.form.get("doctor_id", "").strip(),
-        "doctor_first_name": request.form.get("doctor_first_name", "").strip(),
-        "doctor_last_name": request.form.get("doctor_last_name", "").strip(),
-        "doctor_qualifications": request.form.get("doctor_qualifications", "").strip(),
-        "clinic_id": request.form.get("clinic_id", "").strip(),
-        "clinic_name": request.form.get("clinic_name", "").strip(),
-        "clinic_fees": request.form.get("clinic_fees", "").strip(),
-        "clinic_address": request.form.get("clinic_address", "").strip(),
-        "clinic_contact": request.form.get("clinic_contact", "").strip(),
-        "doctor_visit_days": request.form.get("doctor_visit_days", "").strip(),
-    }
+    fields = {name: request.form.get(name, "").strip() for name in SEED_FIELDS}
 
     try:
-        qr_filename = doctor_db_manager.append_doctor_record(fields)
-        # Store form data in session
-        session['last_submitted_data'] = fields
-        
-        current_app.logger.info("Saved QR: %s", qr_filename)
+        qr_filename = doctor_db_manager.append_doctor_record(fields, async_qr=current_app.config.get("QR_ASYNC", False))
+        # the dashboard looks the stored row up by this, instead of carrying a copy in the session
+        session["last_submitted_qr"] = qr_filename
+
+        qr_status = qr_jobs.status(qr_filename) or {}
+        qr_pending = qr_status.get("qr_state") == doctor_db_manager.QR_STATE_PENDING
+        current_app.logger.info("Saved QR: %s (%s)", qr_filename, qr_status.get("qr_state"))
         message = f"Saved. CSV updated; QR image: {qr_filename}"
         dashboard_url = url_for('main.doc_seed_dashboard')  # Update with the correct blueprint name
-        return render_template("doctor_db_seed.html", success_message=message, qr_filename=qr_filename, dashboard_url=dashboard_url)
+        return render_template("doctor_db_seed.html", success_message=message, qr_filename=qr_filename,
+                               qr_pending=qr_pending, dashboard_url=dashboard_url)
         
     except Exception as e:
         current_app.logger.exception("Failed to save doctor record")
         return render_template("doctor_db_seed.html", error_message=str(e)), 500
 
 
+@bp.app_template_global()
+def qr_url(qr) -> str:
+    """
+    URL of a doctor's QR image, from a directory row or its qr_filename. Rows with a stored
+    image get the content-hash URL; pending rows fall back to the file in QR_DIR.
+    """
+    record = qr if isinstance(qr, dict) else storage.get_backend().get_doctor_by_qr(qr or "")
+    ref = (record or {}).get("qr_image_ref") or ""
+    if ref.startswith(qr_blob_store.REF_PREFIX):
+        return url_for("main.qr_image", digest=qr_blob_store.digest_of(ref))
+    filename = (record or {}).get("qr_filename") or (qr if isinstance(qr, str) else "")
+    return url_for("main.qr_file", filename=filename)
+
+
+@bp.route("/qr/<digest>.png", methods=["GET"])
+def qr_image(digest):
+    try:
+        path = qr_blob_store.path_for(qr_blob_store.REF_PREFIX + digest)
+    except ValueError:
+        abort(404)
+    try:
+        # the digest is the strong ETag; send_file answers If-None-Match with 304
+        resp = send_file(path, mimetype="image/png", etag=digest, conditional=True, max_age=QR_MAX_AGE)
+    except FileNotFoundError:
+        abort(404)
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+
+@bp.route("/qr/files/<filename>", methods=["GET"])
+def qr_file(filename):
+    # QR_DIR is only under static/ in the default layout; with DATA_DIR it can be anywhere
+    return send_from_directory(doctor_db_manager.QR_DIR, filename, mimetype="image/png")
+
+
+@bp.route("/doctor-seed/qr-status", methods=["GET"])
+def doctor_seed_qr_status():
+    qr = request.args.get("qr", "").strip()
+    st = qr_jobs.status(qr) if qr else None
+    if not st:
+        return jsonify({"error": "record_not_found"}), 404
+    if st["qr_state"] == doctor_db_manager.QR_STATE_READY:
+        st["qr_url"] = qr_url(st["qr_filename"])
+    return jsonify(st), 200
+
+
+@bp.route("/doctor-seed/bulk", methods=["POST"])
+def doctor_seed_bulk():
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        return jsonify(success=False, error="missing_file"), 400
+    fmt = request.form.get("format") or bulk_import.detect_format(upload.filename)
+    try:
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+        report = bulk_import.import_doctors(stream, fmt, workers=current_app.config.get("BULK_IMPORT_WORKERS"))
+    except ValueError as ve:
+        return jsonify(success=False, error=str(ve)), 400
+    except Exception:
+        current_app.logger.exception("Bulk doctor import failed")
+        return jsonify(success=False, error="internal_error"), 500
+    current_app.logger.info("Bulk import: %s/%s rows in %ss", report["imported"], report["rows"], report["seconds"])
+    return jsonify(success=True, **report), 200
+
+
 @bp.route("/clinic-booking", methods=["GET"])
 def clinic_booking():
     qr = request.args.get("qr", "").strip()
     if not qr:
         return render_template("clinic_booking.html", error_message="Missing qr parameter"), 400
 
-    csv_path = os.path.join(os.path.dirname(__file__), "..", "db_manager", "doctor_db_dataframe.csv")
-    record = None
-    if os.path.exists(csv_path):
-        with open(csv_path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for r in reader:
-                if r.get("qr_filename") == qr:
-                    record = r
-                    break
-
+    record = storage.get_backend().get_doctor_by_qr(qr)
     if not record:
         return render_template("clinic_booking.html", error_message="Record not found"), 404
 
-    days = [d.strip() for d in (record.get("doctor_visit_days") or "").split(",") if d.strip()]
-    return render_template("clinic_booking.html", record=record, visit_days=days)
+    # the version covers every column of the row and the template file, so a rewritten
+    # record or a redeployed template gets a new ETag and a fresh render
+    template = "clinic_booking.html"
+    st = os.stat(current_app.jinja_env.get_template(template).filename)
+    stamp = json.dumps([sorted(record.items()), st.st_mtime_ns, st.st_size], ensure_ascii=False)
+    version = hashlib.sha1(stamp.encode("utf-8")).hexdigest()[:20]
+
+    if request.if_none_match.contains(version):
+        resp = Response(status=304)
+    else:
+        key = ("clinic_booking", qr)
+        entry = page_cache.get(key, version)
+        if entry is None:
+            days = weekdays.mask_to_days(weekdays.record_mask(record))
+            body = render_template(template, record=record, visit_days=days).encode("utf-8")
+            entry = page_cache.put(key, version, body)
+        resp = Response(entry.body, mimetype="text/html")
+        resp.last_modified = entry.rendered_at
+    resp.set_etag(version)
+    # phones may keep the page but must revalidate; a match costs a lookup, not a render
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
+
+
+def _otp_rate_limited(e: otp.OtpRateLimited):
+    retry_after = max(1, int(e.retry_after + 0.999))
+    return jsonify({"error": "rate_limited", "retry_after": retry_after}), 429, {"Retry-After": str(retry_after)}
 
 
 @bp.route("/send-otp", methods=["POST"])
 def send_otp():
+    # per-IP limit first, so a flood is turned away before any other work
+    try:
+        otp.check_ip(request.remote_addr, "send")
+    except otp.OtpRateLimited as e:
+        return _otp_rate_limited(e)
     mobile = request.form.get("mobile", "").strip()
     if not mobile or not mobile.isdigit() or len(mobile) < 10:
         return jsonify({"error": "invalid_mobile"}), 400
-    otp = str(random.randint(100000, 999999))
-    session["booking_otp"] = otp
+    try:
+        code = otp.send_code(mobile)
+    except otp.OtpRateLimited as e:
+        return _otp_rate_limited(e)
+    session.pop("otp_verified", None)
     session["booking_mobile"] = mobile
-    current_app.logger.info("Generated OTP for %s", mobile)
-    # For testing we return otp; replace with SMS provider in production
-    return jsonify({"otp": otp}), 200
+    notify.send_sms(mobile, f"Your DOCTOPAL booking code is {code}. It expires in {int(otp.ttl() // 60)} minutes.")
+    current_app.logger.info("Generated booking OTP")
+    if current_app.config.get("OTP_IN_RESPONSE"):
+        return jsonify({"otp": code}), 200
+    return jsonify({"sent": True}), 200
 
 
 @bp.route("/verify-otp", methods=["POST"])
 def verify_otp():
-    otp = request.form.get("otp", "").strip()
-    if not otp:
+    try:
+        otp.check_ip(request.remote_addr, "verify")
+    except otp.OtpRateLimited as e:
+        return _otp_rate_limited(e)
+    code = request.form.get("otp", "").strip()
+    if not code:
         return jsonify({"verified": False, "error": "missing_otp"}), 400
-    if session.get("booking_otp") == otp:
-        session.pop("booking_otp", None)
+    mobile = session.get("booking_mobile", "")
+    if not mobile:
+        return jsonify({"verified": False, "error": "otp_expired"}), 400
+    outcome, attempts_left = otp.verify_code(mobile, code)
+    if outcome == otp.VERIFIED:
         session["otp_verified"] = True
         return jsonify({"verified": True}), 200
-    return jsonify({"verified": False}), 400
+    if outcome == otp.LOCKED:
+        return jsonify({"verified": False, "error": "too_many_attempts"}), 429
+    if outcome == otp.EXPIRED:
+        return jsonify({"verified": False, "error": "otp_expired"}), 400
+    return jsonify({"verified": False, "attempts_left": attempts_left}), 400
 
 
 @bp.route("/submit-booking", methods=["POST"])
+@idempotency.idempotent
 def submit_booking():
     if not session.get("otp_verified"):
         return jsonify({"error": "otp_not_verified"}), 400
@@ -136,49 +319,12 @@ def submit_booking():
     if not qr or not patient_name or not patient_mobile:
         return jsonify({"error": "missing_fields"}), 400
 
-    csv_path = os.path.join(os.path.dirname(__file__), "..", "db_manager", "doctor_db_dataframe.csv")
-    if not os.path.exists(csv_path):
-        return jsonify({"error": "record_not_found"}), 404
-
-    record = None
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            if r.get("qr_filename") == qr:
-                record = r
-                break
-
+    record = storage.get_backend().get_doctor_by_qr(qr)
     if not record:
         return jsonify({"error": "record_not_found"}), 404
 
-    ts = datetime.utcnow().strftime("%Y%m%d")
-
-    def _safe(s: str) -> str:
-        return "".join(c for c in (s or "") if c.isalnum() or c in " _-").strip().replace(" ", "_")
-
-    clinic_id = record.get("clinic_id", "clinic")
-    clinic_name = _safe(record.get("clinic_name", ""))
-    doctor_name = _safe(record.get("doctor_name", ""))
-    booking_filename = f"{clinic_id}__{clinic_name}__{doctor_name}__{ts}.csv"
-
-    booking_dir = os.path.join(os.path.dirname(__file__), "..", "db_manager")
-    os.makedirs(booking_dir, exist_ok=True)
-    booking_path = os.path.join(booking_dir, booking_filename)
-
-    patient_id = f"P{datetime.utcnow().strftime('%Y%m%d%H%M%S')}{random.randint(100,999)}"
-
-    headers = [
-        "patient_id",
-        "patient_name",
-        "patient_mobile",
-        "visit_day",
-        "clinic_id",
-        "clinic_name",
-        "clinic_address",
-        "doctor_name",
-        "doctor_qualifications",
-        "created_at",
-    ]
+    patient_id = "P" + ids.new_id()
+
     row = {
         "patient_id": patient_id,
         "patient_name": patient_name,
@@ -187,17 +333,13 @@ def submit_booking():
         "clinic_id": record.get("clinic_id", ""),
         "clinic_name": record.get("clinic_name", ""),
         "clinic_address": record.get("clinic_address", ""),
-        "doctor_name": record.get("doctor_name", ""),
+        "doctor_id": record.get("doctor_id", ""),
+        "doctor_name": " ".join(
+            n for n in (record.get("doctor_first_name", ""), record.get("doctor_last_name", "")) if n),
         "doctor_qualifications": record.get("doctor_qualifications", ""),
         "created_at": datetime.utcnow().isoformat(),
     }
-
-    write_header = not os.path.exists(booking_path)
-    with open(booking_path, "a", newline="", encoding="utf-8") as bf:
-        writer = csv.DictWriter(bf, fieldnames=headers)
-        if write_header:
-            writer.writeheader()
-        writer.writerow(row)
+    booking_filename = client_db_manager.append_booking(row)
 
     session.pop("otp_verified", None)
     session.pop("booking_mobile", None)
@@ -205,7 +347,162 @@ def submit_booking():
     current_app.logger.info("Saved booking %s to %s", patient_id, booking_filename)
     return jsonify({"patient_id": patient_id, "booking_file": booking_filename}), 200
 
+def _booking_filters():
+    """Parse the shared query args of the bookings API; raises ValueError on bad input."""
+    today = datetime.utcnow().date()
+    try:
+        day_from = date.fromisoformat(request.args.get("from") or today.isoformat())
+        day_to = date.fromisoformat(request.args.get("to") or day_from.isoformat())
+    except ValueError:
+        raise ValueError("from/to must be YYYY-MM-DD")
+    if day_to < day_from:
+        raise ValueError("to is before from")
+    if (day_to - day_from).days >= BOOKINGS_MAX_DAYS:
+        raise ValueError(f"from..to spans more than {BOOKINGS_MAX_DAYS} days")
+    return {
+        "day_from": day_from,
+        "day_to": day_to,
+        "clinic_id": request.args.get("clinic_id", "").strip() or None,
+        "doctor_id": request.args.get("doctor_id", "").strip() or None,
+    }
+
+
+def _clinic_access_error(clinic_id=None):
+    """
+    Error response unless the logged-in doctor may read `clinic_id`'s bookings (only their
+    own clinic's); None when access is allowed.
+    """
+    if not session.get("doctor_id"):
+        return jsonify({"error": "login_required"}), 401
+    own = session.get("clinic_id")
+    if not own:
+        return jsonify({"error": "no_clinic_linked"}), 403
+    if clinic_id and clinic_id != own:
+        return jsonify({"error": "forbidden"}), 403
+    return None
+
+
+def _own_booking_filters():
+    """_booking_filters() narrowed to the caller's clinic; call after _clinic_access_error()."""
+    filters = _booking_filters()
+    filters["clinic_id"] = session["clinic_id"]
+    return filters
+
+
+@bp.route("/api/bookings", methods=["GET"])
+def bookings_api():
+    denied = _clinic_access_error(request.args.get("clinic_id", "").strip())
+    if denied:
+        return denied
+    try:
+        filters = _own_booking_filters()
+        limit = max(1, min(int(request.args.get("limit", BOOKINGS_PAGE_SIZE)), BOOKINGS_MAX_PAGE_SIZE))
+        rows, next_cursor = storage.get_backend().query_bookings(
+            after=request.args.get("cursor") or None, limit=limit, **filters)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    return jsonify({"bookings": rows, "next_cursor": next_cursor}), 200
+
+
+@bp.route("/api/bookings/export", methods=["GET"])
+def bookings_export():
+    denied = _clinic_access_error(request.args.get("clinic_id", "").strip())
+    if denied:
+        return denied
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    try:
+        filters = _own_booking_filters()
+        rows = storage.get_backend().iter_bookings(**filters)
+        # pull the first row now so a bad request fails before the 200 goes out
+        first = next(rows, None)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    def generate():
+        pending = [] if first is None else [first]
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=client_db_manager.BOOKING_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+        for n, (_, row) in enumerate(itertools.chain(pending, rows), 1):
+            if fmt == "ndjson":
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+                continue
+            writer.writerow(row)
+            # flush every few hundred rows: chunky enough for throughput, bounded memory
+            if n % 500 == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        if fmt == "csv":
+            yield buf.getvalue()
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    filename = f"bookings_{filters['day_from']:%Y%m%d}_{filters['day_to']:%Y%m%d}.{fmt}"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+@bp.route("/api/analytics/clinics/<clinic_id>", methods=["GET"])
+def clinic_analytics(clinic_id):
+    """Booking counts and revenue estimate for a clinic, read from the maintained aggregates."""
+    clinic_id = clinic_id.strip()
+    denied = _clinic_access_error(clinic_id)
+    if denied:
+        return denied
+    today = datetime.utcnow().date()
+    try:
+        day_to = date.fromisoformat(request.args.get("to") or today.isoformat())
+        day_from = date.fromisoformat(request.args.get("from") or (day_to - timedelta(days=ANALYTICS_DAYS - 1)).isoformat())
+    except ValueError:
+        return jsonify({"error": "from/to must be YYYY-MM-DD"}), 400
+    if day_to < day_from:
+        return jsonify({"error": "to is before from"}), 400
+    booking_analytics.refresh_if_stale()
+    summary = booking_analytics.clinic_summary(clinic_id, day_from, day_to)
+    if summary is None:
+        return jsonify({"error": "no bookings for this clinic"}), 404
+    return jsonify({**summary, "from": day_from.isoformat(), "to": day_to.isoformat()}), 200
+
+
+@bp.route("/api/availability", methods=["GET"])
+def availability_search():
+    day = weekdays.day_index(request.args.get("day", ""))
+    if day is None:
+        return jsonify({"error": "day must be a weekday name such as thu or Thursday"}), 400
+    try:
+        max_fee = request.args.get("max_fee", "").strip()
+        max_fee = float(max_fee) if max_fee else None
+        limit = max(1, min(int(request.args.get("limit", AVAILABILITY_PAGE_SIZE)), AVAILABILITY_MAX_PAGE_SIZE))
+        offset = max(0, int(request.args.get("offset", 0)))
+    except ValueError:
+        return jsonify({"error": "max_fee, limit and offset must be numbers"}), 400
+    result = availability.search(day, request.args.get("qualification", ""), max_fee, limit, offset)
+    for d in result["doctors"]:
+        d["booking_url"] = url_for("main.clinic_booking", qr=d["qr_filename"])
+    return jsonify(result), 200
+
+
+@bp.route("/api/search", methods=["GET"])
+def doctor_search():
+    q = request.args.get("q", "").strip()
+    try:
+        limit = max(1, min(int(request.args.get("limit", SEARCH_PAGE_SIZE)), SEARCH_MAX_PAGE_SIZE))
+        offset = max(0, int(request.args.get("offset", 0)))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be numbers"}), 400
+    if len(q) < SEARCH_MIN_QUERY:
+        return jsonify({"query": q, "total": 0, "results": []}), 200
+    result = search_index.search(q, limit, offset)
+    for d in result["results"]:
+        d["booking_url"] = url_for("main.clinic_booking", qr=d["qr_filename"])
+    return jsonify(result), 200
+
+
 @bp.route("/doc-seed-dashboard")
 def doc_seed_dashboard():
-    doctor_data = session.get('last_submitted_data', {})
+    record = storage.get_backend().get_doctor_by_qr(session.get("last_submitted_qr", "")) or {}
+    doctor_data = {name: record[name] for name in (*SEED_FIELDS, "qr_filename") if name in record}
     return render_template("doctor_dashboard.html", doctor_data=doctor_data)
\ No newline at end of file
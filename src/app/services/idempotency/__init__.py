@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from functools import wraps
+from typing import Dict, Optional
+
+from .. import metrics
+from .base import CLAIMED, DONE, IdempotencyStore, Stored
+
+# Idempotency-Key support for POST routes that create things.
+#
+# A client that retries with the same Idempotency-Key header gets the stored response of the
+# first successful attempt, and the view does not run again. A duplicate that arrives while the
+# first attempt is still running waits for it (coalescing) instead of running alongside it.
+# Only 2xx responses are stored: after an error the client may fix things and retry with the
+# same key. Keys are scoped per endpoint and per client (the server-side session ID, else the
+# session's booking mobile) and tied to a hash of the request; reusing a key for a different
+# request is answered with 422. A request with no client scope (an anonymous caller without a
+# session) cannot be told apart from anyone else's, so its key is ignored and the view simply
+# runs. Keys are expected to be random (e.g. a UUID4). Requests without the header are
+# unaffected.
+#
+# Backends: "memory" (default, per process, LRU-bounded by entries) or "sqlite" (one file
+# shared by all workers on the host, what gunicorn.conf.py uses, so a retry that lands on
+# another worker is still answered from the store). Entries expire after ttl seconds.
+
+DEFAULT_SQLITE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "db_manager", "idempotency.sqlite3")
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+IDEMPOTENCY = "doctopal_idempotency_requests_total"
+# how often a duplicate re-checks a key claimed by another process
+POLL_INTERVAL = 0.05
+
+# headers that belong to the original exchange, not to the stored result
+_SKIP_HEADERS = {"set-cookie", "date", "content-length", "vary"}
+
+_settings = {
+    "backend": os.environ.get("DOCTOPAL_IDEMPOTENCY_BACKEND", "memory"),
+    "sqlite_path": os.environ.get("DOCTOPAL_IDEMPOTENCY_SQLITE_PATH", DEFAULT_SQLITE_PATH),
+    "ttl": float(os.environ.get("DOCTOPAL_IDEMPOTENCY_TTL", str(24 * 3600))),
+    "max_entries": int(os.environ.get("DOCTOPAL_IDEMPOTENCY_MAX_ENTRIES", "10000")),
+    # how long a duplicate waits for the in-flight original before giving up with 409
+    "wait": float(os.environ.get("DOCTOPAL_IDEMPOTENCY_WAIT", "30")),
+    # how long a claim holds a key; after that a worker that died mid-request no longer blocks it
+    "lease": float(os.environ.get("DOCTOPAL_IDEMPOTENCY_LEASE", "300")),
+}
+
+_lock = threading.Lock()
+_store = None
+# claims held by this process, so local duplicates wake as soon as the original finishes
+_inflight: Dict[str, threading.Event] = {}
+_stats = {"hits": 0, "misses": 0, "coalesced": 0, "mismatches": 0}
+
+metrics.describe(IDEMPOTENCY, "counter", "Requests with an Idempotency-Key, by endpoint and outcome.")
+
+
+def _build(name: str) -> IdempotencyStore:
+    if name == "memory":
+        from .memory import MemoryIdempotencyStore
+        return MemoryIdempotencyStore(_settings["max_entries"])
+    if name == "sqlite":
+        from .sqlite_store import SqliteIdempotencyStore
+        return SqliteIdempotencyStore(_settings["sqlite_path"])
+    raise ValueError(f"Unknown idempotency backend: {name!r}")
+
+
+def configure(ttl: Optional[float] = None, max_entries: Optional[int] = None,
+              wait: Optional[float] = None, backend: Optional[str] = None,
+              sqlite_path: Optional[str] = None) -> None:
+    """Set expiry and limits and select the store; the store is rebuilt on the next use."""
+    global _store
+    updates = {"ttl": ttl, "max_entries": max_entries, "wait": wait, "backend": backend,
+               "sqlite_path": sqlite_path}
+    with _lock:
+        _settings.update({k: v for k, v in updates.items() if v is not None})
+        _store = None
+
+
+def get_store() -> IdempotencyStore:
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = _build(_settings["backend"])
+    return _store
+
+
+def _fingerprint(request) -> str:
+    h = hashlib.sha256(f"{request.method} {request.full_path}\n".encode())
+    if request.form:
+        h.update(json.dumps(sorted(request.form.items(multi=True))).encode())
+    else:
+        h.update(request.get_data(cache=True))
+    return h.hexdigest()
+
+
+def _client_scope() -> str:
+    """Who the key belongs to: the server-side session ID, else the session's booking mobile."""
+    from flask import session
+
+    scope = getattr(session, "sid", None) or session.get("booking_mobile") or ""
+    # session IDs are credentials; the store only sees a hash
+    return hashlib.sha256(scope.encode()).hexdigest()[:32] if scope else ""
+
+
+def _count(endpoint: str, outcome: str, stat: str) -> None:
+    with _lock:
+        _stats[stat] += 1
+    metrics.inc(IDEMPOTENCY, endpoint=endpoint, outcome=outcome)
+
+
+def _replay(stored: Stored):
+    from flask import Response
+
+    resp = Response(stored.body, status=stored.status, headers=list(stored.headers))
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def _error(status: int, error: str):
+    from flask import jsonify
+
+    return jsonify(success=False, error=error), status
+
+
+def idempotent(view):
+    """Route decorator: honour an Idempotency-Key header (see module comment)."""
+    @wraps(view)
+    def inner(*args, **kwargs):
+        from flask import make_response, request
+
+        idem_key = request.headers.get(HEADER, "").strip()
+        if not idem_key:
+            return view(*args, **kwargs)
+        if len(idem_key) > MAX_KEY_LENGTH:
+            return _error(400, "invalid_idempotency_key")
+        endpoint = request.endpoint or view.__name__
+        scope = _client_scope()
+        if not scope:
+            # another anonymous caller's key would match; neither replay nor block on it
+            metrics.inc(IDEMPOTENCY, endpoint=endpoint, outcome="unscoped")
+            return view(*args, **kwargs)
+        key = f"{endpoint}\n{scope}\n{idem_key}"
+        fingerprint = _fingerprint(request)
+        store = get_store()
+
+        deadline = time.monotonic() + _settings["wait"]
+        waited = False
+        while True:
+            state, found = store.begin(key, fingerprint, time.time(), _settings["lease"])
+            if state == CLAIMED:
+                done = threading.Event()
+                with _lock:
+                    _inflight[key] = done
+                break
+            other_fingerprint = found.fingerprint if state == DONE else found
+            if other_fingerprint != fingerprint:
+                _count(endpoint, "mismatch", "mismatches")
+                return _error(422, "idempotency_key_reused")
+            if state == DONE:
+                _count(endpoint, "hit", "hits")
+                return _replay(found)
+            # same request already running: wait for its result, then look again
+            if not waited:
+                _count(endpoint, "coalesced", "coalesced")
+                waited = True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return _error(409, "request_in_progress")
+            with _lock:
+                local = _inflight.get(key)
+            if local is not None:
+                local.wait(remaining)
+            else:
+                time.sleep(min(POLL_INTERVAL, remaining))
+
+        _count(endpoint, "miss", "misses")
+        finished = False
+        try:
+            resp = make_response(view(*args, **kwargs))
+            if 200 <= resp.status_code < 300 and not resp.is_streamed:
+                headers = tuple((k, v) for k, v in resp.headers.items() if k.lower() not in _SKIP_HEADERS)
+                now = time.time()
+                store.finish(key, Stored(fingerprint, resp.status_code, headers, resp.get_data(),
+                                         now + _settings["ttl"]), now)
+                finished = True
+            return resp
+        finally:
+            if not finished:
+                store.release(key)
+            with _lock:
+                _inflight.pop(key, None)
+            done.set()
+
+    return inner
+
+
+def clear() -> None:
+    get_store().clear()
+
+
+def stats() -> dict:
+    with _lock:
+        counts = dict(_stats)
+        in_flight = len(_inflight)
+    return {**counts, "entries": len(get_store()), "in_flight": in_flight}
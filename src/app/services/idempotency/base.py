@@ -0,0 +1,45 @@
+from typing import NamedTuple, Optional, Tuple
+
+# begin() outcomes
+CLAIMED = "claimed"  # the caller owns the key and runs the view
+DONE = "done"        # a stored response exists
+RUNNING = "running"  # another request (in any process sharing the store) holds the key
+
+
+class Stored(NamedTuple):
+    fingerprint: str
+    status: int
+    headers: Tuple[Tuple[str, str], ...]
+    body: bytes
+    expires_at: float
+
+
+class IdempotencyStore:
+    """
+    Stored responses and in-flight claims keyed by an opaque string (endpoint, client scope
+    and Idempotency-Key). A claim lapses after its lease, so a process that died mid-request
+    does not block the key forever.
+    """
+
+    name = "base"
+
+    def begin(self, key: str, fingerprint: str, now: float, lease: float) -> Tuple[str, Optional[object]]:
+        """
+        Claim `key` unless it is taken: (CLAIMED, None), (DONE, Stored) or (RUNNING, the
+        claimant's fingerprint).
+        """
+        raise NotImplementedError
+
+    def finish(self, key: str, stored: Stored, now: float) -> None:
+        """Replace the caller's claim with the response to replay."""
+        raise NotImplementedError
+
+    def release(self, key: str) -> None:
+        """Drop the caller's claim without storing anything (errors are not replayed)."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
@@ -0,0 +1,53 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .base import CLAIMED, DONE, RUNNING, IdempotencyStore, Stored
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """
+    Per-process store: stored responses in an LRU bounded by max_entries, claims in a dict.
+    Retries that reach another worker run the view again; use the sqlite backend there.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Stored]" = OrderedDict()
+        self._claims: Dict[str, Tuple[str, float]] = {}
+
+    def begin(self, key: str, fingerprint: str, now: float, lease: float) -> Tuple[str, Optional[object]]:
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is not None:
+                if stored.expires_at > now:
+                    self._entries.move_to_end(key)
+                    return DONE, stored
+                del self._entries[key]
+            claim = self._claims.get(key)
+            if claim is not None and claim[1] > now:
+                return RUNNING, claim[0]
+            self._claims[key] = (fingerprint, now + lease)
+            return CLAIMED, None
+
+    def finish(self, key: str, stored: Stored, now: float) -> None:
+        with self._lock:
+            self._claims.pop(key, None)
+            self._entries[key] = stored
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._claims.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+from .base import CLAIMED, DONE, RUNNING, IdempotencyStore, Stored
+
+# Stored responses shared by every worker on the host, in a small SQLite file in WAL mode
+# (same setup as the session and OTP stores). A claim is a row with no status yet; begin()
+# is one BEGIN IMMEDIATE transaction, so exactly one worker claims a key. Rows are bounded by
+# their ttl (claims by their lease) and swept every SWEEP_EVERY writes.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+    key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, status INTEGER,
+    headers TEXT, body BLOB, expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_idempotency_expires ON idempotency(expires_at);
+"""
+
+SWEEP_EVERY = 256
+
+
+class SqliteIdempotencyStore(IdempotencyStore):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # never reuse a connection inherited across fork()
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self, fn, now: float):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            self._writes += 1
+            if self._writes % SWEEP_EVERY == 0:
+                conn.execute("DELETE FROM idempotency WHERE expires_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def begin(self, key: str, fingerprint: str, now: float, lease: float) -> Tuple[str, Optional[object]]:
+        def claim(conn):
+            row = conn.execute(
+                "SELECT fingerprint, status, headers, body, expires_at FROM idempotency "
+                "WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            if row is not None:
+                if row[1] is None:
+                    return RUNNING, row[0]
+                return DONE, Stored(row[0], row[1], tuple(tuple(h) for h in json.loads(row[2])), row[3], row[4])
+            conn.execute(
+                "INSERT OR REPLACE INTO idempotency (key, fingerprint, status, headers, body, expires_at) "
+                "VALUES (?, ?, NULL, NULL, NULL, ?)", (key, fingerprint, now + lease))
+            return CLAIMED, None
+        return self._transaction(claim, now)
+
+    def finish(self, key: str, stored: Stored, now: float) -> None:
+        self._transaction(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO idempotency (key, fingerprint, status, headers, body, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, stored.fingerprint, stored.status, json.dumps(stored.headers), stored.body, stored.expires_at),
+        ), now)
+
+    def release(self, key: str) -> None:
+        self._conn().execute("DELETE FROM idempotency WHERE key = ? AND status IS NULL", (key,))
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM idempotency")
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM idempotency WHERE status IS NOT NULL").fetchone()[0]
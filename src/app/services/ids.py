@@ -0,0 +1,52 @@
+import itertools
+import os
+import random
+import time
+
+# Snowflake-style IDs for patients, doctors and QR files: unique without locks, I/O or a
+# central allocator, and sorting as strings sorts them by creation time.
+#
+#   11 hex  milliseconds since EPOCH_MS (good until the 2570s)
+#    2 hex  node id (DOCTOPAL_NODE_ID, 0-255), for several hosts writing to shared data
+#    6 hex  process id (Linux pids fit in 22 bits)
+#    6 hex  per-process sequence
+#
+# The sequence is an itertools.count, whose next() is atomic under the GIL, so threads never
+# share a value. It runs on across milliseconds and wraps at 2**24, so a process would need 16M
+# IDs inside one millisecond to repeat itself; it starts at a random offset so a reused pid does
+# not replay its predecessor's values. Forked children pick up their own pid via the fork hook.
+
+EPOCH_MS = 1_704_067_200_000  # 2024-01-01T00:00:00Z
+LENGTH = 25
+
+_SEQ_MASK = 0xFFFFFF
+_node = int(os.environ.get("DOCTOPAL_NODE_ID", "0")) & 0xFF
+_prefix = ""
+_seq = itertools.count()
+
+
+def _reset() -> None:
+    global _prefix, _seq
+    _prefix = f"{_node:02x}{os.getpid() & 0xFFFFFF:06x}"
+    _seq = itertools.count(random.getrandbits(24))
+
+
+_reset()
+os.register_at_fork(after_in_child=_reset)
+
+
+def configure(node_id: int) -> None:
+    global _node
+    _node = int(node_id) & 0xFF
+    _reset()
+
+
+def new_id() -> str:
+    """25 lowercase hex characters, ordered by creation time to the millisecond."""
+    ms = time.time_ns() // 1_000_000 - EPOCH_MS
+    return f"{ms:011x}{_prefix}{next(_seq) & _SEQ_MASK:06x}"
+
+
+def created_at(value: str) -> float:
+    """Epoch seconds encoded in an ID from new_id(), ignoring any leading type prefix."""
+    return (int(value[-LENGTH:][:11], 16) + EPOCH_MS) / 1000.0
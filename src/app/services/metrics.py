@@ -0,0 +1,208 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Tuple
+
+# In-process metrics with Prometheus text exposition at /metrics.
+#
+# Recording never takes a lock: each thread writes into its own shard (plain dicts, only ever
+# touched by that thread), and a scrape sums the shards. Shards of threads that have exited
+# are folded into a retired total on the next scrape, so thread-per-request servers do not
+# accumulate them. Values are per process; with several workers, scrape each one.
+#
+# Series are keyed by (name, sorted label pairs). Histograms use fixed buckets in seconds.
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help)
+_meta: Dict[str, Tuple[str, str]] = {}
+
+HTTP_DURATION = "doctopal_http_request_duration_seconds"
+HTTP_REQUESTS = "doctopal_http_requests_total"
+STORAGE_DURATION = "doctopal_storage_op_duration_seconds"
+STORAGE_ROWS = "doctopal_storage_rows_scanned_total"
+STORAGE_BYTES = "doctopal_storage_bytes_read_total"
+
+_lock = threading.Lock()  # shard registry and scrapes only
+_local = threading.local()
+_shards: List[Tuple[threading.Thread, "_Shard"]] = []
+
+
+class _Shard:
+    def __init__(self):
+        self.counters: Dict[tuple, float] = {}
+        self.histograms: Dict[tuple, list] = {}  # key -> [bucket counts..., +Inf count, sum]
+
+    def merge(self, other: "_Shard") -> None:
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, values in other.histograms.items():
+            mine = self.histograms.get(key)
+            if mine is None:
+                self.histograms[key] = list(values)
+            else:
+                for i, v in enumerate(values):
+                    mine[i] += v
+
+
+_retired = _Shard()
+
+
+def _shard() -> _Shard:
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _lock:
+            _shards.append((threading.current_thread(), shard))
+    return shard
+
+
+def describe(name: str, kind: str, help_text: str) -> None:
+    """Register a metric's type ("counter" or "histogram") and help line."""
+    _meta[name] = (kind, help_text)
+
+
+def _key(name: str, labels: Dict) -> tuple:
+    return name, tuple(sorted(labels.items()) if len(labels) > 1 else labels.items())
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    key = _key(name, labels)
+    counters = _shard().counters
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    key = _key(name, labels)
+    histograms = _shard().histograms
+    h = histograms.get(key)
+    if h is None:
+        h = histograms[key] = [0] * (len(BUCKETS) + 2)
+    h[bisect_left(BUCKETS, seconds)] += 1
+    h[-1] += seconds
+
+
+@contextmanager
+def timer(name: str, **labels):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t, **labels)
+
+
+def timed(op: str):
+    """Decorator: record the call's duration in doctopal_storage_op_duration_seconds{op=...}."""
+    def wrap(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(STORAGE_DURATION, time.perf_counter() - t, op=op)
+        return inner
+    return wrap
+
+
+def scanned(op: str, rows: int, nbytes: int = 0) -> None:
+    """Count rows (and bytes) read by a scan."""
+    inc(STORAGE_ROWS, rows, op=op)
+    if nbytes:
+        inc(STORAGE_BYTES, nbytes, op=op)
+
+
+def snapshot() -> _Shard:
+    """Sum of all shards. Live shards may be mid-update; a scrape is off by at most that."""
+    global _shards
+    total = _Shard()
+    with _lock:
+        alive = []
+        for thread, shard in _shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                _retired.merge(shard)
+        _shards = alive
+        total.merge(_retired)
+        for _, shard in alive:
+            # copies, so the owning thread can keep writing while we sum
+            total.merge(_copy(shard))
+    return total
+
+
+def _copy(shard: _Shard) -> _Shard:
+    out = _Shard()
+    out.counters = dict(shard.counters)
+    out.histograms = {k: list(v) for k, v in list(shard.histograms.items())}
+    return out
+
+
+def _labels(pairs) -> str:
+    parts = [f'{k}="{_escape(str(v))}"' for k, v in pairs]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    snap = snapshot()
+    by_name: Dict[str, List[str]] = {}
+    for (name, pairs), value in sorted(snap.counters.items()):
+        by_name.setdefault(name, []).append(f"{name}{_labels(pairs)} {_num(value)}")
+    for (name, pairs), h in sorted(snap.histograms.items()):
+        lines = by_name.setdefault(name, [])
+        cumulative = 0
+        for i, count in enumerate(h[:-1]):
+            cumulative += count
+            le = repr(BUCKETS[i]) if i < len(BUCKETS) else "+Inf"
+            lines.append(f"{name}_bucket{_labels(pairs + (('le', le),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(pairs)} {_num(h[-1])}")
+        lines.append(f"{name}_count{_labels(pairs)} {cumulative}")
+    out = []
+    for name in sorted(by_name):
+        kind, help_text = _meta.get(name, ("untyped", ""))
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(by_name[name])
+    return "\n".join(out) + "\n"
+
+
+describe(HTTP_DURATION, "histogram", "Request latency by endpoint and method.")
+describe(HTTP_REQUESTS, "counter", "Requests by endpoint, method and status.")
+describe(STORAGE_DURATION, "histogram", "Duration of storage and rendering operations.")
+describe(STORAGE_ROWS, "counter", "Rows read by file scans and index rebuilds.")
+describe(STORAGE_BYTES, "counter", "Bytes read by file scans and index rebuilds.")
+
+
+def init_app(app) -> None:
+    """Time every request and serve /metrics (disable with METRICS_ENABLED=False)."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_t0 = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        t0 = g.pop("_metrics_t0", None)
+        if t0 is not None:
+            # unmatched URLs share one label so scanners cannot blow up the series count
+            endpoint = request.endpoint or "unmatched"
+            observe(HTTP_DURATION, time.perf_counter() - t0, endpoint=endpoint, method=request.method)
+            inc(HTTP_REQUESTS, endpoint=endpoint, method=request.method, status=str(response.status_code))
+        return response
+
+    def metrics_view():
+        return Response(render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,264 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from .. import metrics
+from .base import EMAIL, SMS, Message, Provider
+from .file_provider import FileProvider
+
+# Outbound SMS and email, delivered off the request path.
+#
+# Routes call send_sms()/send_email(), which put a message on a bounded in-process queue and
+# return at once; if the queue is full the message is dropped and counted instead of making
+# the request wait. A pool of worker threads drains the queue: each takes what is waiting (up
+# to batch_size, lingering batch_wait seconds for more), groups it by channel and hands each
+# group to that channel's provider in one call. Failed messages go on a delay heap and are
+# retried with exponential backoff and jitter, so a slow or failing provider holds up neither
+# routes nor other messages; after max_attempts they are appended to the dead-letter file
+# (JSON lines), from which replay_dead_letters() re-queues them.
+#
+# The queue lives in process memory: messages still queued when a process exits are lost.
+# Both channels default to FileProvider, writing to the outbox file (NOTIFY_OUTBOX); stdout
+# only when that is set to "-", since message bodies carry OTP codes and verification links.
+# Recipients are never logged.
+
+_DB_MANAGER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "db_manager")
+DEFAULT_DEAD_LETTER_PATH = os.path.join(_DB_MANAGER_DIR, "notifications.deadletter.jsonl")
+DEFAULT_OUTBOX_PATH = os.path.join(_DB_MANAGER_DIR, "notifications.outbox.jsonl")
+
+NOTIFICATIONS = "doctopal_notifications_total"
+
+log = logging.getLogger(__name__)
+
+_settings = {
+    "workers": int(os.environ.get("DOCTOPAL_NOTIFY_WORKERS", "2")),
+    "queue_size": int(os.environ.get("DOCTOPAL_NOTIFY_QUEUE_SIZE", "10000")),
+    "batch_size": int(os.environ.get("DOCTOPAL_NOTIFY_BATCH_SIZE", "50")),
+    "batch_wait": float(os.environ.get("DOCTOPAL_NOTIFY_BATCH_WAIT", "0.05")),
+    "max_attempts": int(os.environ.get("DOCTOPAL_NOTIFY_MAX_ATTEMPTS", "5")),
+    "retry_delay": float(os.environ.get("DOCTOPAL_NOTIFY_RETRY_DELAY", "1.0")),
+    "max_retry_delay": 300.0,
+    "dead_letter_path": os.environ.get("DOCTOPAL_NOTIFY_DEAD_LETTER", DEFAULT_DEAD_LETTER_PATH),
+}
+_default_provider = FileProvider(os.environ.get("DOCTOPAL_NOTIFY_OUTBOX") or DEFAULT_OUTBOX_PATH)
+_providers: Dict[str, Provider] = {SMS: _default_provider, EMAIL: _default_provider}
+
+_lock = threading.Lock()
+_queue: "queue.Queue[Message]" = queue.Queue()
+_delayed: List[tuple] = []  # heap of (due, seq, message), guarded by _delayed_cond
+_delayed_cond = threading.Condition()
+_seq = itertools.count()
+_dead_lock = threading.Lock()
+# messages accepted but not yet sent or dead-lettered; drain() waits for this to reach 0
+_idle = threading.Condition()
+_outstanding = 0
+_started_pid = None
+
+metrics.describe(NOTIFICATIONS, "counter", "Notifications by channel and outcome (queued, sent, retried, dead, dropped).")
+
+
+def configure(workers: Optional[int] = None, queue_size: Optional[int] = None,
+              batch_size: Optional[int] = None, batch_wait: Optional[float] = None,
+              max_attempts: Optional[int] = None, retry_delay: Optional[float] = None,
+              dead_letter_path: Optional[str] = None, outbox: Optional[str] = None,
+              providers: Optional[Dict[str, Provider]] = None) -> None:
+    """
+    Set pool sizes, batching and retry policy (effective when the workers start in this
+    process) and the providers. `outbox` points the default FileProvider at a file ("-" is
+    stdout, for tests); `providers` maps channels to Provider instances.
+    """
+    global _default_provider
+    updates = {"workers": workers, "queue_size": queue_size, "batch_size": batch_size,
+               "batch_wait": batch_wait, "max_attempts": max_attempts, "retry_delay": retry_delay,
+               "dead_letter_path": dead_letter_path}
+    _settings.update({k: v for k, v in updates.items() if v is not None})
+    if outbox:
+        old, _default_provider = _default_provider, FileProvider(outbox)
+        for channel, provider in _providers.items():
+            if provider is old:
+                _providers[channel] = _default_provider
+    if providers:
+        _providers.update(providers)
+
+
+def _ensure_workers() -> None:
+    """Start the workers and the retry timer once per process (threads do not survive fork)."""
+    global _started_pid, _queue, _outstanding
+    if _started_pid == os.getpid():
+        return
+    with _lock:
+        if _started_pid == os.getpid():
+            return
+        _queue = queue.Queue(_settings["queue_size"])
+        del _delayed[:]
+        _outstanding = 0
+        for i in range(_settings["workers"]):
+            threading.Thread(target=_worker, name=f"notify-{i}", daemon=True).start()
+        threading.Thread(target=_retrier, name="notify-retry", daemon=True).start()
+        _started_pid = os.getpid()
+
+
+def start() -> None:
+    _ensure_workers()
+
+
+def _settle(n: int = 1) -> None:
+    global _outstanding
+    with _idle:
+        _outstanding -= n
+        if _outstanding <= 0:
+            _idle.notify_all()
+
+
+def enqueue(channel: str, to: str, body: str, subject: str = "") -> Optional[str]:
+    """Queue a message; returns its id, or None if the queue was full and it was dropped. Never blocks."""
+    global _outstanding
+    if channel not in _providers:
+        raise ValueError(f"No provider for channel {channel!r}")
+    _ensure_workers()
+    message = Message(uuid.uuid4().hex, channel, to, subject, body, time.time())
+    with _idle:
+        _outstanding += 1
+    try:
+        _queue.put_nowait(message)
+    except queue.Full:
+        _settle()
+        metrics.inc(NOTIFICATIONS, channel=channel, outcome="dropped")
+        log.warning("Notification queue full; dropped %s message %s", channel, message.id)
+        return None
+    metrics.inc(NOTIFICATIONS, channel=channel, outcome="queued")
+    return message.id
+
+
+def send_sms(mobile: str, body: str) -> Optional[str]:
+    return enqueue(SMS, mobile, body)
+
+
+def send_email(address: str, subject: str, body: str) -> Optional[str]:
+    return enqueue(EMAIL, address, body, subject)
+
+
+def _next_batch() -> List[Message]:
+    batch = [_queue.get()]
+    deadline = time.monotonic() + _settings["batch_wait"]
+    while len(batch) < _settings["batch_size"]:
+        remaining = deadline - time.monotonic()
+        try:
+            batch.append(_queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _worker() -> None:
+    while True:
+        by_channel: Dict[str, List[Message]] = {}
+        for message in _next_batch():
+            by_channel.setdefault(message.channel, []).append(message)
+        for channel, messages in by_channel.items():
+            _deliver(channel, messages)
+
+
+def _deliver(channel: str, messages: List[Message]) -> None:
+    provider = _providers[channel]
+    try:
+        failed = list(provider.send_batch(messages))
+    except Exception:
+        log.exception("%s provider %r failed a batch of %d", channel, provider.name, len(messages))
+        failed = list(messages)
+    sent = len(messages) - len(failed)
+    if sent:
+        metrics.inc(NOTIFICATIONS, sent, channel=channel, outcome="sent")
+        _settle(sent)
+    for message in failed:
+        _retry_or_bury(message)
+
+
+def _retry_or_bury(message: Message) -> None:
+    if message.attempt >= _settings["max_attempts"]:
+        _bury(message, "max_attempts")
+        return
+    delay = min(_settings["max_retry_delay"], _settings["retry_delay"] * 2 ** (message.attempt - 1))
+    # jitter, so messages failed by one outage do not all come back at the same instant
+    delay *= random.uniform(0.5, 1.0)
+    with _delayed_cond:
+        heapq.heappush(_delayed, (time.monotonic() + delay, next(_seq), message._replace(attempt=message.attempt + 1)))
+        _delayed_cond.notify()
+    metrics.inc(NOTIFICATIONS, channel=message.channel, outcome="retried")
+
+
+def _retrier() -> None:
+    """Move retries back onto the queue when they are due."""
+    while True:
+        with _delayed_cond:
+            while not _delayed or _delayed[0][0] > time.monotonic():
+                _delayed_cond.wait(_delayed[0][0] - time.monotonic() if _delayed else None)
+            _, _, message = heapq.heappop(_delayed)
+        try:
+            _queue.put_nowait(message)
+        except queue.Full:
+            _bury(message, "queue_full")
+
+
+def _bury(message: Message, reason: str) -> None:
+    _dead_letter(message, reason)
+    _settle()
+
+
+def _dead_letter(message: Message, reason: str) -> None:
+    record = {**message._asdict(), "reason": reason, "dead_at": time.time()}
+    path = _settings["dead_letter_path"]
+    try:
+        with _dead_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # bodies hold OTP codes and verification links: owner-only, like the outbox
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            with open(fd, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, sort_keys=True) + "\n")
+    except OSError:
+        log.exception("Could not dead-letter %s message %s", message.channel, message.id)
+    metrics.inc(NOTIFICATIONS, channel=message.channel, outcome="dead")
+
+
+def replay_dead_letters() -> int:
+    """Re-queue every dead-lettered message with a fresh attempt count; returns how many."""
+    path = _settings["dead_letter_path"]
+    replaying = path + ".replaying"
+    with _dead_lock:
+        try:
+            os.replace(path, replaying)
+        except FileNotFoundError:
+            return 0
+    queued = 0
+    with open(replaying, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if enqueue(record["channel"], record["to"], record["body"], record.get("subject", "")):
+                queued += 1
+            else:
+                # enqueue() already settled it; just put it back
+                _dead_letter(Message(**{k: record[k] for k in Message._fields}), "queue_full")
+    os.remove(replaying)
+    return queued
+
+
+def drain(timeout: Optional[float] = None) -> bool:
+    """Wait until every accepted message is sent or dead-lettered; False on timeout."""
+    with _idle:
+        return _idle.wait_for(lambda: _outstanding <= 0, timeout)
+
+
+def stats() -> Dict:
+    with _delayed_cond:
+        delayed = len(_delayed)
+    return {"queued": _queue.qsize(), "delayed": delayed, "outstanding": _outstanding}
@@ -0,0 +1,30 @@
+from typing import List, NamedTuple, Sequence
+
+SMS = "sms"
+EMAIL = "email"
+
+
+class Message(NamedTuple):
+    id: str
+    channel: str  # SMS or EMAIL; picks the provider
+    to: str
+    subject: str
+    body: str
+    created_at: float
+    attempt: int = 1
+
+
+class Provider:
+    """
+    Delivers notifications for one or more channels. Called from the dispatcher's worker
+    threads, never from a request, with up to batch_size messages of a single channel.
+    """
+
+    name = "base"
+
+    def send_batch(self, messages: Sequence[Message]) -> List[Message]:
+        """
+        Deliver `messages`; return the ones that failed and may be retried. Raising counts
+        the whole batch as failed.
+        """
+        raise NotImplementedError
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import secrets
+import threading
+import time
+from typing import Tuple
+
+from .base import EXPIRED, LOCKED, MISMATCH, VERIFIED, OtpStore
+
+# One-time codes for booking verification, kept server-side instead of in the session cookie.
+#
+# Backend selection: "memory" (default, per process) or "sqlite" (a file shared by all workers,
+# so rate limits and attempt counters hold across processes). create_app() calls configure()
+# from app config; plain imports fall back to env.
+#
+# Rate limits are token buckets: per client IP for sending and for verifying (checked first,
+# before the form is even parsed) and per mobile for sending, so one number cannot be flooded
+# with SMS from many addresses. Each code allows max_attempts wrong guesses, then it is locked.
+
+DEFAULT_SQLITE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "db_manager", "otp.sqlite3")
+
+CODE_DIGITS = 6
+
+
+class OtpRateLimited(Exception):
+    """A bucket is empty; retry_after is in seconds (for the Retry-After header)."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+_lock = threading.Lock()
+_store = None
+_settings = {
+    "backend": os.environ.get("DOCTOPAL_OTP_BACKEND", "memory"),
+    "sqlite_path": os.environ.get("DOCTOPAL_OTP_SQLITE_PATH", DEFAULT_SQLITE_PATH),
+    "ttl": float(os.environ.get("DOCTOPAL_OTP_TTL", "300")),
+    "max_attempts": int(os.environ.get("DOCTOPAL_OTP_MAX_ATTEMPTS", "5")),
+    # (capacity, seconds per refilled token)
+    "mobile_send": (3, 60.0),
+    "ip_send": (10, 6.0),
+    "ip_verify": (20, 3.0),
+}
+
+
+def _build(name: str, sqlite_path: str) -> OtpStore:
+    if name == "memory":
+        from .memory import MemoryOtpStore
+        return MemoryOtpStore()
+    if name == "sqlite":
+        from .sqlite_store import SqliteOtpStore
+        return SqliteOtpStore(sqlite_path)
+    raise ValueError(f"Unknown OTP backend: {name!r}")
+
+
+def configure(backend: str = None, sqlite_path: str = None, ttl: float = None,
+              max_attempts: int = None) -> None:
+    """Select the store and limits; the store is rebuilt on the next get_store() call."""
+    global _store
+    with _lock:
+        if backend:
+            _settings["backend"] = backend
+        if sqlite_path:
+            _settings["sqlite_path"] = sqlite_path
+        if ttl:
+            _settings["ttl"] = float(ttl)
+        if max_attempts:
+            _settings["max_attempts"] = int(max_attempts)
+        _store = None
+
+
+def get_store() -> OtpStore:
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = _build(_settings["backend"], _settings["sqlite_path"])
+    return _store
+
+
+def ttl() -> float:
+    """Seconds a fresh code stays valid."""
+    return _settings["ttl"]
+
+
+def _take(bucket: str, key: str) -> None:
+    capacity, per_token = _settings[bucket]
+    retry_after = get_store().take_token(f"{bucket}:{key}", capacity, 1.0 / per_token, time.time())
+    if retry_after > 0:
+        raise OtpRateLimited(retry_after)
+
+
+def check_ip(ip: str, action: str) -> None:
+    """Take a token from the client's "send" or "verify" bucket; raises OtpRateLimited."""
+    _take(f"ip_{action}", ip or "-")
+
+
+def _hash(mobile: str, code: str) -> str:
+    return hashlib.sha256(f"{mobile}:{code}".encode()).hexdigest()
+
+
+def send_code(mobile: str) -> str:
+    """Issue a fresh code for `mobile` (replacing any live one); raises OtpRateLimited."""
+    _take("mobile_send", mobile)
+    code = str(secrets.randbelow(10 ** CODE_DIGITS)).zfill(CODE_DIGITS)
+    now = time.time()
+    get_store().put_code(mobile, _hash(mobile, code), now + _settings["ttl"], now)
+    return code
+
+
+def verify_code(mobile: str, code: str) -> Tuple[str, int]:
+    """(outcome, attempts left); outcome is one of VERIFIED, MISMATCH, EXPIRED, LOCKED."""
+    return get_store().check_code(mobile, _hash(mobile, code), _settings["max_attempts"], time.time())
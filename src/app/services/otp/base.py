@@ -0,0 +1,35 @@
+from typing import Tuple
+
+# verify() outcomes
+VERIFIED = "verified"
+MISMATCH = "mismatch"
+EXPIRED = "expired"  # also: no code was ever issued for this mobile
+LOCKED = "locked"  # too many wrong attempts; a new code has to be requested
+
+
+class OtpStore:
+    """
+    State behind /send-otp and /verify-otp: one live code per mobile with an expiry and an
+    attempt counter, plus token buckets for rate limiting. Codes are stored hashed. All
+    operations are atomic with respect to other callers sharing the same store.
+    """
+
+    name = "base"
+
+    def take_token(self, key: str, capacity: float, refill_per_sec: float, now: float) -> float:
+        """
+        Take one token from bucket `key` (created full). Returns 0 when allowed, otherwise
+        the seconds until a token is available; a rejected call does not consume anything.
+        """
+        raise NotImplementedError
+
+    def put_code(self, mobile: str, code_hash: str, expires_at: float, now: float) -> None:
+        """Store a fresh code for `mobile`, replacing any previous one and its attempt count."""
+        raise NotImplementedError
+
+    def check_code(self, mobile: str, code_hash: str, max_attempts: int, now: float) -> Tuple[str, int]:
+        """
+        Compare against the live code. Returns (outcome, attempts left). A match consumes
+        the code; a mismatch counts an attempt and locks the code after max_attempts.
+        """
+        raise NotImplementedError
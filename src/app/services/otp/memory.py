@@ -0,0 +1,69 @@
+import heapq
+import hmac
+import threading
+from typing import Dict, List, Tuple
+
+from .base import EXPIRED, LOCKED, MISMATCH, VERIFIED, OtpStore
+
+# Per-process store. Codes and buckets sit in dicts; every entry also gets a heap slot at its
+# expiry time (for a bucket: when it would be full again, i.e. indistinguishable from a new
+# one). Each call first pops whatever has expired off the heap top, so expiry costs
+# O(log n) per entry and the dicts never hold dead state for long. Heap slots carry the
+# entry's generation; a slot left behind by a replaced entry is skipped when it surfaces.
+
+
+class MemoryOtpStore(OtpStore):
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes: Dict[str, list] = {}  # mobile -> [code_hash, expires_at, attempts, generation]
+        self._buckets: Dict[str, list] = {}  # key -> [tokens, updated_at, generation]
+        self._heap: List[Tuple[float, int, str, str]] = []  # (expires_at, generation, kind, key)
+        self._generation = 0
+
+    def _schedule(self, expires_at: float, kind: str, key: str) -> int:
+        self._generation += 1
+        heapq.heappush(self._heap, (expires_at, self._generation, kind, key))
+        return self._generation
+
+    def _expire(self, now: float) -> None:
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, generation, kind, key = heapq.heappop(heap)
+            table = self._codes if kind == "code" else self._buckets
+            entry = table.get(key)
+            if entry is not None and entry[-1] == generation:
+                del table[key]
+
+    def take_token(self, key: str, capacity: float, refill_per_sec: float, now: float) -> float:
+        with self._lock:
+            self._expire(now)
+            entry = self._buckets.get(key)
+            tokens = capacity if entry is None else min(capacity, entry[0] + (now - entry[1]) * refill_per_sec)
+            if tokens < 1:
+                return (1 - tokens) / refill_per_sec
+            tokens -= 1
+            full_at = now + (capacity - tokens) / refill_per_sec
+            self._buckets[key] = [tokens, now, self._schedule(full_at, "bucket", key)]
+            return 0.0
+
+    def put_code(self, mobile: str, code_hash: str, expires_at: float, now: float) -> None:
+        with self._lock:
+            self._expire(now)
+            self._codes[mobile] = [code_hash, expires_at, 0, self._schedule(expires_at, "code", mobile)]
+
+    def check_code(self, mobile: str, code_hash: str, max_attempts: int, now: float) -> Tuple[str, int]:
+        with self._lock:
+            self._expire(now)
+            entry = self._codes.get(mobile)
+            if entry is None:
+                return EXPIRED, 0
+            if entry[2] >= max_attempts:
+                return LOCKED, 0
+            if hmac.compare_digest(entry[0], code_hash):
+                del self._codes[mobile]
+                return VERIFIED, 0
+            entry[2] += 1
+            left = max_attempts - entry[2]
+            return (LOCKED if left == 0 else MISMATCH), left
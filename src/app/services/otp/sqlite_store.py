@@ -0,0 +1,106 @@
+import hmac
+import os
+import sqlite3
+import threading
+from typing import Tuple
+
+from .base import EXPIRED, LOCKED, MISMATCH, VERIFIED, OtpStore
+
+# Shared store for several workers (or hosts on one filesystem): a small SQLite file in WAL
+# mode standing in for a network key-value store. Every operation is one BEGIN IMMEDIATE
+# transaction, so workers see the same buckets and attempt counters. Expired rows are
+# swept in the same transaction every SWEEP_EVERY writes, using the expires_at indexes.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS otp_codes (
+    mobile TEXT PRIMARY KEY, code_hash TEXT NOT NULL, expires_at REAL NOT NULL, attempts INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS otp_buckets (
+    key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_otp_codes_expires ON otp_codes(expires_at);
+CREATE INDEX IF NOT EXISTS ix_otp_buckets_expires ON otp_buckets(expires_at);
+"""
+
+SWEEP_EVERY = 256
+
+
+class SqliteOtpStore(OtpStore):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # never reuse a connection inherited across fork()
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self, fn, now: float):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            self._writes += 1
+            if self._writes % SWEEP_EVERY == 0:
+                conn.execute("DELETE FROM otp_codes WHERE expires_at <= ?", (now,))
+                conn.execute("DELETE FROM otp_buckets WHERE expires_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def take_token(self, key: str, capacity: float, refill_per_sec: float, now: float) -> float:
+        def take(conn):
+            row = conn.execute("SELECT tokens, updated_at FROM otp_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * refill_per_sec)
+            if tokens < 1:
+                return (1 - tokens) / refill_per_sec
+            tokens -= 1
+            full_at = now + (capacity - tokens) / refill_per_sec
+            conn.execute(
+                "INSERT OR REPLACE INTO otp_buckets (key, tokens, updated_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, full_at),
+            )
+            return 0.0
+        return self._transaction(take, now)
+
+    def put_code(self, mobile: str, code_hash: str, expires_at: float, now: float) -> None:
+        self._transaction(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO otp_codes (mobile, code_hash, expires_at, attempts) VALUES (?, ?, ?, 0)",
+            (mobile, code_hash, expires_at),
+        ), now)
+
+    def check_code(self, mobile: str, code_hash: str, max_attempts: int, now: float) -> Tuple[str, int]:
+        def check(conn):
+            row = conn.execute(
+                "SELECT code_hash, expires_at, attempts FROM otp_codes WHERE mobile = ?", (mobile,)).fetchone()
+            if row is None or row[1] <= now:
+                return EXPIRED, 0
+            if row[2] >= max_attempts:
+                return LOCKED, 0
+            if hmac.compare_digest(row[0], code_hash):
+                conn.execute("DELETE FROM otp_codes WHERE mobile = ?", (mobile,))
+                return VERIFIED, 0
+            conn.execute("UPDATE otp_codes SET attempts = attempts + 1 WHERE mobile = ?", (mobile,))
+            left = max_attempts - row[2] - 1
+            return (LOCKED if left == 0 else MISMATCH), left
+        return self._transaction(check, now)
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional
+
+# Rendered-page cache: one entry per key (e.g. ("clinic_booking", qr)), tagged with the
+# version it was rendered from. A lookup with a different version is a miss and the next put
+# replaces the entry, so a rewritten record is never served from its old rendering.
+# Bounded by total body bytes; least recently used entries go first.
+
+DEFAULT_MAX_BYTES = int(os.environ.get("DOCTOPAL_PAGE_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+
+class Entry(NamedTuple):
+    version: str
+    body: bytes
+    rendered_at: float  # epoch seconds; used as Last-Modified
+
+
+_lock = threading.Lock()
+_entries: "OrderedDict[Hashable, Entry]" = OrderedDict()
+_size = 0
+_settings = {"max_bytes": DEFAULT_MAX_BYTES}
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def configure(max_bytes: Optional[int] = None) -> None:
+    """Set the byte budget (0 disables caching); shrinking evicts immediately."""
+    with _lock:
+        if max_bytes is not None:
+            _settings["max_bytes"] = int(max_bytes)
+        _evict()
+
+
+def _evict() -> None:
+    global _size
+    while _entries and _size > _settings["max_bytes"]:
+        _, old = _entries.popitem(last=False)
+        _size -= len(old.body)
+        _stats["evictions"] += 1
+
+
+def get(key: Hashable, version: str) -> Optional[Entry]:
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or entry.version != version:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return entry
+
+
+def put(key: Hashable, version: str, body: bytes) -> Entry:
+    """Store a rendering (replacing any other version of `key`) and return its entry."""
+    global _size
+    entry = Entry(version, body, time.time())
+    with _lock:
+        if len(body) > _settings["max_bytes"]:
+            return entry
+        old = _entries.pop(key, None)
+        if old is not None:
+            _size -= len(old.body)
+        _entries[key] = entry
+        _size += len(body)
+        _evict()
+    return entry
+
+
+def invalidate(key: Hashable) -> None:
+    global _size
+    with _lock:
+        old = _entries.pop(key, None)
+        if old is not None:
+            _size -= len(old.body)
+
+
+def clear() -> None:
+    global _size
+    with _lock:
+        _entries.clear()
+        _size = 0
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "entries": len(_entries), "bytes": _size, "max_bytes": _settings["max_bytes"]}
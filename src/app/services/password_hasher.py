@@ -0,0 +1,244 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Password hashing with admission control.
+#
+# Hashes use stdlib KDFs: scrypt (default, memory-hard) or PBKDF2-HMAC-SHA256. Both release
+# the GIL inside OpenSSL, so request threads hash in parallel without stalling the Flask
+# worker's other threads. The calling thread does the work itself (there is no pool to hand
+# off to and wait on); at most `workers` hashes run at once, up to max_queue more wait for a
+# turn, and beyond that hash_password/verify_password raise HasherBusy instead of queueing
+# without bound.
+#
+# Cost parameters are calibrated to roughly target_ms per hash, but never below a security
+# floor (scrypt_min_n / pbkdf2_min_iterations), however slow or loaded the host. Calibration
+# runs in warmup() or lazily on first use. Stored formats carry their own parameters, so old
+# hashes keep verifying after recalibration:
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+#   <64 hex chars>  (legacy unsalted SHA-256, verify-only; rehashed on login)
+
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_MAX_N = 2 ** 17  # 128 MiB per hash with r=8
+SCRYPT_MAXMEM = 2 ** 28
+SALT_BYTES = 16
+DKLEN = 32
+
+
+class HasherBusy(Exception):
+    """Too many hashes in flight; the caller should shed the request (e.g. HTTP 503)."""
+
+
+_settings = {
+    "algorithm": os.environ.get("DOCTOPAL_KDF", "scrypt"),
+    "target_ms": float(os.environ.get("DOCTOPAL_KDF_TARGET_MS", "100")),
+    "workers": int(os.environ.get("DOCTOPAL_KDF_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    "max_queue": int(os.environ.get("DOCTOPAL_KDF_MAX_QUEUE", "32")),
+    # security floor, independent of how fast the host is
+    "scrypt_min_n": int(os.environ.get("DOCTOPAL_KDF_SCRYPT_MIN_N", str(2 ** 14))),
+    "pbkdf2_min_iterations": int(os.environ.get("DOCTOPAL_KDF_PBKDF2_MIN_ITERATIONS", "600000")),
+    # filled in by calibrate()
+    "scrypt_n": None,
+    "pbkdf2_iterations": None,
+}
+
+_lock = threading.Lock()
+_running: Optional[threading.BoundedSemaphore] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_pool_pid = None
+# hash of a random password at the calibrated cost, verified when an account does not exist
+_dummy_hash: Optional[str] = None
+
+
+def _b64(b: bytes) -> str:
+    return base64.b64encode(b).decode("ascii")
+
+
+def _unb64(s: str) -> bytes:
+    return base64.b64decode(s.encode("ascii"))
+
+
+def _random_password() -> str:
+    return _b64(os.urandom(12))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=SCRYPT_MAXMEM, dklen=DKLEN)
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=DKLEN)
+
+
+def configure(algorithm: Optional[str] = None, target_ms: Optional[float] = None,
+              workers: Optional[int] = None, max_queue: Optional[int] = None) -> None:
+    """Change settings; pool sizes apply to pools created afterwards, cost to the next calibrate()."""
+    if algorithm is not None and algorithm not in ("scrypt", "pbkdf2_sha256"):
+        raise ValueError("algorithm must be 'scrypt' or 'pbkdf2_sha256'")
+    updates = {"algorithm": algorithm, "target_ms": target_ms, "workers": workers, "max_queue": max_queue}
+    _settings.update({k: v for k, v in updates.items() if v is not None})
+
+
+def calibrate(target_ms: Optional[float] = None) -> Dict:
+    """Pick the cost that takes about target_ms on this machine; returns the chosen parameters."""
+    global _dummy_hash
+    target = (target_ms or _settings["target_ms"]) / 1000.0
+    salt = os.urandom(SALT_BYTES)
+    if _settings["algorithm"] == "scrypt":
+        # smallest power of two that reaches the target, starting at the floor
+        n = _settings["scrypt_min_n"]
+        while n < SCRYPT_MAX_N:
+            t0 = time.perf_counter()
+            _scrypt("calibration", salt, n, SCRYPT_R, SCRYPT_P)
+            if time.perf_counter() - t0 >= target:
+                break
+            n *= 2
+        _settings["scrypt_n"] = n
+        _dummy_hash = _hash_sync(_random_password())
+        return {"algorithm": "scrypt", "n": _settings["scrypt_n"], "r": SCRYPT_R, "p": SCRYPT_P}
+    probe = 20_000
+    t0 = time.perf_counter()
+    _pbkdf2("calibration", salt, probe)
+    per_iter = (time.perf_counter() - t0) / probe
+    _settings["pbkdf2_iterations"] = max(_settings["pbkdf2_min_iterations"], int(target / per_iter))
+    _dummy_hash = _hash_sync(_random_password())
+    return {"algorithm": "pbkdf2_sha256", "iterations": _settings["pbkdf2_iterations"]}
+
+
+def _ensure_calibrated() -> None:
+    key = "scrypt_n" if _settings["algorithm"] == "scrypt" else "pbkdf2_iterations"
+    if _settings[key] is None:
+        with _lock:
+            if _settings[key] is None:
+                calibrate()
+
+
+def _pool():
+    """Per-process semaphores: a copy inherited across fork() could be held by a dead thread."""
+    global _running, _slots, _pool_pid
+    if _pool_pid != os.getpid():
+        with _lock:
+            if _pool_pid != os.getpid():
+                _running = threading.BoundedSemaphore(_settings["workers"])
+                _slots = threading.BoundedSemaphore(_settings["workers"] + _settings["max_queue"])
+                _pool_pid = os.getpid()
+    return _running, _slots
+
+
+def _run(fn, *args):
+    running, slots = _pool()
+    if not slots.acquire(blocking=False):
+        raise HasherBusy("password hashing queue is full")
+    try:
+        with running:
+            return fn(*args)
+    finally:
+        slots.release()
+
+
+def _hash_sync(password: str) -> str:
+    salt = os.urandom(SALT_BYTES)
+    if _settings["algorithm"] == "scrypt":
+        n = _settings["scrypt_n"]
+        digest = _scrypt(password, salt, n, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+    iterations = _settings["pbkdf2_iterations"]
+    digest = _pbkdf2(password, salt, iterations)
+    return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def _is_legacy(stored: str) -> bool:
+    return len(stored) == 64 and all(c in "0123456789abcdef" for c in stored)
+
+
+def _verify_sync(password: str, stored: str) -> bool:
+    if _is_legacy(stored):
+        candidate = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(candidate, stored)
+    parts = stored.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            candidate = _scrypt(password, _unb64(parts[4]), n, r, p)
+            return hmac.compare_digest(candidate, _unb64(parts[5]))
+        if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            candidate = _pbkdf2(password, _unb64(parts[2]), int(parts[1]))
+            return hmac.compare_digest(candidate, _unb64(parts[3]))
+    except (ValueError, TypeError):
+        return False
+    return False
+
+
+def hash_password(password: str) -> str:
+    _ensure_calibrated()
+    return _run(_hash_sync, password)
+
+
+def verify_password(password: str, stored: str) -> bool:
+    if not stored:
+        return False
+    return _run(_verify_sync, password, stored)
+
+
+def dummy_verify(password: str) -> None:
+    """
+    Verify against a throwaway hash at the current cost, so a login for an unknown account
+    takes as long as one for a real account and timing does not reveal which emails exist.
+    """
+    _ensure_calibrated()
+    verify_password(password, _dummy_hash)
+
+
+def needs_rehash(stored: str) -> bool:
+    """
+    True for legacy SHA-256 hashes, another algorithm, a cost below the security floor, or a
+    cost well below (under half of) the current calibration; the margin keeps workers whose
+    calibrations differ by one step from rehashing the same account back and forth.
+    """
+    if not stored or _is_legacy(stored):
+        return True
+    _ensure_calibrated()
+    parts = stored.split("$")
+    try:
+        if _settings["algorithm"] == "scrypt":
+            n = int(parts[1])
+            return parts[0] != "scrypt" or n < _settings["scrypt_min_n"] or n * 2 < _settings["scrypt_n"]
+        iterations = int(parts[1])
+        return (parts[0] != "pbkdf2_sha256" or iterations < _settings["pbkdf2_min_iterations"]
+                or iterations * 2 < _settings["pbkdf2_iterations"])
+    except (IndexError, ValueError):
+        return True
+
+
+def benchmark(seconds: float = 1.0) -> List[Dict]:
+    """Single-thread hashes/sec for each cost setting, i.e. the throughput of one core."""
+    results = []
+    salt = os.urandom(SALT_BYTES)
+    settings = [("scrypt", n) for n in (2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16)]
+    settings += [("pbkdf2_sha256", it) for it in (100_000, 200_000, 400_000, 600_000)]
+    for algorithm, cost in settings:
+        count = 0
+        t0 = time.perf_counter()
+        while True:
+            if algorithm == "scrypt":
+                _scrypt("benchmark", salt, cost, SCRYPT_R, SCRYPT_P)
+            else:
+                _pbkdf2("benchmark", salt, cost)
+            count += 1
+            elapsed = time.perf_counter() - t0
+            if elapsed >= seconds:
+                break
+        results.append({
+            "algorithm": algorithm,
+            "cost": cost,
+            "hashes_per_sec_per_core": round(count / elapsed, 2),
+            "ms_per_hash": round(1000 * elapsed / count, 2),
+        })
+    return results
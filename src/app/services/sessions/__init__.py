@@ -0,0 +1,164 @@
+import os
+import re
+import secrets
+import threading
+import time
+from typing import Optional
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from .base import SessionStore
+
+# Server-side sessions: the cookie carries only a random session ID, and the session dict
+# lives in a store. Flask's default cookie session re-sends (and re-verifies the signature
+# of) everything stored in it on every request; here the cookie is ~50 bytes whatever the
+# session holds. Values are serialized the way Flask's cookie sessions serialize them.
+#
+# Backends: "memory" (per process, LRU-bounded) or "sqlite" (one file shared by all workers
+# on the host); "cookie" keeps Flask's signed cookie session. "memory" is the default, which
+# only suits a single process (the dev server); gunicorn.conf.py switches to "sqlite" and
+# refuses to start several workers on "memory". Sessions expire ttl seconds
+# after their last write; an unchanged session is re-saved once less than half the ttl is
+# left, so active users stay signed in without a write on every request.
+
+DEFAULT_SQLITE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "db_manager", "sessions.sqlite3")
+
+_SID_RE = re.compile(r"[A-Za-z0-9_-]{43}")
+
+_lock = threading.Lock()
+_store = None
+_settings = {
+    "backend": os.environ.get("DOCTOPAL_SESSION_BACKEND", "memory"),
+    "sqlite_path": os.environ.get("DOCTOPAL_SESSION_SQLITE_PATH", DEFAULT_SQLITE_PATH),
+    "ttl": float(os.environ.get("DOCTOPAL_SESSION_TTL", str(24 * 3600))),
+    "max_entries": int(os.environ.get("DOCTOPAL_SESSION_MAX_ENTRIES", "100000")),
+    # memory backend: separate cap for sessions without a login (booking OTP flow)
+    "anonymous_max_entries": int(os.environ.get("DOCTOPAL_SESSION_ANONYMOUS_MAX_ENTRIES", "100000")),
+}
+
+# the key a logged-in session carries
+SIGNED_IN_KEY = "doctor_id"
+
+
+def _build(name: str) -> SessionStore:
+    if name == "memory":
+        from .memory import MemorySessionStore
+        return MemorySessionStore(_settings["max_entries"], _settings["anonymous_max_entries"])
+    if name == "sqlite":
+        from .sqlite_store import SqliteSessionStore
+        return SqliteSessionStore(_settings["sqlite_path"])
+    raise ValueError(f"Unknown session backend: {name!r}")
+
+
+def configure(backend: str = None, sqlite_path: str = None, ttl: float = None,
+              max_entries: int = None, anonymous_max_entries: int = None) -> None:
+    """Select the store and expiry; the store is rebuilt on the next get_store() call."""
+    global _store
+    with _lock:
+        if backend:
+            _settings["backend"] = backend
+        if sqlite_path:
+            _settings["sqlite_path"] = sqlite_path
+        if ttl:
+            _settings["ttl"] = float(ttl)
+        if max_entries:
+            _settings["max_entries"] = int(max_entries)
+        if anonymous_max_entries:
+            _settings["anonymous_max_entries"] = int(anonymous_max_entries)
+        _store = None
+
+
+def get_store() -> SessionStore:
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = _build(_settings["backend"])
+    return _store
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid: Optional[str] = None, expires_at: float = 0.0):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid  # None until first saved
+        self.expires_at = expires_at
+        self.modified = False
+        self.accessed = False
+        self.rotate = False
+
+    # reads count as access, for Vary: Cookie (as in Flask's SecureCookieSession)
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def open_session(self, app, request) -> ServerSession:
+        sid = request.cookies.get(self.get_cookie_name(app), "")
+        if _SID_RE.fullmatch(sid):
+            found = get_store().load(sid, time.time())
+            if found is not None:
+                payload, expires_at = found
+                try:
+                    return ServerSession(self.serializer.loads(payload), sid, expires_at)
+                except ValueError:
+                    pass
+        return ServerSession()
+
+    def save_session(self, app, session: ServerSession, response) -> None:
+        name = self.get_cookie_name(app)
+        cookie = dict(domain=self.get_cookie_domain(app), path=self.get_cookie_path(app),
+                      secure=self.get_cookie_secure(app), partitioned=self.get_cookie_partitioned(app),
+                      samesite=self.get_cookie_samesite(app), httponly=self.get_cookie_httponly(app))
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        store = get_store()
+        if session.sid is not None and (session.rotate or not session):
+            store.delete(session.sid)
+        if not session:
+            if session.sid is not None:
+                response.delete_cookie(name, **cookie)
+                response.vary.add("Cookie")
+            return
+
+        now = time.time()
+        ttl = _settings["ttl"]
+        new = session.sid is None or session.rotate
+        if new:
+            session.sid = secrets.token_urlsafe(32)
+        if new or session.modified or session.expires_at - now < ttl / 2:
+            store.save(session.sid, self.serializer.dumps(dict(session)), now + ttl, now,
+                       signed_in=dict.__contains__(session, SIGNED_IN_KEY))
+        if new or (session.permanent and app.config["SESSION_REFRESH_EACH_REQUEST"]):
+            response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session), **cookie)
+            response.vary.add("Cookie")
+
+
+def regenerate(session) -> None:
+    """Issue a new session ID on the next save (call on login, against session fixation)."""
+    if isinstance(session, ServerSession):
+        session.rotate = True
+
+
+def init_app(app) -> None:
+    """Install server-side sessions unless the backend is "cookie"."""
+    if _settings["backend"] != "cookie":
+        app.session_interface = ServerSessionInterface()
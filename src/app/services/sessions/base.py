@@ -0,0 +1,21 @@
+from typing import Optional, Tuple
+
+
+class SessionStore:
+    """
+    Server-side session payloads keyed by the opaque ID in the session cookie. Payloads are
+    serialized strings; an entry past its expires_at is treated as absent.
+    """
+
+    name = "base"
+
+    def load(self, sid: str, now: float) -> Optional[Tuple[str, float]]:
+        """(payload, expires_at) for a live session, else None."""
+        raise NotImplementedError
+
+    def save(self, sid: str, payload: str, expires_at: float, now: float, signed_in: bool = False) -> None:
+        """`signed_in` marks a logged-in session, which bounded stores evict separately."""
+        raise NotImplementedError
+
+    def delete(self, sid: str) -> None:
+        raise NotImplementedError
@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .base import SessionStore
+
+
+class _Lru:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def put(self, sid: str, entry: Tuple[str, float], now: float) -> None:
+        self.entries[sid] = entry
+        self.entries.move_to_end(sid)
+        while self.entries:
+            oldest_sid, (_, oldest_expiry) = next(iter(self.entries.items()))
+            if len(self.entries) <= self.max_entries and oldest_expiry > now:
+                break
+            del self.entries[oldest_sid]
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Per-process LRU with expiry. With several workers a client's requests must reach the
+    same process (or use the sqlite backend). Signed-in and anonymous sessions (every
+    /send-otp makes one) have separate limits, so anonymous traffic cannot evict logged-in
+    doctors. Least recently used sessions are evicted past their limit; expired ones are
+    dropped when touched or when they reach the LRU end.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, anonymous_max_entries: Optional[int] = None):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._signed_in = _Lru(max_entries)
+        self._anonymous = _Lru(max_entries if anonymous_max_entries is None else anonymous_max_entries)
+
+    def load(self, sid: str, now: float) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            for lru in (self._signed_in, self._anonymous):
+                entry = lru.entries.get(sid)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del lru.entries[sid]
+                    return None
+                lru.entries.move_to_end(sid)
+                return entry
+            return None
+
+    def save(self, sid: str, payload: str, expires_at: float, now: float, signed_in: bool = False) -> None:
+        target, other = (self._signed_in, self._anonymous) if signed_in else (self._anonymous, self._signed_in)
+        with self._lock:
+            other.entries.pop(sid, None)
+            target.put(sid, (payload, expires_at), now)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._signed_in.entries.pop(sid, None)
+            self._anonymous.entries.pop(sid, None)
+
+    def __len__(self) -> int:
+        return len(self._signed_in.entries) + len(self._anonymous.entries)
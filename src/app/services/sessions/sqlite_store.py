@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+from .base import SessionStore
+
+# Sessions shared by every worker on the host, in a small SQLite file in WAL mode (same setup
+# as the OTP store). Reads are single autocommit SELECTs; expired rows are swept every
+# SWEEP_EVERY writes using the expires_at index.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    sid TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions(expires_at);
+"""
+
+SWEEP_EVERY = 256
+
+
+class SqliteSessionStore(SessionStore):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # never reuse a connection inherited across fork()
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid: str, now: float) -> Optional[Tuple[str, float]]:
+        row = self._conn().execute(
+            "SELECT payload, expires_at FROM sessions WHERE sid = ? AND expires_at > ?", (sid, now)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save(self, sid: str, payload: str, expires_at: float, now: float, signed_in: bool = False) -> None:
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO sessions (sid, payload, expires_at) VALUES (?, ?, ?)",
+                     (sid, payload, expires_at))
+        self._writes += 1
+        if self._writes % SWEEP_EVERY == 0:
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    def delete(self, sid: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
@@ -0,0 +1,59 @@
+import pytest
+
+from src.app.db_manager import booking_journal, booking_store
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(booking_journal, "JOURNAL_PATH", str(tmp_path / "booking_journal.log"))
+    monkeypatch.setattr(booking_journal, "OFFSET_PATH", str(tmp_path / "booking_journal.log.offset"))
+    monkeypatch.setattr(booking_store, "BOOKING_ROOT", str(tmp_path / "bookings"))
+    monkeypatch.setattr(booking_journal, "_recovering", False)
+    monkeypatch.setitem(booking_journal._settings, "durability", "write")
+    return tmp_path
+
+
+def _booking(i, clinic):
+    return {"patient_id": f"P{i}", "clinic_id": clinic, "doctor_id": "D1",
+            "created_at": "2026-10-16T10:00:00"}
+
+
+def _stored(clinic):
+    from datetime import date
+    day = date(2026, 10, 16)
+    return sorted(r["patient_id"] for _, r in booking_store.iter_bookings(day, day, clinic))
+
+
+def _commit(rows):
+    booking_journal._write_batch([booking_journal._Entry(booking_journal._encode(r)) for r in rows])
+
+
+def test_failure_partway_through_a_pass_is_not_replayed_twice(journal, monkeypatch):
+    _commit([_booking(1, "A"), _booking(2, "B")])
+    assert booking_journal.materialize() == 2
+
+    # the next pass writes partition A, then fails on B
+    _commit([_booking(3, "A"), _booking(4, "B")])
+    real_append = booking_store.append_rows
+
+    def failing_append(key, rows, **kwargs):
+        if key[1] == "B":
+            raise OSError("disk full")
+        return real_append(key, rows, **kwargs)
+
+    monkeypatch.setattr(booking_store, "append_rows", failing_append)
+    with pytest.raises(OSError):
+        booking_journal.materialize()
+    assert _stored("A") == ["P1", "P3"]
+
+    # the retry replays both lines; A's row must not be written again
+    monkeypatch.setattr(booking_store, "append_rows", real_append)
+    booking_journal.materialize()
+    assert _stored("A") == ["P1", "P3"]
+    assert _stored("B") == ["P2", "P4"]
+
+    # and once caught up, passes stop de-duplicating
+    _commit([_booking(5, "A")])
+    booking_journal.materialize()
+    assert _stored("A") == ["P1", "P3", "P5"]
+    assert not (journal / "booking_journal.log.offset.pending").exists()
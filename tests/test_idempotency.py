@@ -0,0 +1,62 @@
+import itertools
+
+import pytest
+from flask import Flask, jsonify, request, session
+
+from src.app.services import idempotency, sessions
+from src.app.services.idempotency.memory import MemoryIdempotencyStore
+from src.app.services.sessions.memory import MemorySessionStore
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(idempotency, "_store", MemoryIdempotencyStore(100))
+    monkeypatch.setattr(sessions, "_store", MemorySessionStore(100))
+    monkeypatch.setitem(sessions._settings, "backend", "memory")
+
+    app = Flask(__name__)
+    app.secret_key = "test"
+    sessions.init_app(app)
+    created = itertools.count(1)
+
+    @app.route("/start", methods=["POST"])
+    def start():
+        session["started"] = True
+        return "", 204
+
+    @app.route("/create", methods=["POST"])
+    @idempotency.idempotent
+    def create():
+        return jsonify(id=next(created), name=request.get_json()["name"]), 201
+
+    return app
+
+
+def _create(client, name, key="order-1"):
+    return client.post("/create", json={"name": name}, headers={idempotency.HEADER: key})
+
+
+def test_anonymous_clients_do_not_share_a_key(app):
+    a, b = app.test_client(), app.test_client()
+    first = _create(a, "alice")
+    # without a session the key cannot be tied to b; it must neither 422 nor replay a's result
+    other = _create(b, "bob")
+    same_body = _create(b, "alice")
+    assert (first.status_code, other.status_code, same_body.status_code) == (201, 201, 201)
+    assert len({first.json["id"], other.json["id"], same_body.json["id"]}) == 3
+    assert "Idempotent-Replayed" not in same_body.headers
+
+
+def test_keys_are_scoped_to_the_client_session(app):
+    a, b = app.test_client(), app.test_client()
+    a.post("/start")
+    b.post("/start")
+    first = _create(a, "alice")
+    other = _create(b, "bob")
+    assert (first.status_code, other.status_code) == (201, 201)
+    assert first.json["id"] != other.json["id"]
+
+    retry = _create(a, "alice")
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json == first.json
+    assert _create(a, "mallory").status_code == 422